@@ -0,0 +1,150 @@
+import json
+from datetime import timedelta
+
+from flask import Blueprint, Response, abort, jsonify, request, \
+    stream_with_context, url_for
+
+from extensions import db
+from models import live
+from routing import reads_from_replica
+from views import keyset_query, keyset_page
+import bookings
+import bulk
+
+#----------------------------------------------------------------------------#
+# JSON API.
+#----------------------------------------------------------------------------#
+
+# Venues, artists and shows as JSON, in the columns and format of
+# `flask fyyur export`. Listings are paged by id with the same cursors as
+# the HTML pages. /api/v1/<entity>/export streams every row as NDJSON from a
+# server side cursor, so memory stays flat however many rows there are.
+# /api/v1/shows/conflicts?start=...&end=... reports the double bookings of a
+# date window of at most CONFLICT_MAX_WINDOW.
+
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+EXPORT_BATCH_SIZE = 1000
+CONFLICT_MAX_WINDOW = timedelta(days=366)
+
+ENTITY = '<any(venues, artists, shows):entity>'
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def record(entity, row):
+    return {column.name: bulk.export_value(value, 'ndjson')
+            for column, value in zip(bulk.columns_of(bulk.ENTITIES[entity]),
+                                     row)}
+
+
+@api.route('/' + ENTITY)
+@reads_from_replica
+def list_entities(entity):
+    model = bulk.ENTITIES[entity]
+    per_page = min(max(1, request.args.get('limit', API_PAGE_SIZE, type=int)),
+                   API_MAX_PAGE_SIZE)
+    after = request.args.get('after')
+    before = request.args.get('before')
+
+    rows = keyset_query(
+        db.session.query(*bulk.columns_of(model)).filter(*live(model)),
+        [model.id],
+        per_page,
+        after=after,
+        before=before
+    ).all()
+    rows, prev_cursor, next_cursor = keyset_page(
+        rows, [model.id], per_page, after=after, before=before)
+
+    return jsonify({
+        'success': True,
+        'data': [record(entity, row) for row in rows],
+        'prev': prev_cursor and url_for(
+            'api.list_entities', entity=entity, before=prev_cursor,
+            limit=per_page),
+        'next': next_cursor and url_for(
+            'api.list_entities', entity=entity, after=next_cursor,
+            limit=per_page)
+    })
+
+
+@api.route('/' + ENTITY + '/<int:entity_id>')
+@reads_from_replica
+def get_entity(entity, entity_id):
+    model = bulk.ENTITIES[entity]
+    row = db.session.query(*bulk.columns_of(model)). \
+        filter(model.id == entity_id, *live(model)). \
+        first_or_404()
+
+    return jsonify({
+        'success': True,
+        'data': record(entity, row)
+    })
+
+
+@api.route('/' + ENTITY + '/export')
+@reads_from_replica
+def export_entities(entity):
+    names = [column.name for column in bulk.columns_of(bulk.ENTITIES[entity])]
+
+    def generate():
+        lines = []
+        for values in bulk.export_records(entity, 'ndjson', EXPORT_BATCH_SIZE):
+            lines.append(json.dumps(dict(zip(names, values))) + '\n')
+            if len(lines) == EXPORT_BATCH_SIZE:
+                yield ''.join(lines)
+                lines = []
+        if lines:
+            yield ''.join(lines)
+
+    return Response(stream_with_context(generate()),
+                    mimetype='application/x-ndjson')
+
+
+def window_bound(name):
+    import dateutil.parser
+
+    try:
+        return dateutil.parser.parse(request.args[name])
+    except (KeyError, ValueError, OverflowError):
+        abort(400)
+
+
+@api.route('/shows/conflicts')
+@reads_from_replica
+def show_conflicts():
+    start = window_bound('start')
+    end = window_bound('end')
+    if not start < end <= start + CONFLICT_MAX_WINDOW:
+        abort(400)
+
+    conflicts = bookings.conflicts(start, end)
+    for conflict in conflicts:
+        conflict['start_time'] = conflict['start_time'].isoformat()
+        conflict['end_time'] = conflict['end_time'].isoformat()
+
+    return jsonify({
+        'success': True,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'conflicts': conflicts
+    })
+
+
+@api.errorhandler(400)
+def bad_request(error):
+    return jsonify({
+        'success': False,
+        'error': 400,
+        'message': 'bad request'
+    }), 400
+
+
+@api.errorhandler(404)
+def not_found(error):
+    return jsonify({
+        'success': False,
+        'error': 404,
+        'message': 'resource not found'
+    }), 404
@@ -0,0 +1,451 @@
+'''
+ASGI entry point for Fyyur.
+
+The read-only pages run their queries on an asyncpg pool without blocking,
+so one worker keeps serving other requests while it waits on Postgres.
+Everything else, the forms in particular, is handed to the WSGI app
+unchanged. Serve it with:
+
+    uvicorn asgi:application --workers 4
+
+The queries and templates are the ones views.py uses. A Flask request
+context is pushed only around the synchronous steps, building the queries
+and rendering the rows, and never held across an await, since the contexts
+of the requests sharing the event loop would otherwise mix. What outlives
+them, the bind routing.choose_bind() picked and the time spent in queries,
+is kept in the ASGI scope, so the pages are routed to the replicas, keep
+read-your-writes and report Server-Timing and metrics as the WSGI views do.
+'''
+import asyncio
+import os
+import re
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+from asgiref.wsgi import WsgiToAsgi
+from databases import Database
+from flask import abort, g, request, session
+from werkzeug.exceptions import HTTPException
+
+from app import create_app
+from extensions import db, page_cache
+from views import validator_headers, not_modified, \
+    venues_query, render_venues, render_search_venues, \
+    venue_query, venue_shows_query, render_venue, render_venue_past_shows, \
+    artists_query, render_artists, render_search_artists, \
+    artist_query, artist_shows_query, render_artist, render_artist_past_shows, \
+    shows_query, render_shows, render_search_shows
+from models import Venue, Artist
+from routing import choose_bind, recently_wrote
+import instrumentation
+import search
+import genres
+
+#----------------------------------------------------------------------------#
+# Database.
+#----------------------------------------------------------------------------#
+
+
+def database_url(bind=None):
+    if bind is None:
+        url = os.environ.get('ASYNC_DATABASE_URL') or \
+            app.config['SQLALCHEMY_DATABASE_URI']
+    else:
+        url = app.config['SQLALCHEMY_BINDS'][bind]
+    # asyncpg only knows the postgresql:// scheme.
+    return re.sub(r'^postgres://', 'postgresql://', url)
+
+
+def pool_options():
+    # The same DB_* settings as the SQLAlchemy pools in pools.py.
+    options = {
+        'min_size': 1,
+        'max_size': int(os.environ.get('DB_POOL_SIZE', '5')) +
+        int(os.environ.get('DB_MAX_OVERFLOW', '10'))
+    }
+    if app.config['DB_PGBOUNCER']:
+        # PgBouncer in transaction mode can't keep prepared statements.
+        options['statement_cache_size'] = 0
+    elif os.environ.get('DB_STATEMENT_TIMEOUT_MS'):
+        options['server_settings'] = {
+            'statement_timeout': os.environ['DB_STATEMENT_TIMEOUT_MS']}
+    return options
+
+
+async def connect():
+    await asyncio.gather(*[database.connect()
+                           for database in databases.values()])
+
+
+async def disconnect():
+    await asyncio.gather(*[database.disconnect()
+                           for database in databases.values()])
+
+
+def request_state(scope):
+    return scope.setdefault('fyyur', {
+        'bind': None,
+        'started_at': time.perf_counter(),
+        'queries': 0,
+        'seconds': 0.0
+    })
+
+
+async def timed(scope, fetch, statement):
+    '''
+    timed(scope, fetch, statement)
+        runs statement with fetch, one of the methods of the database of
+        the bind picked for the request, counting it in the request's
+        timings and logging it when slow
+    '''
+    database = databases[request_state(scope)['bind']]
+    started = time.perf_counter()
+    result = await getattr(database, fetch)(statement)
+    seconds = time.perf_counter() - started
+
+    state = request_state(scope)
+    state['queries'] += 1
+    state['seconds'] += seconds
+    if seconds >= app.config.get('SLOW_QUERY_SECONDS', 0.1):
+        with page_context(scope):
+            instrumentation.log_slow_query(seconds, statement,
+                                           statement.compile().params)
+    return result
+
+
+async def fetch_all(scope, query):
+    '''
+    fetch_all(scope, query)
+        runs a column query built for the synchronous views and returns its
+        rows as named tuples, like Query.all() does
+    '''
+    names = [column['name'] for column in query.column_descriptions]
+    Row = namedtuple('Row', names)
+    records = await timed(scope, 'fetch_all', query.statement)
+    return [Row(*(record[i] for i in range(len(names)))) for record in records]
+
+
+async def fetch_count(scope, query):
+    return await timed(
+        scope, 'fetch_val',
+        db.select([db.func.count()]).select_from(query.statement.alias()))
+
+#----------------------------------------------------------------------------#
+# Pages.
+#----------------------------------------------------------------------------#
+
+
+@contextmanager
+def page_context(scope):
+    # g starts out as the WSGI views leave it, for page_cache.fillable and
+    # the instrumentation.
+    state = request_state(scope)
+    with app.test_request_context(
+            scope['path'],
+            method=scope['method'],
+            query_string=scope['query_string'].decode('latin-1'),
+            headers=[(name.decode('latin-1'), value.decode('latin-1'))
+                     for name, value in scope['headers']]):
+        g.database_bind = state['bind']
+        g.request_started_at = state['started_at']
+        g.db_queries = state['queries']
+        g.db_seconds = state['seconds']
+        yield
+
+
+def cached(*tags):
+    '''
+    cached(*tags)
+        the async counterpart of page_cache.cached, sharing its entries
+    '''
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(scope, **kwargs):
+            with page_context(scope):
+                if recently_wrote():
+                    key = page = None
+                else:
+                    key = page_cache.page_key(tags, kwargs)
+                    page = page_cache.lookup(key)
+            if page is None:
+                page = await handler(scope, **kwargs)
+                with page_context(scope):
+                    if key is not None and \
+                            page_cache.fillable(tags, kwargs):
+                        page_cache.store(key, page)
+            return page
+        return wrapper
+    return decorator
+
+
+async def run_page(scope, build, render):
+    '''
+    run_page(scope, build, render)
+        runs the queries build() returns side by side and renders their
+        rows with render(*rows)
+    '''
+    with page_context(scope):
+        queries = build()
+    rows = await asyncio.gather(*[fetch_all(scope, query)
+                                  for query in queries])
+    with page_context(scope):
+        return render(*rows)
+
+
+async def run_detail(scope, build_detail, build_shows, render):
+    '''
+    run_detail(scope, build_detail, build_shows, render)
+        runs the venue or artist query and the shows query the builders
+        return, and renders their rows with render(detail, shows) along
+        with the validator headers of the detail row; a conditional request
+        runs the detail query alone first and gets a 304 without the shows
+        when it matches
+    '''
+    with page_context(scope):
+        conditional = 'If-None-Match' in request.headers or \
+            'If-Modified-Since' in request.headers
+        queries = [build_detail()] if conditional else \
+            [build_detail(), build_shows()]
+    rows = await asyncio.gather(*[fetch_all(scope, query)
+                                  for query in queries])
+
+    with page_context(scope):
+        detail = first_or_404(rows[0])
+        headers = validator_headers(detail)
+        response = not_modified(headers)
+        if response is not None:
+            return response
+        if conditional:
+            shows_query = build_shows()
+    if conditional:
+        rows.append(await fetch_all(scope, shows_query))
+
+    with page_context(scope):
+        return render(detail, rows[1]), headers
+
+
+async def run_listing(scope, model, build, render):
+    '''
+    run_listing(scope, model, build, render)
+        runs the listing query build() returns, and the genre counts shown
+        next to it unless they are cached, and renders both with
+        render(rows, genre_counts)
+    '''
+    with page_context(scope):
+        selected = request.args.getlist('genre')
+        genre_counts = genres.cached_genre_counts(model, selected)
+        queries = [build()]
+        if genre_counts is None:
+            queries.append(genres.genre_counts_query(model, selected))
+
+    rows = await asyncio.gather(*[fetch_all(scope, query)
+                                  for query in queries])
+
+    with page_context(scope):
+        if genre_counts is None:
+            genre_counts = genres.store_genre_counts(model, selected, rows[1])
+        return render(rows[0], genre_counts)
+
+
+async def run_search(scope, build, results, render):
+    with page_context(scope):
+        term = request.values.get('search_term', '')
+        page = request.values.get('page', 1, type=int)
+        query, order_by = build(term)
+
+    count = await fetch_count(scope, query)
+    page, pages = search.page_bounds(
+        count, page, search.SEARCH_RESULTS_PER_PAGE)
+    rows = await fetch_all(scope, search.page_query(
+        query, order_by, page, search.SEARCH_RESULTS_PER_PAGE))
+
+    with page_context(scope):
+        return render(results(rows, count, page, pages))
+
+
+def first_or_404(rows):
+    if not rows:
+        abort(404)
+    return rows[0]
+
+
+@cached('venues')
+async def venues(scope):
+    return await run_listing(scope, Venue, venues_query, render_venues)
+
+
+async def search_venues(scope):
+    return await run_search(
+        scope,
+        lambda term: search.name_search(Venue, term),
+        search.name_results,
+        render_search_venues)
+
+
+@cached('venue:{venue_id}')
+async def show_venue(scope, venue_id):
+    now = datetime.now()
+    return await run_detail(
+        scope,
+        lambda: venue_query(venue_id, now),
+        lambda: venue_shows_query(venue_id, now),
+        lambda venue, shows: render_venue(venue, shows, now))
+
+
+async def venue_past_shows(scope, venue_id):
+    now = datetime.now()
+    return await run_page(
+        scope,
+        lambda: [venue_shows_query(venue_id, now,
+                                   past_after=request.args.get('after'),
+                                   include_upcoming=False)],
+        lambda shows: render_venue_past_shows(venue_id, shows, now))
+
+
+@cached('artists')
+async def artists(scope):
+    return await run_listing(scope, Artist, artists_query, render_artists)
+
+
+async def search_artists(scope):
+    return await run_search(
+        scope,
+        lambda term: search.name_search(Artist, term),
+        search.name_results,
+        render_search_artists)
+
+
+@cached('artist:{artist_id}')
+async def show_artist(scope, artist_id):
+    now = datetime.now()
+    return await run_detail(
+        scope,
+        lambda: artist_query(artist_id, now),
+        lambda: artist_shows_query(artist_id, now),
+        lambda artist, shows: render_artist(artist, shows, now))
+
+
+async def artist_past_shows(scope, artist_id):
+    now = datetime.now()
+    return await run_page(
+        scope,
+        lambda: [artist_shows_query(artist_id, now,
+                                    past_after=request.args.get('after'),
+                                    include_upcoming=False)],
+        lambda shows: render_artist_past_shows(artist_id, shows, now))
+
+
+async def shows(scope):
+    return await run_page(scope, lambda: [shows_query()], render_shows)
+
+
+async def search_shows(scope):
+    return await run_search(
+        scope, search.show_search, search.show_results, render_search_shows)
+
+
+ROUTES = [(re.compile(pattern), handler) for pattern, handler in [
+    (r'/venues', venues),
+    (r'/venues/search', search_venues),
+    (r'/venues/(?P<venue_id>\d+)', show_venue),
+    (r'/venues/(?P<venue_id>\d+)/past_shows', venue_past_shows),
+    (r'/artists', artists),
+    (r'/artists/search', search_artists),
+    (r'/artists/(?P<artist_id>\d+)', show_artist),
+    (r'/artists/(?P<artist_id>\d+)/past_shows', artist_past_shows),
+    (r'/shows', shows),
+    (r'/shows/search', search_shows),
+]]
+
+#----------------------------------------------------------------------------#
+# Application.
+#----------------------------------------------------------------------------#
+
+
+def init_app(flask_app):
+    '''
+    init_app(flask_app)
+        serves flask_app, e.g. one configured for tests, in place of the
+        app built from config.py and the environment
+    '''
+    global app, databases, wsgi_application
+    app = flask_app
+    # One pool per bind, like the SQLAlchemy engines.
+    databases = {bind: Database(database_url(bind), **pool_options())
+                 for bind in [None] + app.config['SQLALCHEMY_REPLICA_BINDS']}
+    wsgi_application = WsgiToAsgi(app)
+
+
+init_app(create_app())
+
+
+async def serve_page(scope, handler, kwargs):
+    '''
+    serve_page(scope, handler, kwargs)
+        returns the page handler renders, alone, with its headers or as a
+        304, or None when the WSGI app has to serve the request instead
+    '''
+    with page_context(scope):
+        # Showing flashed messages consumes them, which only the WSGI app
+        # can write back to the session cookie.
+        if '_flashes' in session:
+            return None
+        request_state(scope)['bind'] = choose_bind()
+    try:
+        return await handler(scope, **kwargs)
+    except HTTPException:
+        # Missing rows and bad cursors, let Flask render its error page.
+        return None
+
+
+async def send_page(scope, send, page):
+    # As Flask would send it: a 304 when the client has the page, and no
+    # body for HEAD.
+    with page_context(scope):
+        response = app.make_response(page).make_conditional(request)
+        instrumentation.record_request(response)
+        db.stamp_write(response)
+        headers = response.get_wsgi_headers(request.environ)
+        body = b''.join(response.get_app_iter(request.environ))
+
+    await send({
+        'type': 'http.response.start',
+        'status': response.status_code,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in headers.items()]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await connect()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await disconnect()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+        for pattern, handler in ROUTES:
+            match = pattern.fullmatch(scope['path'])
+            if match is None:
+                continue
+            kwargs = {name: int(value)
+                      for name, value in match.groupdict().items()}
+            page = await serve_page(scope, handler, kwargs)
+            if page is not None:
+                return await send_page(scope, send, page)
+            break
+
+    await wsgi_application(scope, receive, send)
@@ -0,0 +1,226 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import current_app, request, send_from_directory
+from werkzeug.security import safe_join
+
+#----------------------------------------------------------------------------#
+# Static assets.
+#----------------------------------------------------------------------------#
+
+# `flask fyyur build-assets` copies every file under static/ into
+# static/dist/ under a name carrying a hash of its content, e.g.
+# css/main.3f2a9c1e0b7d.css, rewriting the url() references between the
+# stylesheets and the files they load, and writes gzip and brotli variants
+# next to the copies worth compressing. dist/manifest.json maps the source
+# names to the built ones, and url_for('static', filename=...) links the
+# built file whenever there is one. A built name changes with its content,
+# so built files are served with a year long immutable Cache-Control, from
+# the precompressed variant the client accepts. Without a build the source
+# files are served as before.
+#
+# A build keeps the files of the KEEP_BUILDS builds before it, listed in
+# dist/builds.json, since pages rendered and cached before a deploy still
+# link them; older files are deleted. The manifest of each app, read when
+# it is created, is kept in app.extensions['assets'] with a digest that the
+# page validators include, so pages linking other files get new ETags.
+
+BUILD_DIR = 'dist'
+MANIFEST = 'manifest.json'
+HISTORY = 'builds.json'
+KEEP_BUILDS = 3
+HASH_LENGTH = 12
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# Already compressed formats, such as images and woff, gain nothing.
+COMPRESSIBLE = {'.css', '.js', '.map', '.json', '.svg', '.ttf', '.otf',
+                '.eot', '.txt'}
+# In order of preference.
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+class AssetsState(object):
+
+    def __init__(self, manifest):
+        self.manifest = manifest
+        self.version = hashlib.sha1(
+            json.dumps(manifest, sort_keys=True).encode()).hexdigest()
+
+
+def version():
+    return current_app.extensions['assets'].version
+
+
+def hashed_name(name, content):
+    root, extension = posixpath.splitext(name)
+    return '{}.{}{}'.format(
+        root, hashlib.sha256(content).hexdigest()[:HASH_LENGTH], extension)
+
+
+def rewrite_css(name, content, built):
+    '''
+    rewrite_css(name, content, built)
+        points the relative url() references of the stylesheet name at the
+        built names of the files they load, keeping any ?query or #fragment
+    '''
+    directory = posixpath.dirname(name)
+
+    def rewrite(match):
+        quote, url = match.groups()
+        path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        target = posixpath.normpath(posixpath.join(directory, path))
+        if '://' in url or url.startswith(('/', 'data:')) or \
+                target not in built:
+            return match.group(0)
+        return 'url({0}{1}{2}{0})'.format(
+            quote, posixpath.relpath(built[target], directory), suffix)
+
+    return CSS_URL.sub(rewrite, content.decode('utf-8', 'surrogateescape')). \
+        encode('utf-8', 'surrogateescape')
+
+
+def brotli_compress(content):
+    try:
+        import brotli
+    except ImportError:
+        raise RuntimeError(
+            'Building assets needs the brotli package: pip install brotli')
+    return brotli.compress(content, quality=11)
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def read_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def prune(output, builds):
+    '''
+    prune(output, builds)
+        deletes the files under output that none of the manifests in builds
+        link, compressed variants included
+    '''
+    keep = {MANIFEST, HISTORY}
+    for built in builds:
+        for name in built.values():
+            name = posixpath.relpath(name, BUILD_DIR)
+            keep.update(name + suffix for suffix in ['', '.gz', '.br'])
+    for root, directories, files in os.walk(output):
+        for file in files:
+            path = os.path.join(root, file)
+            if os.path.relpath(path, output).replace(os.sep, '/') not in keep:
+                os.remove(path)
+
+
+def build(static_folder):
+    '''
+    build(static_folder)
+        writes fingerprinted, precompressed copies of the static files into
+        static_folder/dist, next to those of the previous KEEP_BUILDS
+        builds, and returns the manifest mapping their names to the built
+        ones
+    '''
+    output = os.path.join(static_folder, BUILD_DIR)
+
+    names = []
+    for root, directories, files in os.walk(static_folder):
+        if root == static_folder and BUILD_DIR in directories:
+            directories.remove(BUILD_DIR)
+        directories.sort()
+        for file in sorted(files):
+            path = os.path.join(root, file)
+            names.append(os.path.relpath(path, static_folder).
+                         replace(os.sep, '/'))
+
+    built = {}
+    # Stylesheets last, the files they load need their built names first.
+    for name in sorted(names, key=lambda name: name.endswith('.css')):
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            content = f.read()
+        if name.endswith('.css'):
+            content = rewrite_css(name, content, built)
+
+        built[name] = hashed_name(name, content)
+        path = os.path.join(output, built[name])
+        write(path, content)
+        if posixpath.splitext(name)[1] in COMPRESSIBLE:
+            # mtime=0 keeps the gzip output the same from build to build.
+            for suffix, compressed in [
+                    ('.gz', gzip.compress(content, 9, mtime=0)),
+                    ('.br', brotli_compress(content))]:
+                if len(compressed) < len(content):
+                    write(path + suffix, compressed)
+
+    built = {name: BUILD_DIR + '/' + built_name
+             for name, built_name in built.items()}
+    previous = read_json(os.path.join(output, HISTORY), None)
+    if previous is None:
+        # Built before the history was kept.
+        previous = [read_json(os.path.join(output, MANIFEST), {})]
+    builds = [built] + [manifest for manifest in previous
+                        if manifest != built][:KEEP_BUILDS]
+    write(os.path.join(output, MANIFEST),
+          json.dumps(built, indent=2, sort_keys=True).encode())
+    write(os.path.join(output, HISTORY),
+          json.dumps(builds, indent=2, sort_keys=True).encode())
+    prune(output, builds)
+    return built
+
+
+def load_manifest(static_folder):
+    return read_json(os.path.join(static_folder, BUILD_DIR, MANIFEST), {})
+
+
+def static_url_defaults(endpoint, values):
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = current_app.extensions['assets'].manifest.get(
+            values['filename'], values['filename'])
+
+
+def send_static_file(filename):
+    '''
+    send_static_file(filename)
+        the static view: built files precompressed and cached for a year,
+        the source files as Flask sends them
+    '''
+    if not filename.startswith(BUILD_DIR + '/'):
+        return current_app.send_static_file(filename)
+
+    folder = current_app.static_folder
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in ENCODINGS:
+        path = safe_join(folder, filename + suffix)
+        if request.accept_encodings[encoding] and path is not None and \
+                os.path.isfile(path):
+            response = send_from_directory(
+                folder, filename + suffix, mimetype=mimetype,
+                cache_timeout=IMMUTABLE_MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(folder, filename,
+                                       cache_timeout=IMMUTABLE_MAX_AGE)
+
+    response.headers['Cache-Control'] = \
+        'public, max-age={}, immutable'.format(IMMUTABLE_MAX_AGE)
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_app(app):
+    app.extensions['assets'] = AssetsState(load_manifest(app.static_folder))
+    app.url_defaults(static_url_defaults)
+    app.view_functions['static'] = send_static_file
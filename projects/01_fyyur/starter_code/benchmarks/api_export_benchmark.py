@@ -0,0 +1,66 @@
+'''
+Streams /api/v1/shows/export over 1M shows and reports the resident memory
+of the process as the export goes, then the peak memory of loading the same
+rows into one list, which the streaming export avoids.
+
+Run from starter_code against a scratch Postgres database, which is wiped,
+migrated and seeded first:
+
+    BENCH_DATABASE_URL=postgres://localhost:5432/fyyur_bench \
+        python -m benchmarks.api_export_benchmark [shows]
+'''
+import resource
+import sys
+import time
+
+from benchmarks.search_benchmark import app, db, reset_database, seed
+from models import Show
+
+SHOWS = 1000000
+SAMPLES = 10
+
+
+def resident_mb():
+    # Linux only, the second field of statm is the resident size in pages.
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+    return pages * resource.getpagesize() / 1024 / 1024
+
+
+def peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main(shows):
+    with app.app_context():
+        reset_database()
+        seed(shows)
+        db.session.remove()
+
+    client = app.test_client()
+    print('{:>10} {:>12} {:>12}'.format('rows', 'seconds', 'resident MB'))
+
+    started = time.perf_counter()
+    baseline = resident_mb()
+    response = client.get('/api/v1/shows/export', buffered=False)
+    rows = 0
+    next_sample = 0
+    for chunk in response.response:
+        rows += chunk.count(b'\n')
+        if rows >= next_sample:
+            print('{:>10} {:>12.1f} {:>12.1f}'.format(
+                rows, time.perf_counter() - started, resident_mb()))
+            next_sample += shows // SAMPLES
+    response.close()
+    print('streamed {} rows, resident memory grew {:.1f} MB'.format(
+        rows, resident_mb() - baseline))
+
+    with app.app_context():
+        before = peak_mb()
+        loaded = db.session.query(*Show.__table__.columns).all()
+        print('loading {} rows into a list peaked at {:.1f} MB (+{:.1f} MB)'.format(
+            len(loaded), peak_mb(), peak_mb() - before))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if sys.argv[1:] else SHOWS)
@@ -0,0 +1,131 @@
+'''
+Load-tests the read-only pages served by the WSGI app under gunicorn's sync
+workers and by the ASGI entry point under uvicorn, with the same number of
+workers, and reports requests per second and latency percentiles at every
+concurrency level.
+
+Run from starter_code against a scratch Postgres database, which is wiped,
+migrated and seeded first:
+
+    BENCH_DATABASE_URL=postgres://localhost:5432/fyyur_bench \
+        python -m benchmarks.asgi_benchmark [concurrency ...]
+
+BENCH_WORKERS (default 4) sets the workers per server, BENCH_SECONDS
+(default 10) the length of every run and BENCH_SIZE (default 10000) the
+number of venues seeded. The page cache is turned off in both servers so
+every request reaches the database.
+'''
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+from benchmarks.search_benchmark import app, reset_database, seed
+
+CONCURRENCY = [16, 64, 256]
+WORKERS = int(os.environ.get('BENCH_WORKERS', '4'))
+SECONDS = float(os.environ.get('BENCH_SECONDS', '10'))
+SIZE = int(os.environ.get('BENCH_SIZE', '10000'))
+HOST = '127.0.0.1'
+
+SERVERS = [
+    ('wsgi', 8101, ['gunicorn', '--workers', str(WORKERS),
+                    '--bind', '{}:8101'.format(HOST), 'wsgi:app']),
+    ('asgi', 8102, ['uvicorn', '--workers', str(WORKERS), '--no-access-log',
+                    '--host', HOST, '--port', '8102', 'asgi:application']),
+]
+
+
+def paths(rng):
+    num_artists = max(1, SIZE // 10)
+    while True:
+        yield rng.choice([
+            '/venues',
+            '/artists',
+            '/shows',
+            '/venues/{}'.format(rng.randint(1, SIZE)),
+            '/artists/{}'.format(rng.randint(1, num_artists)),
+            '/venues/search?search_term=jazz',
+            '/shows/search?search_term=hall',
+        ])
+
+
+async def get(port, path):
+    reader, writer = await asyncio.open_connection(HOST, port)
+    writer.write('GET {} HTTP/1.1\r\nHost: {}\r\nConnection: close\r\n\r\n'.
+                 format(path, HOST).encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b' ', 2)[1])
+
+
+async def load(port, concurrency):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + SECONDS
+
+    async def client(seed):
+        nonlocal errors
+        for path in paths(random.Random(seed)):
+            if time.perf_counter() >= deadline:
+                return
+            started = time.perf_counter()
+            try:
+                status = await get(port, path)
+            except OSError:
+                status = None
+            if status != 200:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*[client(seed) for seed in range(concurrency)])
+    return latencies, errors
+
+
+def percentile(latencies, fraction):
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+
+def wait_until_up(port):
+    for _ in range(100):
+        try:
+            asyncio.run(get(port, '/'))
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server on port {} did not start'.format(port))
+
+
+def main(concurrency_levels):
+    with app.app_context():
+        reset_database()
+        seed(SIZE)
+
+    env = dict(os.environ,
+               DATABASE_URL=app.config['SQLALCHEMY_DATABASE_URI'],
+               CACHE_TYPE='null')
+
+    print('{:>6} {:>12} {:>10} {:>10} {:>10} {:>8}'.format(
+        'server', 'concurrency', 'req/s', 'p50 ms', 'p99 ms', 'errors'))
+
+    for name, port, command in SERVERS:
+        server = subprocess.Popen(command, env=env)
+        try:
+            wait_until_up(port)
+            for concurrency in concurrency_levels:
+                latencies, errors = asyncio.run(load(port, concurrency))
+                print('{:>6} {:>12} {:>10.0f} {:>10.1f} {:>10.1f} {:>8}'.format(
+                    name, concurrency, len(latencies) / SECONDS,
+                    percentile(latencies, 0.5) * 1000,
+                    percentile(latencies, 0.99) * 1000, errors))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main([int(level) for level in sys.argv[1:]] or CONCURRENCY)
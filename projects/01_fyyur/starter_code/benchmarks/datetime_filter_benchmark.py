@@ -0,0 +1,57 @@
+'''
+Measures the per-row cost of the `datetime` Jinja filter: the old filter,
+which re-parsed a strftime'd string and rebuilt the babel pattern for every
+row, against format_datetime on datetime objects and the format_datetimes
+batch helper. No database is needed:
+
+    python -m benchmarks.datetime_filter_benchmark [rows]
+'''
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from views import format_datetime, format_datetimes
+
+ROWS = 1000
+REPEATS = 5
+
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def per_row_microseconds(run, rows):
+    return min(timeit.repeat(run, number=1, repeat=REPEATS)) / rows * 1e6
+
+
+def main(rows):
+    start_times = [datetime(2026, 1, 1) + timedelta(hours=i)
+                   for i in range(rows)]
+    strings = [start_time.strftime("%m/%d/%Y, %H:%M:%S")
+               for start_time in start_times]
+
+    legacy = per_row_microseconds(
+        lambda: [legacy_format_datetime(value, 'full') for value in strings],
+        rows)
+    filtered = per_row_microseconds(
+        lambda: [format_datetime(value, 'full') for value in start_times],
+        rows)
+    batched = per_row_microseconds(
+        lambda: format_datetimes(start_times, 'full'), rows)
+
+    print('{:<28} {:>10}'.format('per row', 'us'))
+    print('{:<28} {:>10.1f}'.format('legacy parse + format', legacy))
+    print('{:<28} {:>10.1f}'.format('format_datetime', filtered))
+    print('{:<28} {:>10.1f}'.format('format_datetimes (batch)', batched))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS)
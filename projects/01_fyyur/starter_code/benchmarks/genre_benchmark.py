@@ -0,0 +1,95 @@
+'''
+Times the genre filter of /venues, served by the ix_venue_genres GIN index,
+against the same filter with index scans switched off, and the per-genre
+counts cold against cached, on 10k, 100k and 1M venues.
+
+Run from starter_code against a scratch Postgres database, which is wiped
+and migrated with `flask db upgrade` for every size:
+
+    BENCH_DATABASE_URL=postgres://localhost:5432/fyyur_bench \
+        python -m benchmarks.genre_benchmark [size ...]
+'''
+import random
+import sys
+import time
+
+from benchmarks.search_benchmark import app, db, insert, reset_database
+from cache import LRUCache
+from choices import genres_choices
+from models import Venue
+import genres
+
+SIZES = [10000, 100000, 1000000]
+REPEATS = 5
+GENRES = [genre for genre, _ in genres_choices]
+# A common genre, a common pair and a rare pair.
+SELECTIONS = [['Rock n Roll'], ['Jazz', 'Blues'], ['Classical', 'Reggae']]
+
+
+def seed(size):
+    rng = random.Random(size)
+    insert(Venue.__table__, [{
+        'id': i + 1,
+        'name': 'Venue {}'.format(i),
+        'city': 'Springfield',
+        'state': 'IL',
+        'seeking_talent': False,
+        # Skewed like a real catalogue: a few genres are everywhere.
+        'genres': sorted(set(rng.choices(
+            GENRES, weights=range(len(GENRES), 0, -1),
+            k=rng.randint(1, 3))))
+    } for i in range(size)])
+    db.session.execute('ANALYZE')
+    db.session.commit()
+
+
+def best_time(run):
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        for selection in SELECTIONS:
+            run(selection)
+        timings.append(time.perf_counter() - started)
+        db.session.rollback()
+    return min(timings) / len(SELECTIONS) * 1000
+
+
+def filtered(selection):
+    return genres.with_genres(
+        db.session.query(Venue.id, Venue.name), Venue, selection).all()
+
+
+def unindexed(selection):
+    db.session.execute('SET LOCAL enable_bitmapscan = off')
+    db.session.execute('SET LOCAL enable_indexscan = off')
+    return filtered(selection)
+
+
+def main(sizes):
+    print('{:>10} {:>10} {:>12} {:>10} {:>12} {:>10}'.format(
+        'venues', 'GIN ms', 'no index ms', 'speedup', 'counts ms',
+        'cached ms'))
+
+    page_cache = genres.page_cache
+    with app.app_context():
+        for size in sizes:
+            reset_database()
+            seed(size)
+
+            indexed = best_time(filtered)
+            scanned = best_time(unindexed)
+
+            page_cache.state.backend = LRUCache()
+            cold = best_time(lambda selection: genres.genre_counts_query(
+                Venue, selection).all())
+            for selection in SELECTIONS:
+                genres.genre_counts(Venue, selection)
+            cached = best_time(
+                lambda selection: genres.genre_counts(Venue, selection))
+
+            print('{:>10} {:>10.1f} {:>12.1f} {:>9.1f}x {:>12.1f} {:>10.3f}'.format(
+                size, indexed, scanned, scanned / indexed, cold, cached))
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or SIZES)
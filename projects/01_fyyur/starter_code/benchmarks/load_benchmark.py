@@ -0,0 +1,248 @@
+'''
+Drives every Fyyur route through the WSGI app in process, with no server or
+network in between, over production-like data from synthetic.generate, and
+reports requests per second and latency percentiles per route. --save
+writes the results to load_baseline.json next to this file; later runs
+print their change against that baseline and exit 1 when a route's median
+got more than TOLERANCE slower. Save the baseline on the machine the
+comparisons run on.
+
+Run from starter_code against a scratch Postgres database, which is wiped,
+migrated and filled first:
+
+    BENCH_DATABASE_URL=postgres://localhost:5432/fyyur_bench \
+        python -m benchmarks.load_benchmark [--save]
+
+BENCH_SIZE (default 10000) sets the venues generated, with a tenth as many
+artists and ten shows per venue, and BENCH_REQUESTS (default 200) the
+requests per route. The page cache is turned off so every request reaches
+the database. A route without a case in cases() fails the run before
+anything is measured.
+'''
+import json
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from benchmarks.asgi_benchmark import percentile
+from benchmarks.search_benchmark import app, reset_database
+from extensions import page_cache
+import synthetic
+import venue_areas
+
+SIZE = int(os.environ.get('BENCH_SIZE', '10000'))
+REQUESTS = int(os.environ.get('BENCH_REQUESTS', '200'))
+SEED = 0
+TOLERANCE = 0.25
+BASELINE = os.path.join(os.path.dirname(__file__), 'load_baseline.json')
+
+# name, method, URL rule, make() returning (path, form data), requests or
+# None for REQUESTS.
+Case = namedtuple('Case', 'name method rule make requests')
+
+
+def cases(rng):
+    venues = SIZE
+    artists = max(1, SIZE // 10)
+    # Reads and edits use the lower half of the ids, deletes the upper half,
+    # so no read hits a deleted row.
+    venue = lambda: rng.randint(1, venues // 2)
+    artist = lambda: rng.randint(1, max(1, artists // 2))
+    deleted = iter(range(venues, venues // 2, -1))
+    deleted_artists = iter(range(artists, artists // 2, -1))
+    # Far enough out not to clash with a generated booking.
+    booked = iter(range(synthetic.SHOW_DAYS, sys.maxsize))
+    today = datetime.now().replace(hour=20, minute=0, second=0, microsecond=0)
+    area = rng.choice(synthetic.AREAS)
+
+    def venue_form():
+        return {'name': synthetic.name(rng), 'city': area[0],
+                'state': area[1], 'address': '1 Main St',
+                'phone': synthetic.phone(rng), 'genres': ['Jazz', 'Blues'],
+                'facebook_link': 'https://www.facebook.com/load.test'}
+
+    def artist_form():
+        return {'name': synthetic.name(rng), 'city': area[0],
+                'state': area[1], 'phone': synthetic.phone(rng),
+                'genres': ['Jazz'],
+                'facebook_link': 'https://www.facebook.com/load.test'}
+
+    def show_form():
+        start_time = today + timedelta(days=next(booked))
+        return {'artist_id': artist(), 'venue_id': venue(),
+                'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S')}
+
+    def window():
+        start = today + timedelta(days=rng.randint(-300, 300))
+        return 'start={}&end={}'.format(start.date(),
+                                        (start + timedelta(days=7)).date())
+
+    def get(name, rule, path, requests=None):
+        return Case(name, 'GET', rule, lambda: (path(), None), requests)
+
+    def post(name, rule, path, data):
+        return Case(name, 'POST', rule, lambda: (path(), data()), None)
+
+    return [
+        get('home', '/', lambda: '/'),
+        get('venues', '/venues', lambda: '/venues'),
+        get('venues by genre', '/venues', lambda: '/venues?genre=Jazz'),
+        get('venue', '/venues/<int:venue_id>',
+            lambda: '/venues/{}'.format(venue())),
+        get('venue past shows', '/venues/<int:venue_id>/past_shows',
+            lambda: '/venues/{}/past_shows'.format(venue())),
+        get('search venues', '/venues/search',
+            lambda: '/venues/search?search_term=jazz'),
+        post('search venues form', '/venues/search',
+             lambda: '/venues/search', lambda: {'search_term': 'the blue'}),
+        get('new venue form', '/venues/create', lambda: '/venues/create'),
+        post('create venue', '/venues/create', lambda: '/venues/create',
+             venue_form),
+        get('edit venue form', '/venues/<int:venue_id>/edit',
+            lambda: '/venues/{}/edit'.format(venue())),
+        post('edit venue', '/venues/<int:venue_id>/edit',
+             lambda: '/venues/{}/edit'.format(venue()), venue_form),
+        get('artists', '/artists', lambda: '/artists'),
+        get('artists by genre', '/artists', lambda: '/artists?genre=Jazz'),
+        get('artist', '/artists/<int:artist_id>',
+            lambda: '/artists/{}'.format(artist())),
+        get('artist past shows', '/artists/<int:artist_id>/past_shows',
+            lambda: '/artists/{}/past_shows'.format(artist())),
+        get('search artists', '/artists/search',
+            lambda: '/artists/search?search_term=band'),
+        post('search artists form', '/artists/search',
+             lambda: '/artists/search', lambda: {'search_term': 'wild'}),
+        get('new artist form', '/artists/create', lambda: '/artists/create'),
+        post('create artist', '/artists/create', lambda: '/artists/create',
+             artist_form),
+        get('edit artist form', '/artists/<int:artist_id>/edit',
+            lambda: '/artists/{}/edit'.format(artist())),
+        post('edit artist', '/artists/<int:artist_id>/edit',
+             lambda: '/artists/{}/edit'.format(artist()), artist_form),
+        get('shows', '/shows', lambda: '/shows'),
+        get('search shows', '/shows/search',
+            lambda: '/shows/search?search_term=hall'),
+        post('search shows form', '/shows/search', lambda: '/shows/search',
+             lambda: {'search_term': 'sonic'}),
+        get('new show form', '/shows/create', lambda: '/shows/create'),
+        post('create show', '/shows/create', lambda: '/shows/create',
+             show_form),
+        get('api list', '/api/v1/<any(venues, artists, shows):entity>',
+            lambda: '/api/v1/{}?limit=50'.format(
+                rng.choice(['venues', 'artists', 'shows']))),
+        get('api get',
+            '/api/v1/<any(venues, artists, shows):entity>/<int:entity_id>',
+            lambda: '/api/v1/venues/{}'.format(venue())),
+        # Every request streams the whole table.
+        get('api export',
+            '/api/v1/<any(venues, artists, shows):entity>/export',
+            lambda: '/api/v1/artists/export', requests=5),
+        get('api show conflicts', '/api/v1/shows/conflicts',
+            lambda: '/api/v1/shows/conflicts?' + window()),
+        get('cache stats', '/cache/stats', lambda: '/cache/stats'),
+        get('db routing', '/db/routing', lambda: '/db/routing'),
+        get('metrics', '/metrics', lambda: '/metrics'),
+        post('delete venue', '/venues/<venue_id>',
+             lambda: '/venues/{}'.format(next(deleted)), lambda: None),
+        post('delete artist', '/artists/<artist_id>',
+             lambda: '/artists/{}'.format(next(deleted_artists)),
+             lambda: None),
+    ]
+
+
+def uncovered(cases):
+    covered = {(case.method, case.rule) for case in cases}
+    return sorted(
+        (method, rule.rule)
+        for rule in app.url_map.iter_rules() if rule.endpoint != 'static'
+        for method in rule.methods - {'HEAD', 'OPTIONS'}
+        if (method, rule.rule) not in covered)
+
+
+def run(client, case):
+    latencies = []
+    errors = 0
+    for _ in range(case.requests or REQUESTS):
+        path, data = case.make()
+        started = time.perf_counter()
+        response = client.open(path, method=case.method, data=data)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            errors += 1
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / sum(latencies),
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'errors': errors
+    }
+
+
+def change(result, baseline):
+    if baseline is None:
+        return ''
+    return '{:+.0%}'.format(result['p50_ms'] / baseline['p50_ms'] - 1)
+
+
+def main(save):
+    app.config['CACHE_TYPE'] = 'null'
+    page_cache.init_app(app)
+    rng = random.Random(SEED)
+    load_cases = cases(rng)
+
+    missing = uncovered(load_cases)
+    if missing:
+        sys.exit('No load test case for: ' + ', '.join(
+            '{} {}'.format(method, rule) for method, rule in missing))
+
+    with app.app_context():
+        reset_database()
+        synthetic.generate(SIZE, max(1, SIZE // 10), SIZE * 10, SEED)
+
+    baseline = {}
+    if os.path.exists(BASELINE) and not save:
+        with open(BASELINE) as f:
+            saved = json.load(f)
+        if (saved['size'], saved['requests']) == (SIZE, REQUESTS):
+            baseline = saved['routes']
+        else:
+            print('The baseline was run with BENCH_SIZE={} and '
+                  'BENCH_REQUESTS={}, not comparing.'.format(
+                      saved['size'], saved['requests']))
+
+    print('{:<22} {:>8} {:>8} {:>8} {:>8} {:>8} {:>7} {:>8}'.format(
+        'route', 'requests', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms',
+        'errors', 'p50 vs'))
+    results = {}
+    regressions = []
+    client = app.test_client()
+    for case in load_cases:
+        result = results[case.name] = run(client, case)
+        previous = baseline.get(case.name)
+        print('{:<22} {:>8} {:>8.0f} {:>8.1f} {:>8.1f} {:>8.1f} {:>7} {:>8}'.
+              format(case.name, result['requests'], result['rps'],
+                     result['p50_ms'], result['p95_ms'], result['p99_ms'],
+                     result['errors'], change(result, previous)))
+        if previous is not None and \
+                result['p50_ms'] > previous['p50_ms'] * (1 + TOLERANCE):
+            regressions.append(case.name)
+    venue_areas.cancel_scheduled_refresh(app)
+
+    if save:
+        with open(BASELINE, 'w') as f:
+            json.dump({'size': SIZE, 'requests': REQUESTS, 'seed': SEED,
+                       'routes': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print('Saved the baseline to {}.'.format(BASELINE))
+    elif not os.path.exists(BASELINE):
+        print('No baseline yet, run with --save to record one.')
+    if regressions:
+        sys.exit('Slower than the baseline: ' + ', '.join(regressions))
+
+
+if __name__ == '__main__':
+    main('--save' in sys.argv[1:])
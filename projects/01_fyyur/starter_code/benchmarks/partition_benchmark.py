@@ -0,0 +1,133 @@
+'''
+Times the show queries of the venue page and /shows, and a count of the
+coming week's shows, while the show history grows a year at a time on the
+month partitioned show table, along with the partitions each query reads.
+With pruning both stay flat however many years of history there are.
+
+Run from starter_code against a scratch Postgres database, which is wiped
+and migrated first:
+
+    BENCH_DATABASE_URL=postgres://localhost:5432/fyyur_bench \
+        python -m benchmarks.partition_benchmark
+
+BENCH_VENUES (default 6000) venues hold a show every night, a tenth as many
+artists play them, and BENCH_YEARS (default 10) years of history are added:
+about 2.2 million shows a year, 22 million in all, with the defaults.
+'''
+import os
+import re
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.search_benchmark import app, db, insert, reset_database
+from views import shows_query, venue_shows_query
+from models import Venue, Artist, Show
+import partitions
+
+VENUES = int(os.environ.get('BENCH_VENUES', '6000'))
+YEARS = int(os.environ.get('BENCH_YEARS', '10'))
+UPCOMING_DAYS = 90
+REPEATS = 50
+SCANNED = re.compile(r'\bon (show_(?:\d{4}_\d{2}|default))\b')
+
+NIGHTLY_SHOWS = '''
+INSERT INTO show (artist_id, venue_id, start_time, end_time)
+SELECT 1 + (venue * 7919 + CAST(extract(doy FROM day) AS integer)) % :artists,
+       venue, day + interval '20 hours', day + interval '22 hours'
+FROM generate_series(1, :venues) venue,
+     generate_series(CAST(:first AS timestamp), CAST(:last AS timestamp),
+                     interval '1 day') day
+'''
+
+
+def add_shows(first, last):
+    # A month per statement and transaction.
+    partitions.cover(first, last)
+    month = partitions.month_of(first)
+    while month <= last:
+        db.session.execute(NIGHTLY_SHOWS, {
+            'artists': max(1, VENUES // 10),
+            'venues': VENUES,
+            'first': max(first, month),
+            'last': min(last, partitions.add_months(month, 1) -
+                        timedelta(days=1))
+        })
+        db.session.commit()
+        month = partitions.add_months(month, 1)
+
+
+def scanned_partitions(query):
+    # The plan of a LIMITed, ordered scan lists every partition, but stops
+    # reading them once it has enough rows; the rest are never executed.
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    cursor = db.session.connection().connection.cursor()
+    cursor.execute('EXPLAIN (ANALYZE, TIMING OFF) ' + str(compiled),
+                   compiled.params)
+    return len({match for line, in cursor.fetchall()
+                if 'never executed' not in line
+                for match in SCANNED.findall(line)})
+
+
+def queries(now, rng_venue):
+    return [
+        ('venue page', lambda: venue_shows_query(rng_venue(), now)),
+        ('/shows', shows_query),
+        ('next 7 days', lambda: db.session.query(db.func.count(Show.id)).
+         filter(Show.start_time > now,
+                Show.start_time <= now + timedelta(days=7))),
+    ]
+
+
+def median_ms(build):
+    timings = []
+    for _ in range(REPEATS):
+        query = build()
+        started = time.perf_counter()
+        query.all()
+        timings.append(time.perf_counter() - started)
+        db.session.rollback()
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def main():
+    today = date.today()
+    now = datetime.combine(today, datetime.min.time())
+    venue_ids = iter(range(10 ** 9))
+
+    def rng_venue():
+        return next(venue_ids) % VENUES + 1
+
+    with app.test_request_context('/shows'):
+        reset_database()
+        insert(Artist.__table__, [{'id': i + 1, 'name': 'Artist {}'.format(
+            i + 1), 'seeking_venue': False}
+            for i in range(max(1, VENUES // 10))])
+        insert(Venue.__table__, [{'id': i + 1, 'name': 'Venue {}'.format(
+            i + 1), 'seeking_talent': False} for i in range(VENUES)])
+        add_shows(today, today + timedelta(days=UPCOMING_DAYS))
+
+        names = [name for name, _ in queries(now, rng_venue)]
+        print('{:>6} {:>12} {:>11}'.format('years', 'shows', 'partitions') +
+              ''.join(' {:>13} {:>5}'.format(name + ' ms', 'parts')
+                      for name in names))
+
+        for years in range(YEARS + 1):
+            if years:
+                add_shows(today - timedelta(days=365 * years),
+                          today - timedelta(days=365 * (years - 1) + 1))
+                db.session.execute('ANALYZE show')
+                db.session.commit()
+
+            shows = db.session.query(db.func.count(Show.id)).scalar()
+            line = '{:>6} {:>12} {:>11}'.format(
+                years, shows, len(partitions.partitioned_months()))
+            for _, build in queries(now, rng_venue):
+                line += ' {:>13.2f} {:>5}'.format(
+                    median_ms(build), scanned_partitions(build()))
+            print(line)
+            db.session.rollback()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+'''
+Compares the old ilike search, which counts upcoming shows with one query per
+hit, with the indexed search in search.py on 10k, 100k and 1M venues.
+
+Run from starter_code against a scratch Postgres database, which is wiped
+and migrated with `flask db upgrade` for every size:
+
+    BENCH_DATABASE_URL=postgres://localhost:5432/fyyur_bench \
+        python -m benchmarks.search_benchmark [size ...]
+'''
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from flask_migrate import upgrade
+
+from app import create_app
+from extensions import db
+from models import Venue, Artist, Show
+import search
+import counters
+
+app = create_app({'SQLALCHEMY_DATABASE_URI': os.environ.get(
+    'BENCH_DATABASE_URL', 'postgres://localhost:5432/fyyur_bench')})
+
+SIZES = [10000, 100000, 1000000]
+BATCH_SIZE = 10000
+REPEATS = 5
+TERMS = ['jazz', 'the blue', 'hall', 'sonic cellar', 'zz']
+
+WORDS = ['the', 'blue', 'jazz', 'room', 'hall', 'park', 'sonic', 'cellar',
+         'red', 'dueling', 'pianos', 'bar', 'musical', 'hop', 'wild', 'sax',
+         'band', 'city', 'lights', 'garden', 'club', 'house', 'stage', 'loft']
+
+
+def name(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).title()
+
+
+def reset_database():
+    db.session.execute('DROP SCHEMA public CASCADE')
+    db.session.execute('CREATE SCHEMA public')
+    db.session.commit()
+    upgrade()
+
+
+def insert(table, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(table.insert(), rows[start:start + BATCH_SIZE])
+    db.session.commit()
+
+
+def seed(size):
+    rng = random.Random(size)
+    num_artists = max(1, size // 10)
+    now = datetime.now()
+
+    insert(Artist.__table__, [{
+        'id': i + 1, 'name': name(rng), 'seeking_venue': False
+    } for i in range(num_artists)])
+    insert(Venue.__table__, [{
+        'id': i + 1, 'name': name(rng), 'seeking_talent': False
+    } for i in range(size)])
+    # At most one show a day per venue, a venue cannot be double booked.
+    booked = set()
+    while len(booked) < size:
+        booked.add((rng.randint(1, size), rng.randint(-365, 365)))
+    insert(Show.__table__, [{
+        'artist_id': rng.randint(1, num_artists),
+        'venue_id': venue_id,
+        'start_time': now + timedelta(days=day)
+    } for venue_id, day in sorted(booked)])
+
+    counters.check_counters(repair=True)
+    db.session.execute('ANALYZE')
+    db.session.commit()
+
+
+def legacy_search_venues(term):
+    search_results = Venue.query.filter(
+        Venue.name.ilike(f'%{term}%')).all()
+
+    return [{
+        "id": search_result.id,
+        "name": search_result.name,
+        "num_upcoming_shows": len(db.session.query(Artist, Show).
+                                  join(Show).join(Venue).
+                                  filter(
+            Show.venue_id == search_result.id,
+            Show.artist_id == Artist.id,
+            Show.start_time > datetime.now()
+        ).
+            all())
+    } for search_result in search_results]
+
+
+def best_time(search_venues):
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        for term in TERMS:
+            search_venues(term)
+            db.session.remove()
+        timings.append(time.perf_counter() - started)
+    return min(timings) / len(TERMS) * 1000
+
+
+def main(sizes):
+    print('{:>10} {:>14} {:>14} {:>9}'.format(
+        'venues', 'legacy ms', 'indexed ms', 'speedup'))
+
+    with app.app_context():
+        for size in sizes:
+            reset_database()
+            seed(size)
+
+            legacy = best_time(legacy_search_venues)
+            indexed = best_time(search.search_venues)
+            print('{:>10} {:>14.1f} {:>14.1f} {:>8.1f}x'.format(
+                size, legacy, indexed, legacy / indexed))
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or SIZES)
@@ -0,0 +1,79 @@
+'''
+Load-tests the read-only pages served by Flask's development server and by
+gunicorn with gunicorn_config.py, and reports requests per second and
+latency percentiles at every concurrency level, with gunicorn's gain over
+the development server.
+
+Run from starter_code against a scratch Postgres database, which is wiped,
+migrated and seeded first:
+
+    BENCH_DATABASE_URL=postgres://localhost:5432/fyyur_bench \
+        python -m benchmarks.server_benchmark [concurrency ...]
+
+gunicorn runs the workers and threads gunicorn_config.py derives for this
+machine, which are printed first; set WEB_CONCURRENCY and WEB_THREADS to
+try others. BENCH_SECONDS and BENCH_SIZE are as in asgi_benchmark. The
+page cache is turned off in both servers so every request reaches the
+database.
+'''
+import asyncio
+import os
+import subprocess
+import sys
+
+from benchmarks.asgi_benchmark import HOST, SECONDS, SIZE, load, percentile, \
+    wait_until_up
+from benchmarks.search_benchmark import app, reset_database, seed
+import gunicorn_config
+
+CONCURRENCY = [1, 16, 64]
+
+SERVERS = [
+    # Threaded, as `flask run` and app.run() serve by default.
+    ('flask run', 8103, ['flask', 'run', '--no-reload', '--host', HOST,
+                         '--port', '8103']),
+    ('gunicorn', 8104, ['gunicorn', '--config', 'gunicorn_config.py',
+                        '--bind', '{}:8104'.format(HOST), 'wsgi:app']),
+]
+
+
+def main(concurrency_levels):
+    with app.app_context():
+        reset_database()
+        seed(SIZE)
+
+    env = dict(os.environ,
+               DATABASE_URL=app.config['SQLALCHEMY_DATABASE_URI'],
+               CACHE_TYPE='null',
+               FLASK_APP='app')
+    env.pop('FLASK_ENV', None)
+    env.pop('FLASK_DEBUG', None)
+
+    print('gunicorn: {} workers of {} threads'.format(
+        gunicorn_config.workers, gunicorn_config.threads))
+    print('{:>10} {:>12} {:>10} {:>10} {:>10} {:>8} {:>8}'.format(
+        'server', 'concurrency', 'req/s', 'p50 ms', 'p99 ms', 'errors',
+        'gain'))
+
+    dev_rps = {}
+    for name, port, command in SERVERS:
+        server = subprocess.Popen(command, env=env)
+        try:
+            wait_until_up(port)
+            for concurrency in concurrency_levels:
+                latencies, errors = asyncio.run(load(port, concurrency))
+                rps = len(latencies) / SECONDS
+                baseline = dev_rps.setdefault(concurrency, rps)
+                print('{:>10} {:>12} {:>10.0f} {:>10.1f} {:>10.1f} {:>8} '
+                      '{:>7.1f}x'.format(
+                          name, concurrency, rps,
+                          percentile(latencies, 0.5) * 1000,
+                          percentile(latencies, 0.99) * 1000, errors,
+                          rps / baseline))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main([int(level) for level in sys.argv[1:]] or CONCURRENCY)
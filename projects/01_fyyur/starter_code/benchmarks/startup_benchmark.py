@@ -0,0 +1,154 @@
+'''
+Times how long a fresh interpreter takes to `import app` and to run
+create_app(), the work every worker and every test run pays before serving
+anything, and lists the packages whose imports cost the most, as reported
+by python -X importtime. Every run exits 1 when a stage's median is over
+its BUDGET_MS, or when startup imports one of DEFERRED, which the app only
+loads on first use. --save also writes the medians to startup_baseline.json
+next to this file; later runs on that machine print their change against
+it and exit 1 when a stage got more than TOLERANCE slower as well.
+
+Run from starter_code, no database is needed:
+
+    python -m benchmarks.startup_benchmark [--save]
+
+BENCH_RUNS (default 20) interpreters are started per stage.
+'''
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+RUNS = int(os.environ.get('BENCH_RUNS', '20'))
+TOLERANCE = 0.25
+# Milliseconds, about 1.5 times the medians of a development laptop, so
+# they hold on slower machines and still catch an eager import of a large
+# package.
+BUDGET_MS = {'import app': 1200, 'create_app()': 1400}
+TOP = 12
+BASELINE = os.path.join(os.path.dirname(__file__), 'startup_baseline.json')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFERRED = ['babel', 'dateutil.parser']
+
+STAGES = [
+    ('import app', 'import app'),
+    ('create_app()', 'import app\napp.create_app()'),
+]
+
+# Run with -X importtime, which reports every import on stderr, and report
+# the time taken by the statements and the modules loaded on stdout.
+SCRIPT = '''
+import sys
+import time
+started = time.perf_counter()
+{}
+print((time.perf_counter() - started) * 1000)
+print(' '.join(sys.modules))
+'''
+
+# import time: self [us] | cumulative | imported package, nested two spaces
+# per level.
+IMPORT_TIME = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| +(\S+)$')
+
+
+def run(statement):
+    '''
+    run(statement)
+        runs statement in a fresh interpreter and returns the milliseconds
+        it took, the microseconds spent importing each module it loaded
+        and the names of every module loaded
+    '''
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SCRIPT.format(statement)],
+        cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True)
+    milliseconds, modules = result.stdout.strip().splitlines()[-2:]
+    imports = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            imports[match.group(3)] = int(match.group(1))
+    return float(milliseconds), imports, set(modules.split())
+
+
+def measure(statement, preloaded):
+    timings = []
+    package_us = defaultdict(list)
+    modules = set()
+    for _ in range(RUNS):
+        milliseconds, imports, loaded = run(statement)
+        timings.append(milliseconds)
+        modules |= loaded
+        totals = defaultdict(int)
+        for name, self_us in imports.items():
+            if name not in preloaded:
+                totals[name.split('.')[0]] += self_us
+        for package, self_us in totals.items():
+            package_us[package].append(self_us)
+    packages = {package: statistics.median(values) / 1000
+                for package, values in package_us.items()}
+    return {
+        'median_ms': statistics.median(timings),
+        'min_ms': min(timings),
+        'modules': len(modules - preloaded)
+    }, packages, modules
+
+
+def change(result, baseline):
+    if baseline is None:
+        return ''
+    return '{:+.0%}'.format(result['median_ms'] / baseline['median_ms'] - 1)
+
+
+def main(save):
+    # Whatever the interpreter loads before running anything is left out.
+    _, _, preloaded = run('pass')
+
+    baseline = {}
+    if os.path.exists(BASELINE) and not save:
+        with open(BASELINE) as f:
+            baseline = json.load(f)['stages']
+
+    print('{:<14} {:>10} {:>10} {:>9} {:>9}'.format(
+        'stage', 'median ms', 'min ms', 'modules', 'vs'))
+    results = {}
+    regressions = []
+    for name, statement in STAGES:
+        result, packages, modules = measure(statement, preloaded)
+        results[name] = result
+        previous = baseline.get(name)
+        print('{:<14} {:>10.1f} {:>10.1f} {:>9} {:>9}'.format(
+            name, result['median_ms'], result['min_ms'], result['modules'],
+            change(result, previous)))
+        if result['median_ms'] > BUDGET_MS[name]:
+            regressions.append('{} over its {} ms budget'.format(
+                name, BUDGET_MS[name]))
+        if previous is not None and \
+                result['median_ms'] > previous['median_ms'] * (1 + TOLERANCE):
+            regressions.append(name)
+        regressions += ['{} imports {}'.format(name, module)
+                        for module in DEFERRED if module in modules]
+
+    print('\nSlowest packages to import in create_app():')
+    for package, milliseconds in sorted(packages.items(),
+                                        key=lambda item: -item[1])[:TOP]:
+        print('  {:<24} {:>8.1f} ms'.format(package, milliseconds))
+
+    if save:
+        with open(BASELINE, 'w') as f:
+            json.dump({'runs': RUNS, 'stages': results}, f, indent=2,
+                      sort_keys=True)
+            f.write('\n')
+        print('Saved the baseline to {}.'.format(BASELINE))
+    elif not os.path.exists(BASELINE):
+        print('No baseline yet, only the budgets were checked; run with '
+              '--save to record one.')
+    if regressions:
+        sys.exit('Startup regressed: ' + ', '.join(regressions))
+
+
+if __name__ == '__main__':
+    main('--save' in sys.argv[1:])
@@ -0,0 +1,93 @@
+from extensions import db
+from models import Show, SHOW_MAX_DURATION, live
+
+#----------------------------------------------------------------------------#
+# Bookings.
+#----------------------------------------------------------------------------#
+
+# A show is booked from start_time up to, not including, end_time. The
+# exclusion constraints of the show partitions, and the
+# show_venue_no_overlap trigger across them, reject a show overlapping
+# another at the same venue when it is inserted, so create_show_submission
+# only has to turn the violation into a message.
+# Artists may be booked twice at once, e.g. a festival set and a club night
+# listed before the times settle; conflicts() reports those for a date
+# window, and checks the venues the same way.
+
+CONSTRAINT_MESSAGES = {
+    'show_venue_no_overlap': 'The venue is already booked at that time.',
+    'ck_show_end_after_start': 'A show must end after it starts.',
+    'ck_show_max_duration': 'A show can last at most a week.',
+}
+
+KINDS = [('venue', 'venue_id'), ('artist', 'artist_id')]
+
+
+def violated_constraint(error):
+    # psycopg2 names the constraint of an IntegrityError in its diagnostics.
+    diag = getattr(error.orig, 'diag', None)
+    name = getattr(diag, 'constraint_name', None)
+    # Each show partition has its own <partition>_venue_no_overlap.
+    if name is not None and name.endswith('_venue_no_overlap'):
+        return 'show_venue_no_overlap'
+    return name
+
+
+def booked(show):
+    return db.func.tsrange(show.start_time, show.end_time)
+
+
+def overlapping(show, start, end):
+    # && on the booked range is answered from the GiST indexes over
+    # (venue_id, range) and (artist_id, range), and the bounds on
+    # start_time, implied by the overlap, prune the show partitions.
+    return db.and_(
+        booked(show).op('&&')(db.func.tsrange(start, end)),
+        show.start_time < end,
+        show.start_time > start - SHOW_MAX_DURATION)
+
+
+def conflicts_query(key, start, end):
+    '''
+    conflicts_query(key, start, end)
+        builds the query for the pairs of shows sharing key, venue_id or
+        artist_id, whose bookings overlap each other within [start, end)
+    '''
+    first = db.aliased(Show)
+    second = db.aliased(Show)
+
+    return db.session.query(
+        getattr(first, key),
+        first.id, first.start_time, first.end_time,
+        second.id, second.start_time, second.end_time
+    ). \
+        join(second, db.and_(
+            getattr(second, key) == getattr(first, key),
+            second.id > first.id,
+            overlapping(second, first.start_time, first.end_time))). \
+        filter(overlapping(first, start, end),
+               *live(first) + live(second)). \
+        order_by(first.start_time, first.id, second.id)
+
+
+def conflicts(start, end):
+    '''
+    conflicts(start, end)
+        returns the venue and artist double bookings within [start, end),
+        earliest first
+    '''
+    found = []
+    for kind, key in KINDS:
+        for booked_id, first_id, first_start, first_end, \
+                second_id, second_start, second_end \
+                in conflicts_query(key, start, end):
+            found.append({
+                'kind': kind,
+                key: booked_id,
+                'show_ids': [first_id, second_id],
+                'start_time': max(first_start, second_start),
+                'end_time': min(first_end, second_end)
+            })
+    found.sort(key=lambda conflict: (conflict['start_time'],
+                                     conflict['show_ids']))
+    return found
@@ -0,0 +1,283 @@
+import csv
+import io
+import json
+from datetime import datetime
+from itertools import islice
+
+from extensions import db
+from models import Venue, Artist, Show, SHOW_DURATION, live
+
+#----------------------------------------------------------------------------#
+# Bulk import and export.
+#----------------------------------------------------------------------------#
+
+# Rows are streamed in batches of batch_size, so memory stays bounded however
+# large the file is, and every batch is loaded with COPY. Shows may
+# reference their artist and venue by id (artist_id, venue_id) or by name
+# (artist, venue); names are resolved with one query per batch, and shows of
+# soft deleted artists or venues, waiting to be purged, are skipped like
+# unknown ones. Arrays such as genres are ';' separated in CSV and plain
+# lists in NDJSON.
+
+ENTITIES = {'venues': Venue, 'artists': Artist, 'shows': Show}
+FORMATS = ['csv', 'ndjson']
+
+# Derived columns, rebuilt by counters.check_counters() after a show import,
+# or set by the database and deletions.py.
+SKIPPED_COLUMNS = {'upcoming_shows_count', 'past_shows_count', 'updated_at',
+                   'deleted_at'}
+COPY_NULL = '\\N'
+ARRAY_SEPARATOR = ';'
+
+
+def columns_of(model):
+    return [column for column in model.__table__.columns
+            if column.name not in SKIPPED_COLUMNS]
+
+
+def batches(rows, batch_size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def read_rows(f, format):
+    if format == 'csv':
+        for row in csv.DictReader(f):
+            # CSV has no NULL, an empty cell stands for one.
+            yield {key: value if value != '' else None
+                   for key, value in row.items()}
+    else:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def convert(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, db.Boolean):
+        if isinstance(value, bool):
+            return value
+        return str(value).lower() in ('1', 't', 'true', 'y', 'yes')
+    if isinstance(column.type, db.Integer):
+        return int(value)
+    if isinstance(column.type, db.DateTime):
+        if isinstance(value, datetime):
+            return value
+        # Imported on first use, like in views.to_datetime.
+        import dateutil.parser
+        return dateutil.parser.parse(value)
+    if isinstance(column.type, db.ARRAY):
+        if isinstance(value, list):
+            return value
+        return [item for item in value.split(ARRAY_SEPARATOR) if item]
+    return str(value)
+
+
+def resolve_names(model, names):
+    '''
+    resolve_names(model, names)
+        maps every name to the lowest id of a live model row carrying it,
+        in one query
+    '''
+    if not names:
+        return {}
+    return dict(
+        db.session.query(model.name, db.func.min(model.id)).
+        filter(model.name.in_(names), *live(model)).
+        group_by(model.name).
+        all())
+
+
+def live_ids(model, ids):
+    '''
+    live_ids(model, ids)
+        returns those of ids whose model row exists and is not soft deleted,
+        in one query
+    '''
+    if not ids:
+        return set()
+    return {row_id for row_id, in
+            db.session.query(model.id).
+            filter(model.id.in_(ids), *live(model))}
+
+
+def resolve_show_references(batch):
+    '''
+    resolve_show_references(batch)
+        fills in artist_id and venue_id from the artist and venue names, and
+        returns the rows whose references resolved and the number that did
+        not
+    '''
+    references = [('artist', 'artist_id', Artist), ('venue', 'venue_id', Venue)]
+    names = {}
+    given = {}
+    for name_key, id_key, model in references:
+        names[name_key] = resolve_names(model, {
+            row[name_key] for row in batch
+            if row.get(id_key) is None and row.get(name_key) is not None})
+        given[id_key] = live_ids(model, {
+            int(row[id_key]) for row in batch if row.get(id_key) is not None})
+
+    resolved = []
+    for row in batch:
+        for name_key, id_key, model in references:
+            if row.get(id_key) is None:
+                row[id_key] = names[name_key].get(row.get(name_key))
+            elif int(row[id_key]) not in given[id_key]:
+                row[id_key] = None
+        if row['artist_id'] is not None and row['venue_id'] is not None:
+            resolved.append(row)
+
+    return resolved, len(batch) - len(resolved)
+
+
+def copy_value(value):
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return '{' + ','.join(
+            '"' + str(item).replace('\\', '\\\\').replace('"', '\\"') + '"'
+            for item in value) + '}'
+    return value
+
+
+def load_batch(table, columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([copy_value(row[column.name]) for column in columns])
+    buffer.seek(0)
+
+    connection = db.session.connection()
+    quote = connection.dialect.identifier_preparer.quote
+    cursor = connection.connection.cursor()
+    cursor.copy_expert(
+        "COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL '{}')".format(
+            quote(table.name),
+            ', '.join(quote(column.name) for column in columns),
+            COPY_NULL),
+        buffer)
+
+
+def reset_id_sequence(table):
+    db.session.execute(
+        "SELECT setval(pg_get_serial_sequence('{0}', 'id'), "
+        "coalesce(max(id), 1)) FROM {1}".format(
+            table.name,
+            db.session.connection().dialect.identifier_preparer.quote(
+                table.name)))
+
+
+def import_rows(entity, f, format, batch_size, progress=None):
+    '''
+    import_rows(entity, f, format, batch_size, progress)
+        loads the rows of one entity from an open CSV or NDJSON file,
+        committing every batch and calling progress(imported, skipped) after
+        it, and returns (imported, skipped)
+    '''
+    model = ENTITIES[entity]
+    table = model.__table__
+    imported = skipped = 0
+    given_ids = False
+
+    for batch in batches(read_rows(f, format), batch_size):
+        if model is Show:
+            batch, unresolved = resolve_show_references(batch)
+            skipped += unresolved
+
+        given_ids = given_ids or any(row.get('id') is not None
+                                     for row in batch)
+        columns = [column for column in columns_of(model)
+                   if column.name != 'id' or given_ids]
+        rows = []
+        for row in batch:
+            values = {column.name: convert(column, row.get(column.name))
+                      for column in columns}
+            for column in columns:
+                # Fill in Python side defaults, e.g. seeking_talent.
+                if values[column.name] is None and column.default is not None \
+                        and not callable(column.default.arg):
+                    values[column.name] = column.default.arg
+            # Exports from before end_time existed book the default length.
+            if model is Show and values['end_time'] is None \
+                    and values['start_time'] is not None:
+                values['end_time'] = values['start_time'] + SHOW_DURATION
+            rows.append(values)
+
+        if rows:
+            load_batch(table, columns, rows)
+        db.session.commit()
+
+        imported += len(rows)
+        if progress is not None:
+            progress(imported, skipped)
+
+    if given_ids:
+        reset_id_sequence(table)
+        db.session.commit()
+
+    return imported, skipped
+
+
+def export_value(value, format):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list) and format == 'csv':
+        return ARRAY_SEPARATOR.join(value)
+    return value
+
+
+def export_records(entity, format, batch_size):
+    '''
+    export_records(entity, format, batch_size)
+        yields the values of every row of one entity, ready to be written
+        as CSV or NDJSON, from a server side cursor fetching batch_size rows
+        at a time
+    '''
+    model = ENTITIES[entity]
+    rows = db.session.query(*columns_of(model)). \
+        filter(*live(model)). \
+        order_by(model.id). \
+        yield_per(batch_size)
+
+    for row in rows:
+        yield [export_value(value, format) for value in row]
+
+
+def export_rows(entity, f, format, batch_size, progress=None):
+    '''
+    export_rows(entity, f, format, batch_size, progress)
+        streams every row of one entity into an open file, calling
+        progress(exported) after every batch, and returns the number of rows
+        exported
+    '''
+    names = [column.name for column in columns_of(ENTITIES[entity])]
+    exported = 0
+
+    if format == 'csv':
+        writer = csv.writer(f)
+        writer.writerow(names)
+
+    for values in export_records(entity, format, batch_size):
+        if format == 'csv':
+            writer.writerow(values)
+        else:
+            f.write(json.dumps(dict(zip(names, values))) + '\n')
+
+        exported += 1
+        if progress is not None and exported % batch_size == 0:
+            progress(exported)
+
+    if progress is not None:
+        progress(exported)
+
+    return exported
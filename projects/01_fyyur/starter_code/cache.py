@@ -0,0 +1,345 @@
+import hashlib
+import math
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, request, session
+
+from routing import recently_wrote
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+# Rendered pages are stored under a key made of the request path and the
+# current version of every tag the page depends on, e.g. 'venues' or
+# 'venue:3'. Write handlers invalidate exactly the tags they touch by
+# dropping their versions, which makes every page built on the old versions
+# unreachable; those entries then age out of the backend on their own.
+#
+# The 'lru' backend lives in one process, so with several workers each one
+# only sees its own invalidations until CACHE_DEFAULT_TIMEOUT expires the
+# page. Use the 'filesystem' or 'redis' backend when running more than one.
+# Each app gets its own backend and counts, built from its own config.
+# Every page also depends on the ALL_PAGES tag, invalidated when something
+# all pages show changes, such as the built static files they link.
+#
+# Replicas may lag behind the write that invalidated a tag, so for
+# READ_YOUR_WRITES_SECONDS afterwards pages read from a replica are served
+# but not stored under the new version. A user who wrote within that window
+# bypasses the cache altogether, as routing sends their reads to the
+# primary.
+
+ALL_PAGES = 'pages'
+
+
+class NullCache(object):
+    '''
+    NullCache
+        a backend that stores nothing, for tests and for turning caching off
+    '''
+
+    def __init__(self):
+        self.evictions = 0
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def eviction_count(self):
+        return self.evictions
+
+
+class LRUCache(NullCache):
+    '''
+    LRUCache
+        an in-process backend holding at most threshold entries, evicting
+        the least recently used one first
+    '''
+
+    def __init__(self, threshold=500, default_timeout=300):
+        super().__init__()
+        self.threshold = threshold
+        self.default_timeout = default_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires and expires < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        if timeout is None:
+            timeout = self.default_timeout
+        with self._lock:
+            self._entries[key] = (time.time() + timeout if timeout else 0,
+                                  value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.threshold:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileSystemCache(NullCache):
+    '''
+    FileSystemCache
+        a backend keeping one pickle file per entry in directory, shared by
+        every process on the host, evicting the oldest files once there are
+        more than threshold
+    '''
+
+    def __init__(self, directory, threshold=500, default_timeout=300):
+        super().__init__()
+        self.directory = directory
+        self.threshold = threshold
+        self.default_timeout = default_timeout
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory,
+                            hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                expires, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires and expires < time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, timeout=None):
+        if timeout is None:
+            timeout = self.default_timeout
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((time.time() + timeout if timeout else 0, value), f)
+        os.replace(temp_path, self._path(key))
+        self._prune()
+
+    def _prune(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        if len(entries) <= self.threshold:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.threshold]:
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except OSError:
+                pass
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+
+class RedisCache(NullCache):
+    '''
+    RedisCache
+        a backend on any server speaking the Redis protocol, which does its
+        own eviction according to its maxmemory policy
+    '''
+
+    def __init__(self, url, default_timeout=300, key_prefix='fyyur:'):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError(
+                "CACHE_TYPE 'redis' needs the redis package: pip install redis")
+        self.client = redis.Redis.from_url(url)
+        self.default_timeout = default_timeout
+        self.key_prefix = key_prefix
+
+    def eviction_count(self):
+        return self.client.info('stats').get('evicted_keys', 0)
+
+    def get(self, key):
+        value = self.client.get(self.key_prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, timeout=None):
+        if timeout is None:
+            timeout = self.default_timeout
+        self.client.set(self.key_prefix + key, pickle.dumps(value),
+                        ex=timeout or None)
+
+    def delete(self, key):
+        self.client.delete(self.key_prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.key_prefix + '*'):
+            self.client.delete(key)
+
+
+def make_backend(config):
+    cache_type = config.get('CACHE_TYPE', 'lru')
+    default_timeout = config.get('CACHE_DEFAULT_TIMEOUT', 300)
+    threshold = config.get('CACHE_THRESHOLD', 500)
+
+    if cache_type == 'null':
+        return NullCache()
+    if cache_type == 'lru':
+        return LRUCache(threshold, default_timeout)
+    if cache_type == 'filesystem':
+        return FileSystemCache(
+            config.get('CACHE_DIR',
+                       os.path.join(tempfile.gettempdir(), 'fyyur-cache')),
+            threshold, default_timeout)
+    if cache_type == 'redis':
+        return RedisCache(config['CACHE_REDIS_URL'], default_timeout)
+    raise ValueError('Unknown CACHE_TYPE {!r}'.format(cache_type))
+
+
+class PageCacheState(object):
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = self.misses = 0
+
+
+class PageCache(object):
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['page_cache'] = PageCacheState(make_backend(app.config))
+
+    @property
+    def state(self):
+        return current_app.extensions['page_cache']
+
+    @property
+    def backend(self):
+        return self.state.backend
+
+    def stats(self):
+        state = self.state
+        return {
+            'hits': state.hits,
+            'misses': state.misses,
+            'evictions': state.backend.eviction_count()
+        }
+
+    def tag_version(self, tag):
+        version = self.backend.get('version:' + tag)
+        if version is None:
+            version = uuid.uuid4().hex
+            self.backend.set('version:' + tag, version, timeout=0)
+        return version
+
+    def invalidate(self, *tags):
+        window = current_app.config.get('READ_YOUR_WRITES_SECONDS', 5)
+        for tag in tags:
+            self.backend.delete('version:' + tag)
+            if window > 0:
+                self.backend.set('bumped:' + tag, True,
+                                 timeout=math.ceil(window))
+
+    def fillable(self, tags, kwargs):
+        '''
+        fillable(tags, kwargs)
+            whether the page just rendered may be stored: always when read
+            from the primary, from a replica only once none of its tags was
+            invalidated within READ_YOUR_WRITES_SECONDS
+        '''
+        if g.get('database_bind') is None:
+            return True
+        return not any(self.backend.get('bumped:' + tag.format(**kwargs))
+                       for tag in tags)
+
+    def page_key(self, tags, kwargs):
+        return 'page:{}:{}'.format(request.full_path, ':'.join(
+            self.tag_version(tag) for tag in
+            [tag.format(**kwargs) for tag in tags] + [ALL_PAGES]))
+
+    def lookup(self, key):
+        state = self.state
+        page = state.backend.get(key)
+        if page is None:
+            state.misses += 1
+        else:
+            state.hits += 1
+        return page
+
+    def store(self, key, page):
+        # Rendered pages, alone or with their headers, but no responses such
+        # as redirects or a 304.
+        body = page[0] if isinstance(page, tuple) else page
+        if isinstance(body, str):
+            self.backend.set(key, page)
+
+    def cached(self, *tags):
+        '''
+        cached(*tags)
+            caches the page a view renders under the given tags, which are
+            formatted with the view arguments, e.g. 'venue:{venue_id}'
+        '''
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                # Pages carrying flashed messages are personal, don't share
+                # them, and a user who just wrote must read their write.
+                if '_flashes' in session or recently_wrote():
+                    return view(**kwargs)
+
+                key = self.page_key(tags, kwargs)
+                page = self.lookup(key)
+                if page is None:
+                    page = view(**kwargs)
+                    if self.fillable(tags, kwargs):
+                        self.store(key, page)
+                return page
+            return wrapper
+        return decorator
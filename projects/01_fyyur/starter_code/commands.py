@@ -0,0 +1,249 @@
+import gzip
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from cache import ALL_PAGES
+from extensions import page_cache
+import assets
+import bulk
+import counters
+import deletions
+import partitions
+import synthetic
+import venue_areas
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+fyyur_cli = AppGroup('fyyur', help='Fyyur maintenance commands.')
+
+
+@fyyur_cli.command('roll-forward-counters')
+def roll_forward_counters():
+    """Move shows that have started into the past show counters.
+
+    Run this periodically, e.g. every few minutes from cron. Until it runs,
+    shows that have started are still counted as upcoming.
+    """
+    rolled_forward_at = counters.roll_forward()
+    venue_areas.refresh()
+    click.echo('Show counters rolled forward to {}.'.format(rolled_forward_at))
+
+
+@fyyur_cli.command('check-counters')
+@click.option('--repair', is_flag=True,
+              help='Overwrite drifted counters with the recomputed counts.')
+def check_counters(repair):
+    """Recompute the show counters and report any that drifted."""
+    drifted = counters.check_counters(repair=repair)
+    if drifted and repair:
+        venue_areas.refresh()
+
+    for model, model_id, stored, actual in drifted:
+        click.echo('{} {}: upcoming/past stored {}/{}, actual {}/{}{}'.format(
+            model, model_id, stored[0], stored[1], actual[0], actual[1],
+            ' (repaired)' if repair else ''))
+    click.echo('{} drifted counter rows.'.format(len(drifted)))
+
+    if drifted and not repair:
+        sys.exit(1)
+
+
+@fyyur_cli.command('refresh-venue-areas')
+def refresh_venue_areas():
+    """Refresh the venue_area view behind /venues.
+
+    Writes through the app refresh it shortly afterwards on their own; run
+    this from cron to pick up changes made around the app as well.
+    """
+    venue_areas.refresh()
+    click.echo('venue_area refreshed.')
+
+
+@fyyur_cli.command('purge-deleted')
+@click.option('--batch-size', type=int,
+              help='Defaults to PURGE_BATCH_SIZE.')
+def purge_deleted(batch_size):
+    """Delete the deleted venues and artists for good, with their shows.
+
+    Deletes through the app purge the row in the background; run this from
+    cron to finish any purge a restart cut short.
+    """
+    def report(model, row_id, purged):
+        click.echo('{} {}: {} shows deleted'.format(
+            model.__tablename__, row_id, purged))
+
+    purged = deletions.purge_all(
+        batch_size or current_app.config['PURGE_BATCH_SIZE'], report)
+    click.echo('{} deleted rows purged.'.format(purged))
+
+
+@fyyur_cli.command('create-show-partitions')
+@click.option('--months-ahead', type=int,
+              help='Defaults to SHOW_PARTITION_MONTHS_AHEAD.')
+def create_show_partitions(months_ahead):
+    """Add the monthly show partitions up to some months ahead.
+
+    Run this monthly from cron. Shows booked further ahead wait in
+    show_default, and move to their month's partition once it is created.
+    """
+    created = partitions.ensure(
+        current_app.config['SHOW_PARTITION_MONTHS_AHEAD']
+        if months_ahead is None else months_ahead)
+    for name in created:
+        click.echo('Created {}.'.format(name))
+    click.echo('{} show partitions created.'.format(len(created)))
+
+
+@fyyur_cli.command('archive-shows')
+@click.option('--before', required=True,
+              type=click.DateTime(formats=['%Y-%m']),
+              help='First month to keep, as YYYY-MM.')
+@click.option('--to', 'directory', type=click.Path(file_okay=False),
+              help='Write each month to a gzipped CSV here and drop it.')
+def archive_shows(before, directory):
+    """Take the show partitions of old months out of the show table.
+
+    Without --to the partitions are only detached and stay behind as plain
+    tables. Either way their shows no longer count on the venue and artist
+    pages; `flask fyyur import shows <file>.csv.gz` brings a month back.
+    """
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+
+    def report(name, path):
+        click.echo('Archived {}{}.'.format(
+            name, ' to ' + path if path else ''))
+
+    archived = partitions.archive(before, directory, report)
+    click.echo('{} show partitions archived.'.format(len(archived)))
+
+
+@fyyur_cli.command('build-assets')
+def build_assets():
+    """Fingerprint and precompress the static files into static/dist.
+
+    Run it on every deploy, before the app starts: pages link the built
+    files from then on, and browsers cache them for a year.
+    """
+    built = assets.build(current_app.static_folder)
+    current_app.extensions['assets'] = assets.AssetsState(built)
+    # Cached pages link the files of the previous build.
+    page_cache.invalidate(ALL_PAGES)
+    click.echo('Built {} assets into static/{}.'.format(
+        len(built), assets.BUILD_DIR))
+
+
+def open_file(path, mode):
+    if path == '-':
+        return nullcontext(
+            click.get_text_stream('stdin' if mode == 'r' else 'stdout'))
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', newline='', encoding='utf-8')
+    return open(path, mode, newline='', encoding='utf-8')
+
+
+def file_format(path, format):
+    if format is not None:
+        return format
+    if path.endswith('.gz'):
+        path = path[:-len('.gz')]
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    return 'ndjson' if extension in ('ndjson', 'jsonl') else 'csv'
+
+
+def rate_reporter(entity, started):
+    def report(rows, skipped=0):
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        click.echo('{}: {} rows{}, {:.0f} rows/s'.format(
+            entity, rows,
+            ' ({} skipped)'.format(skipped) if skipped else '',
+            rows / elapsed), err=True)
+    return report
+
+
+@fyyur_cli.command('import')
+@click.argument('entity', type=click.Choice(sorted(bulk.ENTITIES)))
+@click.argument('path')
+@click.option('--format', 'format', type=click.Choice(bulk.FORMATS),
+              help='Defaults to ndjson for .ndjson/.jsonl files, else csv.')
+@click.option('--batch-size', default=10000, show_default=True)
+def import_command(entity, path, format, batch_size):
+    """Load venues, artists or shows from a CSV or NDJSON file ('-' for
+    stdin).
+
+    Shows reference their artist and venue by artist_id and venue_id, or by
+    name in artist and venue columns; rows that resolve to no live artist
+    or venue are skipped. Importing shows recomputes the show counters afterwards.
+    """
+    with open_file(path, 'r') as f:
+        imported, skipped = bulk.import_rows(
+            entity, f, file_format(path, format), batch_size,
+            rate_reporter(entity, time.perf_counter()))
+
+    if entity == 'shows':
+        counters.check_counters(repair=True)
+        # The shows may land on any venue or artist page.
+        page_cache.invalidate(ALL_PAGES)
+    elif entity == 'artists':
+        page_cache.invalidate('artists')
+    if entity in ('venues', 'shows'):
+        venue_areas.refresh()
+    click.echo('Imported {} {}, skipped {}.'.format(imported, entity, skipped))
+
+
+@fyyur_cli.command('export')
+@click.argument('entity', type=click.Choice(sorted(bulk.ENTITIES)))
+@click.argument('path')
+@click.option('--format', 'format', type=click.Choice(bulk.FORMATS),
+              help='Defaults to ndjson for .ndjson/.jsonl files, else csv.')
+@click.option('--batch-size', default=10000, show_default=True)
+def export_command(entity, path, format, batch_size):
+    """Write every venue, artist or show to a CSV or NDJSON file ('-' for
+    stdout)."""
+    with open_file(path, 'w') as f:
+        exported = bulk.export_rows(
+            entity, f, file_format(path, format), batch_size,
+            rate_reporter(entity, time.perf_counter()))
+
+    click.echo('Exported {} {}.'.format(exported, entity), err=True)
+
+
+@fyyur_cli.command('generate')
+@click.option('--venues', default=1000, show_default=True)
+@click.option('--artists', type=int,
+              help='Defaults to a tenth of the venues.')
+@click.option('--shows', type=int, help='Defaults to ten per venue.')
+@click.option('--seed', default=0, show_default=True)
+@click.option('--centre', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Middle of the two years of shows, defaults to today.')
+@click.option('--batch-size', default=10000, show_default=True)
+def generate_command(venues, artists, shows, seed, centre, batch_size):
+    """Add production-like venues, artists and shows.
+
+    The same --seed and --centre always give the same rows, e.g. for
+    benchmarks and load tests.
+    """
+    if artists is None:
+        artists = max(1, venues // 10)
+    if shows is None:
+        shows = venues * 10
+    started = time.perf_counter()
+
+    def progress(table, rows):
+        rate_reporter(table, started)(rows)
+
+    try:
+        synthetic.generate(venues, artists, shows, seed,
+                           centre and centre.date(), batch_size, progress)
+    except ValueError as error:
+        raise click.BadParameter(str(error))
+    click.echo('Generated {} venues, {} artists and {} shows.'.format(
+        venues, artists, shows))
@@ -1,4 +1,7 @@
 import os
+
+from pools import pgbouncer
+
 SECRET_KEY = os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -6,5 +9,49 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 # Enable debug mode.
 DEBUG = True
 
-SQLALCHEMY_DATABASE_URI = 'postgres://philliphogan@localhost:5432/fyyur'
+# Postgres only: the schema relies on its arrays, partitioning, exclusion
+# constraints and materialized views, and search on pg_trgm.
+SQLALCHEMY_DATABASE_URI = os.environ.get(
+    'DATABASE_URL', 'postgres://philliphogan@localhost:5432/fyyur')
 SQLALCHEMY_TRACK_MODIFICATIONS = 'False'
+
+# Blueprints create_app() imports and registers, as 'module:name'.
+BLUEPRINTS = ['api:api']
+
+# Past shows loaded per page on the venue and artist detail pages.
+PAST_SHOWS_PER_PAGE = 10
+# Writes refresh the venue_area view behind /venues at most this often.
+VENUE_AREA_REFRESH_SECONDS = 5
+# Deleted venues and artists have their shows purged this many per
+# transaction, by a background thread unless PURGE_IN_BACKGROUND is off.
+PURGE_BATCH_SIZE = 1000
+PURGE_IN_BACKGROUND = True
+# `flask fyyur create-show-partitions` keeps the show table partitioned
+# this many months ahead.
+SHOW_PARTITION_MONTHS_AHEAD = 12
+
+# Page cache backend: 'lru' (per process), 'filesystem', 'redis' or 'null'.
+CACHE_TYPE = os.environ.get('CACHE_TYPE', 'lru')
+CACHE_DEFAULT_TIMEOUT = 300
+CACHE_THRESHOLD = 500
+CACHE_DIR = os.path.join(basedir, '.cache')
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+# Read replicas, one bind per REPLICA_<NAME>_URL environment variable. The
+# read-only pages are routed to the binds listed in SQLALCHEMY_REPLICA_BINDS.
+SQLALCHEMY_BINDS = {
+    key[:-len('_URL')].lower(): url for key, url in os.environ.items()
+    if key.startswith('REPLICA_') and key.endswith('_URL')
+}
+SQLALCHEMY_REPLICA_BINDS = sorted(SQLALCHEMY_BINDS)
+# Seconds a user keeps reading from the primary after writing.
+READ_YOUR_WRITES_SECONDS = 5
+
+# Connection pools, for the primary and every replica, are set by the
+# DB_* environment variables read by pools.py, for server databases only.
+# Options given here take precedence.
+DB_PGBOUNCER = pgbouncer()
+SQLALCHEMY_ENGINE_OPTIONS = {}
+
+# Statements slower than this are logged with their route and parameters.
+SLOW_QUERY_SECONDS = float(os.environ.get('SLOW_QUERY_SECONDS', '0.1'))
@@ -0,0 +1,170 @@
+from datetime import datetime
+
+from extensions import db
+from models import Venue, Artist, Show, ShowCounterState, live
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+# Venue and Artist carry denormalized upcoming_shows_count and
+# past_shows_count columns. They are exact as of the watermark stored in
+# ShowCounterState: a show is upcoming if it starts after the watermark and
+# past otherwise. Writes adjust the counters in the same transaction as the
+# shows they add or remove, and roll_forward() periodically advances the
+# watermark, moving the shows that have started since then into the past
+# counts. check_counters() recomputes everything to detect and repair drift,
+# e.g. after bulk loads that bypass the write handlers. The shows of a soft
+# deleted venue or artist are uncounted when it is deleted and never
+# counted again while they wait to be purged.
+
+COUNTED = [(Venue, Show.venue_id), (Artist, Show.artist_id)]
+
+
+def watermark(for_update=False):
+    '''
+    watermark(for_update)
+        returns the time the counters are exact at, share locking it so it
+        cannot move until the transaction ends, or locking it exclusively
+        for_update
+    '''
+    state = ShowCounterState.query. \
+        filter_by(id=1). \
+        with_for_update(read=not for_update). \
+        one_or_none()
+
+    if state is None:
+        state = ShowCounterState(id=1, rolled_forward_at=datetime.now())
+        db.session.add(state)
+        db.session.flush()
+
+    return state
+
+
+def count_shows(show_column, rolled_forward_at, *criteria):
+    return db.session.query(
+        show_column.label('id'),
+        db.func.sum(db.case([(Show.start_time > rolled_forward_at, 1)],
+                            else_=0)).label('upcoming'),
+        db.func.sum(db.case([(Show.start_time <= rolled_forward_at, 1)],
+                            else_=0)).label('past')
+    ). \
+        filter(*live(Show), *criteria). \
+        group_by(show_column). \
+        subquery()
+
+
+def adjust_counters(model, counts, upcoming, past):
+    table = model.__table__
+    db.session.execute(
+        table.update().
+        where(table.c.id == counts.c.id).
+        values(
+            upcoming_shows_count=table.c.upcoming_shows_count + upcoming,
+            past_shows_count=table.c.past_shows_count + past
+        )
+    )
+
+
+def record_show(show):
+    '''
+    record_show(show)
+        counts a show being added in the current session, raising
+        LookupError when its venue or artist is missing or deleted
+    '''
+    column = 'upcoming_shows_count' \
+        if show.start_time > watermark().rolled_forward_at \
+        else 'past_shows_count'
+
+    for model, show_column in COUNTED:
+        model_id = getattr(show, show_column.key)
+        counted = model.query. \
+            filter(model.id == model_id, *live(model)). \
+            update({column: getattr(model, column) + 1},
+                   synchronize_session=False)
+        if not counted:
+            raise LookupError('No {} {}'.format(model.__tablename__, model_id))
+
+
+def forget_shows(*criteria):
+    '''
+    forget_shows(*criteria)
+        uncounts the shows matching criteria, which are about to be deleted
+        in the current session, e.g. by a cascading venue delete
+    '''
+    rolled_forward_at = watermark().rolled_forward_at
+
+    for model, show_column in COUNTED:
+        counts = count_shows(show_column, rolled_forward_at, *criteria)
+        adjust_counters(model, counts, -counts.c.upcoming, -counts.c.past)
+
+
+def roll_forward(now=None):
+    '''
+    roll_forward(now)
+        moves the shows that started since the last roll forward from the
+        upcoming to the past counters and commits
+    '''
+    now = now or datetime.now()
+    state = watermark(for_update=True)
+
+    if now > state.rolled_forward_at:
+        for model, show_column in COUNTED:
+            # Every show in the window started after the old watermark, so
+            # count_shows() reports them all as upcoming.
+            counts = count_shows(
+                show_column, state.rolled_forward_at,
+                Show.start_time > state.rolled_forward_at,
+                Show.start_time <= now
+            )
+            adjust_counters(model, counts, -counts.c.upcoming,
+                            counts.c.upcoming)
+        state.rolled_forward_at = now
+
+    db.session.commit()
+    return state.rolled_forward_at
+
+
+def check_counters(repair=False):
+    '''
+    check_counters(repair)
+        recomputes every counter and returns the rows that drifted as
+        (model name, id, stored counts, actual counts), fixing them if
+        repair is set
+    '''
+    state = watermark(for_update=repair)
+    drifted = []
+
+    for model, show_column in COUNTED:
+        counts = count_shows(show_column, state.rolled_forward_at)
+        upcoming = db.func.coalesce(counts.c.upcoming, 0)
+        past = db.func.coalesce(counts.c.past, 0)
+
+        rows = db.session.query(
+            model.id,
+            model.upcoming_shows_count,
+            model.past_shows_count,
+            upcoming,
+            past
+        ). \
+            outerjoin(counts, counts.c.id == model.id). \
+            filter(
+            (model.upcoming_shows_count != upcoming) |
+            (model.past_shows_count != past)
+        ). \
+            all()
+
+        for model_id, stored_upcoming, stored_past, actual_upcoming, actual_past in rows:
+            drifted.append((model.__name__, model_id,
+                            (stored_upcoming, stored_past),
+                            (actual_upcoming, actual_past)))
+            if repair:
+                model.query. \
+                    filter_by(id=model_id). \
+                    update({
+                        'upcoming_shows_count': actual_upcoming,
+                        'past_shows_count': actual_past
+                    }, synchronize_session=False)
+
+    db.session.commit()
+    return drifted
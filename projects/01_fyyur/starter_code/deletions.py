@@ -0,0 +1,155 @@
+import threading
+
+from flask import current_app
+
+from extensions import db
+from models import Venue, Artist, Show, live
+import counters
+
+#----------------------------------------------------------------------------#
+# Deletions.
+#----------------------------------------------------------------------------#
+
+# Deleting a venue or an artist only sets its deleted_at, which hides it and
+# its shows from every page at once, and takes its shows off the counters of
+# the artists or venues they were booked with. A background thread then
+# deletes the shows PURGE_BATCH_SIZE at a time, each batch in its own short
+# transaction, so no single statement holds locks on a venue's whole
+# history, and deletes the row itself last. Purges in progress are reported
+# in the log and on /metrics. A purge cut short, e.g. by a restart, is
+# finished by `flask fyyur purge-deleted`, which can also run from cron.
+
+SHOW_COLUMNS = {Venue: Show.venue_id, Artist: Show.artist_id}
+
+_lock = threading.Lock()
+# (table, id) of each purge in progress to the shows it has deleted.
+progress = {}
+
+
+def soft_delete(model, row_id):
+    '''
+    soft_delete(model, row_id)
+        hides a venue or artist, or aborts with 404 when there is no such
+        row, and uncounts its shows in the current session
+    '''
+    # Locked so that a show being added to the row waits for the delete,
+    # then finds the row gone in counters.record_show.
+    row = model.query. \
+        filter(model.id == row_id, *live(model)). \
+        with_for_update(). \
+        first_or_404()
+
+    counters.forget_shows(SHOW_COLUMNS[model] == row.id)
+    row.deleted_at = db.func.now()
+    return row
+
+
+def purge_batch(model, row_id, batch_size):
+    column = SHOW_COLUMNS[model]
+    # Oldest first, up to a bound on start_time, so that Postgres prunes
+    # the show partitions past the batch.
+    last = db.session.query(Show.start_time). \
+        filter(column == row_id). \
+        order_by(Show.start_time). \
+        offset(batch_size - 1). \
+        limit(1). \
+        scalar()
+    shows = Show.query.filter(column == row_id)
+    if last is not None:
+        shows = shows.filter(Show.start_time <= last)
+    purged = shows.delete(synchronize_session=False)
+    db.session.commit()
+    return purged
+
+
+def purge(model, row_id, batch_size, report=None):
+    '''
+    purge(model, row_id, batch_size, report)
+        deletes the shows of a soft deleted venue or artist batch_size at a
+        time, calling report(purged) after every batch, then the row itself,
+        and returns the number of shows deleted
+    '''
+    key = (model.__tablename__, row_id)
+    purged = 0
+    try:
+        while True:
+            batch = purge_batch(model, row_id, batch_size)
+            purged += batch
+            with _lock:
+                progress[key] = purged
+            if report is not None:
+                report(purged)
+            if batch < batch_size:
+                break
+
+        # Any show added since goes with the row through ON DELETE CASCADE.
+        model.query. \
+            filter(model.id == row_id, model.deleted_at.isnot(None)). \
+            delete(synchronize_session=False)
+        db.session.commit()
+    finally:
+        with _lock:
+            progress.pop(key, None)
+    return purged
+
+
+def pending():
+    return [(model, row_id) for model in SHOW_COLUMNS
+            for row_id, in db.session.query(model.id).
+            filter(model.deleted_at.isnot(None)).
+            order_by(model.id)]
+
+
+def purge_all(batch_size, report=None):
+    '''
+    purge_all(batch_size, report)
+        purges every soft deleted venue and artist, calling
+        report(model, id, purged) after every batch, and returns how many
+        rows were purged
+    '''
+    rows = pending()
+    for model, row_id in rows:
+        purge(model, row_id, batch_size,
+              report and (lambda purged: report(model, row_id, purged)))
+    return len(rows)
+
+
+def purge_in_background(app, model, row_id):
+    def report(purged):
+        app.logger.info('Purging %s %s: %d shows deleted',
+                        model.__tablename__, row_id, purged)
+
+    with app.app_context():
+        try:
+            purge(model, row_id, app.config.get('PURGE_BATCH_SIZE', 1000),
+                  report)
+        except:
+            # The row stays hidden, purge-deleted picks it up again.
+            db.session.rollback()
+            app.logger.exception('Purging %s %s failed',
+                                 model.__tablename__, row_id)
+        finally:
+            db.session.remove()
+
+
+def purge_later(model, row_id):
+    '''
+    purge_later(model, row_id)
+        purges a soft deleted venue or artist in a background thread, or
+        right away when PURGE_IN_BACKGROUND is off
+    '''
+    if not current_app.config.get('PURGE_IN_BACKGROUND', True):
+        purge(model, row_id, current_app.config.get('PURGE_BATCH_SIZE', 1000))
+        return
+
+    thread = threading.Thread(
+        target=purge_in_background,
+        args=(current_app._get_current_object(), model, row_id))
+    thread.daemon = True
+    thread.start()
+
+
+def progress_samples():
+    with _lock:
+        return {(('table', table), ('id', row_id)): purged
+                for (table, row_id), purged in progress.items()}
@@ -0,0 +1,18 @@
+from flask_migrate import Migrate
+from flask_moment import Moment
+
+from cache import PageCache
+from routing import RoutingSQLAlchemy
+
+#----------------------------------------------------------------------------#
+# Extensions.
+#----------------------------------------------------------------------------#
+
+# Created unbound, so that models.py and the modules around it can import
+# them without building an app; create_app() in app.py binds them to each
+# app it creates. Each app keeps its own engines and page cache backend.
+
+db = RoutingSQLAlchemy()
+migrate = Migrate()
+moment = Moment()
+page_cache = PageCache()
@@ -7,12 +7,20 @@ from fabric.contrib.console import confirm
 def test():
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python test_app.py -v", capture=True
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
 
 
+def startup_test():
+    # Fails when startup imports babel or dateutil.parser, goes over the
+    # BUDGET_MS of benchmarks/startup_benchmark.py or, once `python -m
+    # benchmarks.startup_benchmark --save` has recorded
+    # benchmarks/startup_baseline.json on this machine, got slower than it.
+    local("python -m benchmarks.startup_benchmark")
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
@@ -39,9 +47,7 @@ def heroku():
 
 
 def heroku_test():
-    local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
-    )
+    local("heroku run python test_app.py -v")
 
 
 def deploy():
@@ -0,0 +1,70 @@
+from extensions import db, page_cache
+from models import Venue, Artist, live
+
+#----------------------------------------------------------------------------#
+# Genres.
+#----------------------------------------------------------------------------#
+
+# /venues and /artists keep the rows carrying every ?genre= given. The
+# filter is an array containment (genres @> ARRAY[...]) so it is answered
+# from the ix_venue_genres and ix_artist_genres GIN indexes. The per-genre
+# counts shown next to the listings are cached under the same tags as the
+# pages, so the write handlers that refresh a listing refresh its counts
+# too.
+
+TAGS = {Venue: 'venues', Artist: 'artists'}
+
+
+def with_genres(query, model, genres):
+    if not genres:
+        return query
+    return query.filter(model.genres.contains(genres))
+
+
+def genre_counts_query(model, genres):
+    '''
+    genre_counts_query(model, genres)
+        builds the query counting, per genre, the venues or artists that
+        carry it among those carrying every one of genres
+    '''
+    unnested = with_genres(
+        db.session.query(db.func.unnest(model.genres).label('genre')).
+        filter(*live(model)),
+        model, genres). \
+        subquery()
+
+    return db.session.query(
+        unnested.c.genre,
+        db.func.count().label('count')
+    ). \
+        group_by(unnested.c.genre). \
+        order_by(unnested.c.genre)
+
+
+def counts_key(model, genres):
+    return 'genres:{}:{}:{}'.format(
+        TAGS[model], page_cache.tag_version(TAGS[model]),
+        '|'.join(sorted(genres)))
+
+
+def cached_genre_counts(model, genres):
+    return page_cache.backend.get(counts_key(model, genres))
+
+
+def store_genre_counts(model, genres, counts):
+    counts = [(genre, count) for genre, count in counts]
+    page_cache.backend.set(counts_key(model, genres), counts)
+    return counts
+
+
+def genre_counts(model, genres):
+    '''
+    genre_counts(model, genres)
+        returns the cached [(genre, count)] of genre_counts_query, running
+        it on a miss
+    '''
+    counts = cached_genre_counts(model, genres)
+    if counts is None:
+        counts = store_genre_counts(
+            model, genres, genre_counts_query(model, genres).all())
+    return counts
@@ -0,0 +1,123 @@
+'''
+gunicorn settings for serving Fyyur in production:
+
+    gunicorn --config gunicorn_config.py wsgi:app
+
+The app is imported once in the master and forked into the workers, which
+share its memory copy-on-write and start serving at once; the master's
+objects are frozen out of the garbage collector first, which would
+otherwise touch, and so copy, every page they live on. Each worker runs
+WEB_THREADS threads, by default as many as the connections its pool keeps
+open, and WEB_CONCURRENCY workers, by default two per CPU plus one, but no
+more than DB_MAX_CONNECTIONS allows with every pool full. Workers are
+recycled, finishing their requests first, after about WORKER_MAX_REQUESTS
+requests or once their resident memory, pages shared with the master
+included, passes WORKER_MAX_MEMORY_MB.
+
+`kill -HUP <master>` rereads these settings and replaces the workers
+gracefully, but as the app is preloaded it keeps running the code loaded
+at startup. To deploy new code without dropping requests, `kill -USR2` the
+master, which starts a new master and workers next to the old ones, then
+`kill -WINCH` the old master to stop its workers gracefully and
+`kill -QUIT` it once they are gone.
+'''
+import gc
+import multiprocessing
+import os
+import resource
+import sys
+
+from config import DB_PGBOUNCER, SQLALCHEMY_DATABASE_URI, \
+    SQLALCHEMY_ENGINE_OPTIONS
+from pools import engine_options
+
+#----------------------------------------------------------------------------#
+# Workers.
+#----------------------------------------------------------------------------#
+
+
+def cpu_count():
+    # The CPUs this process may run on, which a container can limit.
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+# Connections a worker's pool keeps open, and may open in all, per database.
+POOL_OPTIONS = dict(engine_options(SQLALCHEMY_DATABASE_URI),
+                    **SQLALCHEMY_ENGINE_OPTIONS)
+POOL_SIZE = POOL_OPTIONS.get('pool_size', 5)
+POOL_CONNECTIONS = POOL_SIZE + POOL_OPTIONS.get('max_overflow', 10)
+# Connections all the workers may open per database, leaving room under
+# Postgres' default max_connections of 100 for migrations and commands.
+DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', '90'))
+WORKER_MAX_MEMORY_MB = int(os.environ.get('WORKER_MAX_MEMORY_MB', '512'))
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+bind = os.environ.get('BIND',
+                      '0.0.0.0:{}'.format(os.environ.get('PORT', '8000')))
+worker_class = 'gthread'
+# A thread holds a connection while it serves a request, so with no more
+# threads than the pool keeps open, requests never wait on the pool and
+# the overflow is left to the background refreshes and purges.
+threads = int(os.environ.get('WEB_THREADS',
+                             4 if DB_PGBOUNCER else POOL_SIZE))
+workers = int(os.environ.get('WEB_CONCURRENCY', '0')) or \
+    2 * cpu_count() + 1
+if not DB_PGBOUNCER:
+    # PgBouncer, when used, caps the connections itself.
+    workers = max(1, min(workers, DB_MAX_CONNECTIONS // POOL_CONNECTIONS))
+
+preload_app = True
+max_requests = int(os.environ.get('WORKER_MAX_REQUESTS', '5000'))
+# Spread out, so the workers are not all recycled at once.
+max_requests_jitter = max_requests // 10
+timeout = int(os.environ.get('WEB_TIMEOUT', '30'))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+#----------------------------------------------------------------------------#
+# Hooks.
+#----------------------------------------------------------------------------#
+
+
+def worker_memory_mb():
+    # Resident set size, from /proc where there is one, else the peak.
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE / 2 ** 20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # In bytes on macOS, kilobytes elsewhere.
+        return peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+
+
+def when_ready(server):
+    server.log.info('Serving with %d workers of %d threads', workers, threads)
+
+
+def pre_fork(server, worker):
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Connections the master may have opened must not be shared, every
+    # worker opens its own.
+    from extensions import db
+
+    app = server.app.wsgi()
+    with app.app_context():
+        for bind in [None] + list(app.config['SQLALCHEMY_BINDS'] or []):
+            db.get_engine(app, bind).dispose()
+
+
+def post_request(worker, req, environ, resp):
+    memory_mb = worker_memory_mb()
+    if worker.alive and memory_mb > WORKER_MAX_MEMORY_MB:
+        worker.log.info('Worker %s uses %.0f MB, more than '
+                        'WORKER_MAX_MEMORY_MB, recycling it',
+                        worker.pid, memory_mb)
+        # Stops accepting requests, finishes those in progress and exits;
+        # the master starts a new worker in its place.
+        worker.alive = False
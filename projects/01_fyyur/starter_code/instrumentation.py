@@ -0,0 +1,230 @@
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+#----------------------------------------------------------------------------#
+# Instrumentation.
+#----------------------------------------------------------------------------#
+
+# Every statement on every engine, the replicas included, is timed. The
+# count and total time are added up per request, returned in a
+# Server-Timing header and accumulated per endpoint for /metrics.
+# Statements slower than SLOW_QUERY_SECONDS are logged with their route and
+# parameters. Pools report how long checkouts wait and how many connections
+# are in use. The metrics live in the process, so with several workers each
+# one reports its own.
+
+
+class Metrics(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.request_seconds = defaultdict(float)
+        self.queries = defaultdict(int)
+        self.query_seconds = defaultdict(float)
+        self.slow_queries = defaultdict(int)
+        self.checkouts = 0
+        self.checkout_wait_seconds = 0.0
+
+    def record_request(self, endpoint, method, status, seconds, queries,
+                       query_seconds):
+        with self._lock:
+            self.requests[(endpoint, method, status)] += 1
+            self.request_seconds[endpoint] += seconds
+            self.queries[endpoint] += queries
+            self.query_seconds[endpoint] += query_seconds
+
+    def record_slow_query(self, endpoint):
+        with self._lock:
+            self.slow_queries[endpoint] += 1
+
+    def record_checkout(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_wait_seconds += seconds
+
+    def render(self, extra=()):
+        '''
+        render(extra)
+            returns the metrics in the Prometheus text format, followed by
+            any extra (name, type, help, {labels: value}) families
+        '''
+        with self._lock:
+            request_counts = defaultdict(int)
+            for (endpoint, _, _), count in self.requests.items():
+                request_counts[endpoint] += count
+            families = [
+                ('fyyur_requests_total', 'counter', 'Requests served.', {
+                    (('endpoint', endpoint), ('method', method),
+                     ('status', status)): count
+                    for (endpoint, method, status), count
+                    in self.requests.items()}),
+                ('fyyur_request_duration_seconds', 'summary',
+                 'Time spent serving requests.',
+                 self._summary(self.request_seconds, request_counts)),
+                ('fyyur_db_queries_total', 'counter',
+                 'SQL statements executed.', {
+                     (('endpoint', endpoint),): count
+                     for endpoint, count in self.queries.items()}),
+                ('fyyur_db_duration_seconds_total', 'counter',
+                 'Time spent executing SQL statements.', {
+                     (('endpoint', endpoint),): seconds
+                     for endpoint, seconds in self.query_seconds.items()}),
+                ('fyyur_db_slow_queries_total', 'counter',
+                 'SQL statements slower than SLOW_QUERY_SECONDS.', {
+                     (('endpoint', endpoint),): count
+                     for endpoint, count in self.slow_queries.items()}),
+                ('fyyur_db_pool_checkout_wait_seconds', 'summary',
+                 'Time spent waiting for a pooled connection.', {
+                     (('__name__',
+                       'fyyur_db_pool_checkout_wait_seconds_sum'),):
+                         self.checkout_wait_seconds,
+                     (('__name__',
+                       'fyyur_db_pool_checkout_wait_seconds_count'),):
+                         self.checkouts}),
+            ]
+
+        lines = []
+        for name, type, help, samples in families + list(extra):
+            lines.append('# HELP {} {}'.format(name, help))
+            lines.append('# TYPE {} {}'.format(name, type))
+            for labels, value in sorted(samples.items()):
+                sample_name = name
+                if labels and labels[0][0] == '__name__':
+                    sample_name, labels = labels[0][1], labels[1:]
+                lines.append('{}{} {}'.format(
+                    sample_name, format_labels(labels), value))
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _summary(seconds, counts):
+        samples = {}
+        for endpoint, total in seconds.items():
+            samples[(('__name__', 'fyyur_request_duration_seconds_sum'),
+                     ('endpoint', endpoint))] = total
+            samples[(('__name__', 'fyyur_request_duration_seconds_count'),
+                     ('endpoint', endpoint))] = counts[endpoint]
+        return samples
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels) + '}'
+
+
+metrics = Metrics()
+
+
+def endpoint_name():
+    return request.endpoint or 'unmatched'
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context,
+                      executemany):
+    conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_query_timer(conn, cursor, statement, parameters, context,
+                     executemany):
+    seconds = time.perf_counter() - conn.info['query_started_at'].pop()
+    if not has_request_context():
+        return
+
+    g.db_queries = g.get('db_queries', 0) + 1
+    g.db_seconds = g.get('db_seconds', 0.0) + seconds
+    if seconds >= current_app.config.get('SLOW_QUERY_SECONDS', 0.1):
+        log_slow_query(seconds, statement, parameters)
+
+
+def log_slow_query(seconds, statement, parameters):
+    metrics.record_slow_query(endpoint_name())
+    current_app.logger.warning(
+        'Slow query (%.1fms) in %s %s: %s %r',
+        seconds * 1000, request.method, request.path, statement, parameters)
+
+
+@event.listens_for(Engine, 'handle_error')
+def drop_query_timer(context):
+    # A failed statement never reaches after_cursor_execute, so its start
+    # time would be left for the next statement on the connection to pop.
+    conn = context.connection
+    if conn is not None and conn.info.get('query_started_at'):
+        conn.info['query_started_at'].pop()
+
+
+def start_request_timer():
+    g.request_started_at = time.perf_counter()
+
+
+def record_request(response):
+    seconds = time.perf_counter() - g.get('request_started_at',
+                                          time.perf_counter())
+    queries = g.get('db_queries', 0)
+    query_seconds = g.get('db_seconds', 0.0)
+
+    metrics.record_request(endpoint_name(), request.method,
+                           response.status_code, seconds, queries,
+                           query_seconds)
+    response.headers.add(
+        'Server-Timing',
+        'db;desc="{} queries";dur={:.2f}, app;dur={:.2f}'.format(
+            queries, query_seconds * 1000, seconds * 1000))
+    return response
+
+
+class TimedQueuePool(QueuePool):
+    '''
+    TimedQueuePool
+        a QueuePool recording how long every checkout waits for a
+        connection, including the time taken to open a new one
+    '''
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.record_checkout(time.perf_counter() - started_at)
+
+
+def pool_families(engines):
+    '''
+    pool_families(engines)
+        returns gauges of the connections held by the pool of every
+        {bind: engine}, in the form Metrics.render() takes as extra
+    '''
+    connections = {}
+    sizes = {}
+    for bind, engine in engines.items():
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            # e.g. the NullPool used behind PgBouncer holds nothing.
+            continue
+        connections[(('bind', bind), ('state', 'in_use'))] = pool.checkedout()
+        connections[(('bind', bind), ('state', 'idle'))] = pool.checkedin()
+        sizes[(('bind', bind),)] = pool.size()
+    return [
+        ('fyyur_db_pool_connections', 'gauge',
+         'Pooled connections by state.', connections),
+        ('fyyur_db_pool_size', 'gauge',
+         'Connections a pool keeps open, before overflow.', sizes),
+    ]
+
+
+def init_app(app):
+    # Taken by RoutingSQLAlchemy for the pools of server databases.
+    app.config.setdefault('DB_POOL_CLASS', TimedQueuePool)
+    app.before_request(start_request_timer)
+    app.after_request(record_request)
@@ -0,0 +1,39 @@
+"""Add the venue_area materialized view behind /venues.
+
+Revision ID: 1f4e2b7c9a30
+Revises: e3c5b8a1f9d2
+Create Date: 2026-10-18 16:02:41.519038
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '1f4e2b7c9a30'
+down_revision = 'e3c5b8a1f9d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Other databases have no materialized views, /venues reads the venue
+    # table there.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE MATERIALIZED VIEW venue_area AS '
+               'SELECT id, name, city, state, genres, upcoming_shows_count '
+               'FROM venue')
+    # REFRESH ... CONCURRENTLY needs a unique index to tell the rows apart.
+    op.create_index('ix_venue_area_id', 'venue_area', ['id'], unique=True)
+    op.create_index('ix_venue_area_state_city_name', 'venue_area',
+                    ['state', 'city', 'name'])
+    op.create_index('ix_venue_area_genres', 'venue_area', ['genres'],
+                    postgresql_using='gin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('DROP MATERIALIZED VIEW venue_area')
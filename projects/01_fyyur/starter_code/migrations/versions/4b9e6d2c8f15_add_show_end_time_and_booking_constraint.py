@@ -0,0 +1,74 @@
+"""Add show.end_time and stop venues from being double booked.
+
+Revision ID: 4b9e6d2c8f15
+Revises: 1f4e2b7c9a30
+Create Date: 2026-10-18 17:24:09.318265
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b9e6d2c8f15'
+down_revision = '1f4e2b7c9a30'
+branch_labels = None
+depends_on = None
+
+# Existing shows get two hours, cut short where the next show at the same
+# venue starts sooner, so back to back bookings do not become overlaps.
+# LEAST ignores the NULL of a venue's last show.
+BACKFILL_END_TIME = '''
+UPDATE show SET end_time = LEAST(
+    start_time + interval '2 hours',
+    (SELECT min(later.start_time) FROM show later
+     WHERE later.venue_id = show.venue_id
+       AND later.start_time > show.start_time))
+'''
+
+# What is left are shows starting at the same time at the same venue.
+DOUBLE_BOOKINGS = '''
+SELECT a.venue_id, a.id, b.id FROM show a
+JOIN show b ON b.venue_id = a.venue_id
+    AND b.id > a.id
+    AND b.start_time = a.start_time
+ORDER BY a.venue_id, a.id, b.id
+'''
+
+
+def upgrade():
+    op.add_column('show', sa.Column('end_time', sa.DateTime(), nullable=True))
+
+    if op.get_bind().dialect.name != 'postgresql':
+        op.execute("UPDATE show SET end_time = datetime(start_time, '+2 hours')")
+        return
+
+    op.execute(BACKFILL_END_TIME)
+    op.alter_column('show', 'end_time', nullable=False)
+    op.create_check_constraint('ck_show_end_after_start', 'show',
+                               'end_time > start_time')
+
+    double_bookings = op.get_bind().execute(DOUBLE_BOOKINGS).fetchall()
+    if double_bookings:
+        raise RuntimeError(
+            'Venues are double booked, move or delete one show of each pair '
+            'before upgrading: ' + ', '.join(
+                'venue {} shows {} and {}'.format(*row)
+                for row in double_bookings))
+
+    # GiST has no = for integers without btree_gist.
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute('ALTER TABLE show ADD CONSTRAINT show_venue_no_overlap '
+               'EXCLUDE USING gist '
+               '(venue_id WITH =, tsrange(start_time, end_time) WITH &&)')
+    op.execute('CREATE INDEX ix_show_artist_id_booked ON show USING gist '
+               '(artist_id, tsrange(start_time, end_time))')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_show_artist_id_booked', table_name='show')
+        op.drop_constraint('show_venue_no_overlap', 'show')
+        op.drop_constraint('ck_show_end_after_start', 'show')
+
+    op.drop_column('show', 'end_time')
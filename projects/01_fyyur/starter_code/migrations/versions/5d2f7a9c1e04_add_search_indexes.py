@@ -0,0 +1,46 @@
+"""Add pg_trgm and full text GIN indexes on venue and artist names for search.
+
+Revision ID: 5d2f7a9c1e04
+Revises: 3a1b4a2c3def
+Create Date: 2026-10-18 09:12:40.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2f7a9c1e04'
+down_revision = '3a1b4a2c3def'
+branch_labels = None
+depends_on = None
+
+
+# These expressions must match the ones built in search.py.
+TABLES = ['venue', 'artist']
+
+
+def upgrade():
+    # The indexes are Postgres only, other databases search with a LIKE scan.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in TABLES:
+        op.create_index(
+            'ix_{}_name_trgm'.format(table), table, ['name'],
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'})
+        op.create_index(
+            'ix_{}_name_tsvector'.format(table), table,
+            [sa.text("to_tsvector('simple', coalesce(name, ''))")],
+            postgresql_using='gin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table in TABLES:
+        op.drop_index('ix_{}_name_tsvector'.format(table), table_name=table)
+        op.drop_index('ix_{}_name_trgm'.format(table), table_name=table)
@@ -0,0 +1,55 @@
+"""Add deleted_at to venue and artist and leave deleted venues out of venue_area.
+
+Revision ID: 6e1a3f8b2d90
+Revises: 9c2d5e7a1b48
+Create Date: 2026-10-18 18:52:13.408327
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e1a3f8b2d90'
+down_revision = '9c2d5e7a1b48'
+branch_labels = None
+depends_on = None
+
+TABLES = ['venue', 'artist']
+
+
+def create_venue_area(where):
+    op.execute('CREATE MATERIALIZED VIEW venue_area AS '
+               'SELECT id, name, city, state, genres, upcoming_shows_count '
+               'FROM venue' + where)
+    # REFRESH ... CONCURRENTLY needs a unique index to tell the rows apart.
+    op.create_index('ix_venue_area_id', 'venue_area', ['id'], unique=True)
+    op.create_index('ix_venue_area_state_city_name', 'venue_area',
+                    ['state', 'city', 'name'])
+    op.create_index('ix_venue_area_genres', 'venue_area', ['genres'],
+                    postgresql_using='gin')
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column(
+            'deleted_at', sa.DateTime(timezone=True), nullable=True))
+        # Only the few rows waiting to be purged are indexed.
+        op.create_index('ix_{}_deleted'.format(table), table, ['id'],
+                        postgresql_where=sa.text('deleted_at IS NOT NULL'))
+
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('DROP MATERIALIZED VIEW venue_area')
+    create_venue_area(' WHERE deleted_at IS NULL')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP MATERIALIZED VIEW venue_area')
+        create_venue_area('')
+
+    for table in TABLES:
+        op.drop_index('ix_{}_deleted'.format(table), table_name=table)
+        op.drop_column(table, 'deleted_at')
@@ -0,0 +1,51 @@
+"""Add denormalized upcoming and past show counters to venue and artist.
+
+Revision ID: 8b41c0e6d2a7
+Revises: 5d2f7a9c1e04
+Create Date: 2026-10-18 10:02:11.540318
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b41c0e6d2a7'
+down_revision = '5d2f7a9c1e04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('show_counter_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_forward_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    for table in ['venue', 'artist']:
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill the counters as of now and record now as the watermark.
+    now = datetime.now()
+    bind = op.get_bind()
+    for table, column in [('venue', 'venue_id'), ('artist', 'artist_id')]:
+        bind.execute(sa.text(
+            'UPDATE {table} SET '
+            'upcoming_shows_count = (SELECT count(*) FROM show '
+            'WHERE show.{column} = {table}.id AND show.start_time > :now), '
+            'past_shows_count = (SELECT count(*) FROM show '
+            'WHERE show.{column} = {table}.id AND show.start_time <= :now)'
+            .format(table=table, column=column)), now=now)
+    bind.execute(sa.text(
+        'INSERT INTO show_counter_state (id, rolled_forward_at) '
+        'VALUES (1, :now)'), now=now)
+
+
+def downgrade():
+    for table in ['artist', 'venue']:
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
+    op.drop_table('show_counter_state')
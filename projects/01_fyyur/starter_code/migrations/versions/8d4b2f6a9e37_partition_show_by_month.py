@@ -0,0 +1,178 @@
+"""Partition show by month of start_time.
+
+Revision ID: 8d4b2f6a9e37
+Revises: 6e1a3f8b2d90
+Create Date: 2026-10-18 19:37:26.114592
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4b2f6a9e37'
+down_revision = '6e1a3f8b2d90'
+branch_labels = None
+depends_on = None
+
+# Partitioned from the month of the oldest show to this many months ahead,
+# `flask fyyur create-show-partitions` adds later months.
+MONTHS_AHEAD = 12
+
+COLUMNS = 'id, artist_id, venue_id, start_time, end_time, updated_at'
+
+# Dropped from the old table, their names are taken by the new one.
+OLD_INDEXES = ['ix_show_venue_id_start_time', 'ix_show_artist_id_start_time',
+               'ix_show_start_time_id', 'ix_show_artist_id_booked']
+
+TOO_LONG = '''
+SELECT id FROM show WHERE end_time > start_time + interval '7 days'
+ORDER BY id
+'''
+
+# Shows of a partition are checked by its exclusion constraint; this checks
+# the shows that may overlap one in a neighbouring partition. See models.py.
+OVERLAP_FUNCTION = '''
+CREATE OR REPLACE FUNCTION show_venue_no_overlap() RETURNS trigger AS $$
+BEGIN
+    IF NEW.start_time >= date_trunc('month', NEW.start_time) + interval '7 days'
+            AND NEW.end_time <=
+                date_trunc('month', NEW.start_time) + interval '1 month' THEN
+        RETURN NULL;
+    END IF;
+    PERFORM pg_advisory_xact_lock(hashtext('show_venue_no_overlap'),
+                                  NEW.venue_id);
+    IF EXISTS (
+        SELECT 1 FROM show
+        WHERE venue_id = NEW.venue_id
+          AND id <> NEW.id
+          AND start_time > NEW.start_time - interval '7 days'
+          AND start_time < NEW.end_time
+          AND tsrange(start_time, end_time) &&
+              tsrange(NEW.start_time, NEW.end_time)
+    ) THEN
+        RAISE EXCEPTION USING
+            ERRCODE = 'exclusion_violation',
+            CONSTRAINT = 'show_venue_no_overlap',
+            MESSAGE = 'show ' || NEW.id ||
+                ' overlaps another show at venue ' || NEW.venue_id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+'''
+
+
+def add_months(month, months):
+    months += month.year * 12 + month.month - 1
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def venue_no_overlap(table):
+    op.execute('ALTER TABLE {0} ADD CONSTRAINT {0}_venue_no_overlap '
+               'EXCLUDE USING gist '
+               '(venue_id WITH =, tsrange(start_time, end_time) WITH &&)'.
+               format(table))
+
+
+def create_show_table(*constraints, **kwargs):
+    op.create_table(
+        'show',
+        sa.Column('id', sa.Integer(), nullable=False,
+                  server_default=sa.text("nextval('show_id_seq')")),
+        sa.Column('artist_id', sa.Integer(), nullable=False),
+        sa.Column('venue_id', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('end_time', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False,
+                  server_default=sa.func.now()),
+        sa.ForeignKeyConstraint(['artist_id'], ['artist.id'],
+                                ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['venue_id'], ['venue.id'],
+                                ondelete='CASCADE'),
+        sa.CheckConstraint('end_time > start_time',
+                           name='ck_show_end_after_start'),
+        *constraints, **kwargs)
+    op.create_index('ix_show_venue_id_start_time', 'show',
+                    ['venue_id', 'start_time'])
+    op.create_index('ix_show_artist_id_start_time', 'show',
+                    ['artist_id', 'start_time'])
+    op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'])
+    op.execute('CREATE INDEX ix_show_artist_id_booked ON show USING gist '
+               '(artist_id, tsrange(start_time, end_time))')
+
+
+def replace_show_table():
+    op.execute('ALTER TABLE show RENAME TO show_old')
+    # The sequence would go with the old table.
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY NONE')
+    op.execute('ALTER TABLE show_old DROP CONSTRAINT show_pkey')
+    for index in OLD_INDEXES:
+        op.drop_index(index, table_name='show_old')
+
+
+def copy_shows():
+    op.execute('INSERT INTO show ({0}) SELECT {0} FROM show_old'.format(
+        COLUMNS))
+    op.execute('DROP TABLE show_old')
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY show.id')
+
+
+def upgrade():
+    # Other databases keep a plain show table.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    too_long = op.get_bind().execute(TOO_LONG).fetchall()
+    if too_long:
+        raise RuntimeError(
+            'Shows last longer than a week, shorten them before upgrading: ' +
+            ', '.join(str(show_id) for show_id, in too_long))
+
+    replace_show_table()
+    create_show_table(
+        sa.PrimaryKeyConstraint('id', 'start_time'),
+        sa.CheckConstraint("end_time <= start_time + interval '7 days'",
+                           name='ck_show_max_duration'),
+        postgresql_partition_by='RANGE (start_time)')
+
+    oldest = op.get_bind().execute(
+        'SELECT min(start_time) FROM show_old').scalar()
+    this_month = date.today().replace(day=1)
+    month = min(oldest.date(), this_month).replace(day=1) \
+        if oldest is not None else this_month
+    while month <= add_months(this_month, MONTHS_AHEAD):
+        name = 'show_{:%Y_%m}'.format(month)
+        op.execute("CREATE TABLE {} PARTITION OF show "
+                   "FOR VALUES FROM ('{}') TO ('{}')".format(
+                       name, month.isoformat(),
+                       add_months(month, 1).isoformat()))
+        venue_no_overlap(name)
+        month = add_months(month, 1)
+    op.execute('CREATE TABLE show_default PARTITION OF show DEFAULT')
+    venue_no_overlap('show_default')
+
+    # The old exclusion constraint vouches for the shows copied, so the
+    # trigger is only needed from here on.
+    copy_shows()
+    op.execute(OVERLAP_FUNCTION)
+    op.execute('CREATE TRIGGER show_venue_no_overlap '
+               'AFTER INSERT OR UPDATE OF venue_id, start_time, end_time '
+               'ON show FOR EACH ROW EXECUTE PROCEDURE show_venue_no_overlap()')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    # The partitions, their constraints and the trigger go with the table.
+    replace_show_table()
+    op.execute('DROP FUNCTION show_venue_no_overlap() CASCADE')
+
+    create_show_table(sa.PrimaryKeyConstraint('id'))
+    op.execute('ALTER TABLE show ADD CONSTRAINT show_venue_no_overlap '
+               'EXCLUDE USING gist '
+               '(venue_id WITH =, tsrange(start_time, end_time) WITH &&)')
+    copy_shows()
@@ -0,0 +1,32 @@
+"""Add updated_at to venue, artist and show.
+
+Revision ID: 9c2d5e7a1b48
+Revises: 4b9e6d2c8f15
+Create Date: 2026-10-18 18:05:47.602114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c2d5e7a1b48'
+down_revision = '4b9e6d2c8f15'
+branch_labels = None
+depends_on = None
+
+TABLES = ['venue', 'artist', 'show']
+
+
+def upgrade():
+    # now() is evaluated once, so on Postgres 11 and later existing rows
+    # get it without the table being rewritten.
+    for table in TABLES:
+        op.add_column(table, sa.Column(
+            'updated_at', sa.DateTime(timezone=True), nullable=False,
+            server_default=sa.func.now()))
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_column(table, 'updated_at')
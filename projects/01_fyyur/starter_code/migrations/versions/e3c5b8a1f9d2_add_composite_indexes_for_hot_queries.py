@@ -0,0 +1,41 @@
+"""Add composite indexes for the show, venue and artist lookups the routes make, and GIN indexes on genres.
+
+Revision ID: e3c5b8a1f9d2
+Revises: 8b41c0e6d2a7
+Create Date: 2026-10-18 11:26:03.887412
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3c5b8a1f9d2'
+down_revision = '8b41c0e6d2a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'])
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'])
+    op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'])
+    op.create_index('ix_venue_state_city_name', 'venue', ['state', 'city', 'name'])
+    op.create_index('ix_artist_name_id', 'artist', ['name', 'id'])
+    op.create_index('ix_artist_state_city_name', 'artist', ['state', 'city', 'name'])
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_index('ix_venue_genres', 'venue', ['genres'], postgresql_using='gin')
+        op.create_index('ix_artist_genres', 'artist', ['genres'], postgresql_using='gin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_artist_genres', table_name='artist')
+        op.drop_index('ix_venue_genres', table_name='venue')
+
+    op.drop_index('ix_artist_state_city_name', table_name='artist')
+    op.drop_index('ix_artist_name_id', table_name='artist')
+    op.drop_index('ix_venue_state_city_name', table_name='venue')
+    op.drop_index('ix_show_start_time_id', table_name='show')
+    op.drop_index('ix_show_artist_id_start_time', table_name='show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show')
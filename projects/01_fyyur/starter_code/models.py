@@ -1,4 +1,9 @@
-from app import db
+from datetime import timedelta
+
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from extensions import db
 
 #----------------------------------------------------------------------------#
 # Models.
@@ -6,6 +11,19 @@ from app import db
 
 
 class Venue(db.Model):
+    # Keep in step with the indexes created in migrations/versions.
+    __table_args__ = (
+        db.Index('ix_venue_state_city_name', 'state', 'city', 'name'),
+        db.Index('ix_venue_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_venue_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_venue_name_tsvector',
+                 db.text("to_tsvector('simple', coalesce(name, ''))"),
+                 postgresql_using='gin'),
+        db.Index('ix_venue_deleted', 'id',
+                 postgresql_where=db.text('deleted_at IS NOT NULL')),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
@@ -15,9 +33,22 @@ class Venue(db.Model):
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String))
+    genres = db.Column(ARRAY(db.String))
     seeking_talent = db.Column(db.Boolean, default=False, nullable=False)
     seeking_description = db.Column(db.Text(), nullable=True)
+    # Maintained by counters.py, exact as of ShowCounterState.
+    upcoming_shows_count = db.Column(
+        db.Integer, default=0, server_default='0', nullable=False)
+    past_shows_count = db.Column(
+        db.Integer, default=0, server_default='0', nullable=False)
+    # Set by the database on every INSERT and UPDATE, the ETag and
+    # Last-Modified of the venue and artist pages derive from it.
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False,
+                           default=db.func.now(), onupdate=db.func.now(),
+                           server_default=db.func.now())
+    # Set when the venue is deleted, hiding it until deletions.py has purged
+    # its shows and the row itself.
+    deleted_at = db.Column(db.DateTime(timezone=True), nullable=True)
     shows = db.relationship('Show', backref="venue",
                             passive_deletes=True, lazy=True)
 
@@ -26,17 +57,43 @@ class Venue(db.Model):
 
 
 class Artist(db.Model):
+    __table_args__ = (
+        db.Index('ix_artist_name_id', 'name', 'id'),
+        db.Index('ix_artist_state_city_name', 'state', 'city', 'name'),
+        db.Index('ix_artist_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_artist_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_artist_name_tsvector',
+                 db.text("to_tsvector('simple', coalesce(name, ''))"),
+                 postgresql_using='gin'),
+        db.Index('ix_artist_deleted', 'id',
+                 postgresql_where=db.text('deleted_at IS NOT NULL')),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String))
+    genres = db.Column(ARRAY(db.String))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean, default=False, nullable=False)
     seeking_description = db.Column(db.Text(), nullable=True)
+    # Maintained by counters.py, exact as of ShowCounterState.
+    upcoming_shows_count = db.Column(
+        db.Integer, default=0, server_default='0', nullable=False)
+    past_shows_count = db.Column(
+        db.Integer, default=0, server_default='0', nullable=False)
+    # Set by the database on every INSERT and UPDATE, the ETag and
+    # Last-Modified of the venue and artist pages derive from it.
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False,
+                           default=db.func.now(), onupdate=db.func.now(),
+                           server_default=db.func.now())
+    # Set when the artist is deleted, hiding it until deletions.py has purged
+    # its shows and the row itself.
+    deleted_at = db.Column(db.DateTime(timezone=True), nullable=True)
     shows = db.relationship('Show', backref="artist",
                             passive_deletes=True, lazy=True)
     # Setting the passive_deletes=True prevents SqlAlchemy from NULLing out
@@ -48,13 +105,180 @@ class Artist(db.Model):
         return '<Artist {}>'.format(self.name)
 
 
+# Length of a show booked without an end time.
+SHOW_DURATION = timedelta(hours=2)
+# Longest a show may last. It bounds how far apart two overlapping shows
+# can start, which the partitioned show table relies on, see below.
+SHOW_MAX_DURATION = timedelta(days=7)
+
+
+def default_end_time(context):
+    return context.get_current_parameters()['start_time'] + SHOW_DURATION
+
+
 class Show(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
+    __table_args__ = (
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_start_time_id', 'start_time', 'id'),
+        db.CheckConstraint('end_time > start_time',
+                           name='ck_show_end_after_start'),
+        db.CheckConstraint(
+            "end_time <= start_time + interval '{} days'".format(
+                SHOW_MAX_DURATION.days),
+            name='ck_show_max_duration'),
+        {'postgresql_partition_by': 'RANGE (start_time)'},
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     artist_id = db.Column(db.Integer, db.ForeignKey(
         'artist.id', ondelete='CASCADE'), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey(
         'venue.id', ondelete='CASCADE'), nullable=False)
-    start_time = db.Column(db.DateTime, nullable=False)
+    # Part of the primary key only because a partitioned table's primary
+    # key must include the partition key; id alone identifies a show.
+    start_time = db.Column(db.DateTime, primary_key=True)
+    end_time = db.Column(db.DateTime, nullable=False,
+                         default=default_end_time)
+    # Set by the database on every INSERT and UPDATE, the ETag and
+    # Last-Modified of the venue and artist pages derive from it.
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False,
+                           default=db.func.now(), onupdate=db.func.now(),
+                           server_default=db.func.now())
+
+    __mapper_args__ = {'primary_key': [id]}
 
     def __repr__(self):
         return '<Show {}{}>'.format(self.artist_id, self.venue_id)
+
+
+# On Postgres show is partitioned by the month of start_time, see
+# partitions.py. A venue cannot hold two shows at once: every partition has
+# an exclusion constraint rejecting a show whose [start_time, end_time)
+# overlaps another in the partition, in one lookup of its GiST index.
+# Exclusion constraints cannot span partitions, so a trigger checks the
+# shows that may overlap one in another partition. As no show lasts longer
+# than SHOW_MAX_DURATION, those are the shows starting within that of the
+# start of their month, or running into the next month; the trigger takes a
+# per venue advisory lock for them, so that two such bookings cannot both
+# pass. Shows of months without a partition go to show_default. Kept in step
+# with migration 8d4b2f6a9e37_partition_show_by_month.
+SHOW_MAX_INTERVAL = "interval '{} days'".format(SHOW_MAX_DURATION.days)
+
+
+def venue_no_overlap_ddl(partition):
+    return 'ALTER TABLE {0} ADD CONSTRAINT {0}_venue_no_overlap ' \
+        'EXCLUDE USING gist ' \
+        '(venue_id WITH =, tsrange(start_time, end_time) WITH &&)'. \
+        format(partition)
+
+
+SHOW_OVERLAP_FUNCTION = """
+CREATE OR REPLACE FUNCTION show_venue_no_overlap() RETURNS trigger AS $$
+BEGIN
+    IF NEW.start_time >= date_trunc('month', NEW.start_time) + {0}
+            AND NEW.end_time <=
+                date_trunc('month', NEW.start_time) + interval '1 month' THEN
+        RETURN NULL;
+    END IF;
+    PERFORM pg_advisory_xact_lock(hashtext('show_venue_no_overlap'),
+                                  NEW.venue_id);
+    IF EXISTS (
+        SELECT 1 FROM show
+        WHERE venue_id = NEW.venue_id
+          AND id <> NEW.id
+          AND start_time > NEW.start_time - {0}
+          AND start_time < NEW.end_time
+          AND tsrange(start_time, end_time) &&
+              tsrange(NEW.start_time, NEW.end_time)
+    ) THEN
+        RAISE EXCEPTION USING
+            ERRCODE = 'exclusion_violation',
+            CONSTRAINT = 'show_venue_no_overlap',
+            MESSAGE = 'show ' || NEW.id ||
+                ' overlaps another show at venue ' || NEW.venue_id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+""".format(SHOW_MAX_INTERVAL)
+
+SHOW_BOOKING_DDL = [
+    # GiST has no = for integers without btree_gist.
+    'CREATE EXTENSION IF NOT EXISTS btree_gist',
+    'CREATE TABLE show_default PARTITION OF show DEFAULT',
+    venue_no_overlap_ddl('show_default'),
+    SHOW_OVERLAP_FUNCTION,
+    'CREATE TRIGGER show_venue_no_overlap '
+    'AFTER INSERT OR UPDATE OF venue_id, start_time, end_time ON show '
+    'FOR EACH ROW EXECUTE PROCEDURE show_venue_no_overlap()',
+    # Artists may overlap, this only serves the conflict report.
+    'CREATE INDEX ix_show_artist_id_booked ON show USING gist '
+    '(artist_id, tsrange(start_time, end_time))',
+]
+
+for statement in SHOW_BOOKING_DDL:
+    event.listen(Show.__table__, 'after_create',
+                 db.DDL(statement).execute_if(dialect='postgresql'))
+
+
+def deleted(model):
+    return db.select([model.id]).where(model.deleted_at.isnot(None))
+
+
+def live(model):
+    '''
+    live(model)
+        returns the criteria keeping soft deleted venues or artists, or the
+        shows of either, out of a query on model or an alias of it
+    '''
+    if inspect(model).class_ is Show:
+        return [model.venue_id.notin_(deleted(Venue)),
+                model.artist_id.notin_(deleted(Artist))]
+    return [model.deleted_at.is_(None)]
+
+
+class ShowCounterState(db.Model):
+    # Single row holding the time the venue and artist show counters were
+    # last rolled forward to.
+    __tablename__ = 'show_counter_state'
+
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_forward_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return '<ShowCounterState {}>'.format(self.rolled_forward_at)
+
+
+# Materialized view behind /venues, refreshed by venue_areas.py.
+# It has its own MetaData so that create_all() does not make it a table;
+# it is created and dropped together with the venue table instead, as in
+# migrations 1f4e2b7c9a30_add_venue_area_view and
+# 6e1a3f8b2d90_add_soft_delete.
+venue_area = db.Table(
+    'venue_area', db.MetaData(),
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('name', db.String),
+    db.Column('city', db.String(120)),
+    db.Column('state', db.String(120)),
+    db.Column('genres', ARRAY(db.String)),
+    db.Column('upcoming_shows_count', db.Integer)
+)
+
+VENUE_AREA_DDL = [
+    'CREATE MATERIALIZED VIEW venue_area AS '
+    'SELECT id, name, city, state, genres, upcoming_shows_count FROM venue '
+    'WHERE deleted_at IS NULL',
+    # CONCURRENTLY needs a unique index to tell the rows apart.
+    'CREATE UNIQUE INDEX ix_venue_area_id ON venue_area (id)',
+    'CREATE INDEX ix_venue_area_state_city_name '
+    'ON venue_area (state, city, name)',
+    'CREATE INDEX ix_venue_area_genres ON venue_area USING gin (genres)',
+]
+
+for statement in VENUE_AREA_DDL:
+    event.listen(Venue.__table__, 'after_create',
+                 db.DDL(statement).execute_if(dialect='postgresql'))
+event.listen(Venue.__table__, 'before_drop',
+             db.DDL('DROP MATERIALIZED VIEW IF EXISTS venue_area').
+             execute_if(dialect='postgresql'))
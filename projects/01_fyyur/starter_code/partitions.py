@@ -0,0 +1,157 @@
+import gzip
+import os
+import re
+from datetime import date, datetime
+
+from extensions import db, page_cache
+from models import Show, venue_no_overlap_ddl
+import bulk
+import counters
+
+#----------------------------------------------------------------------------#
+# Show partitions.
+#----------------------------------------------------------------------------#
+
+# On Postgres show is range partitioned by start_time, one partition per
+# calendar month named show_YYYY_MM, so that the queries bounded on
+# start_time, such as the upcoming shows of a venue or a page of recent
+# history, only visit the months they cover however long the history
+# grows. `flask fyyur create-show-partitions` keeps
+# SHOW_PARTITION_MONTHS_AHEAD months ahead partitioned and should run
+# monthly from cron; shows of a month without a partition land in
+# show_default until its partition is created, which moves them over.
+# `flask fyyur archive-shows` takes old months off the counters and detaches
+# their partitions, writing them to gzipped CSV files that `flask fyyur
+# import shows` reads back if asked to.
+
+PARTITION = re.compile(r'show_(\d{4})_(\d{2})$')
+
+
+def month_of(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    months += month.year * 12 + month.month - 1
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def partition_name(month):
+    return 'show_{:%Y_%m}'.format(month)
+
+
+def partitioned_months():
+    '''
+    partitioned_months()
+        returns the months show has a partition for, oldest first
+    '''
+    names = db.session.execute(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = 'show'::regclass").fetchall()
+    return sorted(date(int(match.group(1)), int(match.group(2)), 1)
+                  for match in (PARTITION.match(name) for name, in names)
+                  if match)
+
+
+def create(month):
+    '''
+    create(month)
+        adds the partition of the shows starting in month, moving any
+        waiting in show_default into it, and commits
+    '''
+    name = partition_name(month)
+    bounds = "FROM ('{}') TO ('{}')".format(
+        month.isoformat(), add_months(month, 1).isoformat())
+    in_month = "start_time >= '{}' AND start_time < '{}'".format(
+        month.isoformat(), add_months(month, 1).isoformat())
+
+    # Attaching checks that show_default holds none of the month's shows,
+    # so they are moved into the new table before it is attached.
+    for statement in [
+            'CREATE TABLE {} (LIKE show INCLUDING DEFAULTS '
+            'INCLUDING CONSTRAINTS)'.format(name),
+            'INSERT INTO {} SELECT * FROM show_default WHERE {}'.format(
+                name, in_month),
+            'DELETE FROM show_default WHERE {}'.format(in_month),
+            'ALTER TABLE show ATTACH PARTITION {} FOR VALUES {}'.format(
+                name, bounds),
+            venue_no_overlap_ddl(name)]:
+        db.session.execute(statement)
+    db.session.commit()
+    return name
+
+
+def cover(first, last):
+    '''
+    cover(first, last)
+        creates the missing partitions of the months from first to last and
+        returns their names
+    '''
+    existing = set(partitioned_months())
+    created = []
+    month = month_of(first)
+    while month <= month_of(last):
+        if month not in existing:
+            created.append(create(month))
+        month = add_months(month, 1)
+    return created
+
+
+def ensure(months_ahead, now=None):
+    '''
+    ensure(months_ahead, now)
+        creates the missing partitions from the current month to
+        months_ahead months ahead and returns their names
+    '''
+    first = month_of(now or datetime.now())
+    return cover(first, add_months(first, months_ahead))
+
+
+def export(name, path):
+    columns = ', '.join(column.name for column in bulk.columns_of(Show))
+    cursor = db.session.connection().connection.cursor()
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+        cursor.copy_expert(
+            'COPY (SELECT {} FROM {} ORDER BY start_time, id) '
+            'TO STDOUT WITH (FORMAT csv, HEADER)'.format(columns, name), f)
+
+
+def archive(before, directory=None, report=None):
+    '''
+    archive(before, directory, report)
+        takes the shows of the partitioned months before before off the
+        counters and detaches their partitions, first writing each to
+        directory/<partition>.csv.gz and dropping it when a directory is
+        given, calling report(name, path) after every month; returns the
+        partitions archived
+    '''
+    before = month_of(before)
+    if before > month_of(datetime.now()):
+        raise ValueError('Only past months can be archived')
+
+    archived = []
+    for month in partitioned_months():
+        if month >= before:
+            break
+        name = partition_name(month)
+        # Nothing may be booked into the month while it is archived.
+        db.session.execute('LOCK TABLE {} IN SHARE MODE'.format(name))
+        path = None
+        if directory is not None:
+            path = os.path.join(directory, name + '.csv.gz')
+            export(name, path)
+        counters.forget_shows(Show.start_time >= month,
+                              Show.start_time < add_months(month, 1))
+        db.session.execute('ALTER TABLE show DETACH PARTITION ' + name)
+        if directory is not None:
+            db.session.execute('DROP TABLE ' + name)
+        db.session.commit()
+        archived.append(name)
+        if report is not None:
+            report(name, path)
+
+    if archived:
+        # The venue and artist pages count the archived shows as past.
+        page_cache.backend.clear()
+    return archived
@@ -0,0 +1,49 @@
+import os
+
+from sqlalchemy.pool import NullPool, QueuePool
+
+#----------------------------------------------------------------------------#
+# Connection pools.
+#----------------------------------------------------------------------------#
+
+# RoutingSQLAlchemy creates the engine of the primary and of every replica
+# with the options engine_options() returns for its URL, so only server
+# databases are pooled this way; SQLite keeps SQLAlchemy's defaults, as an
+# in-memory one rejects the pool arguments. Each worker process keeps up to
+# DB_POOL_SIZE + DB_MAX_OVERFLOW connections per database, so size them
+# against max_connections divided by the number of workers;
+# gunicorn_config.py starts no more workers than DB_MAX_CONNECTIONS allows.
+# With DB_PGBOUNCER=true, PgBouncer does the pooling and no connection is
+# kept open here. PgBouncer refuses startup options, so set the statement
+# timeout on the role instead (ALTER ROLE ... SET statement_timeout).
+
+
+def pgbouncer():
+    return os.environ.get('DB_PGBOUNCER', 'false').lower() == 'true'
+
+
+def engine_options(database_url, poolclass=QueuePool):
+    '''
+    engine_options(database_url, poolclass)
+        returns the create_engine() options for database_url set by the DB_*
+        environment variables, pooling with poolclass unless behind PgBouncer
+    '''
+    if database_url.startswith('sqlite'):
+        return {}
+    options = {
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', '1800')),
+    }
+    if pgbouncer():
+        options['poolclass'] = NullPool
+        return options
+    options.update(
+        poolclass=poolclass,
+        pool_size=int(os.environ.get('DB_POOL_SIZE', '5')),
+        max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', '10')),
+        pool_timeout=int(os.environ.get('DB_POOL_TIMEOUT', '30')))
+    if os.environ.get('DB_STATEMENT_TIMEOUT_MS'):
+        options['connect_args'] = {
+            'options': '-c statement_timeout={}'.format(
+                int(os.environ['DB_STATEMENT_TIMEOUT_MS']))}
+    return options
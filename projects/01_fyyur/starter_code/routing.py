@@ -0,0 +1,95 @@
+import random
+import time
+from collections import Counter
+from functools import wraps
+
+from flask import current_app, g, has_app_context, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, orm
+from sqlalchemy.pool import QueuePool
+
+from pools import engine_options
+
+#----------------------------------------------------------------------------#
+# Read replica routing.
+#----------------------------------------------------------------------------#
+
+# Views decorated with @reads_from_replica send their queries to one of the
+# SQLALCHEMY_REPLICA_BINDS, picked at random per request. Everything else,
+# in particular every form submission, stays on the primary. A user who has
+# committed a write reads from the primary for READ_YOUR_WRITES_SECONDS
+# afterwards, so they see their own changes before the replicas catch up.
+# Each decision is counted in `decisions` and reported in the
+# X-Database-Bind response header.
+
+decisions = Counter()
+
+
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None):
+        bind = g.get('database_bind') if has_app_context() else None
+        if bind is not None:
+            return get_state(self.app).db.get_engine(self.app, bind=bind)
+        return super().get_bind(mapper, clause)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def remember_write(db_session):
+    if has_app_context():
+        g.database_wrote = True
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def init_app(self, app):
+        super().init_app(app)
+        app.after_request(self.stamp_write)
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        # The pool of every bind follows its own URL, before any
+        # SQLALCHEMY_ENGINE_OPTIONS, which take precedence.
+        options.update(engine_options(
+            str(sa_url), app.config.get('DB_POOL_CLASS', QueuePool)))
+        super().apply_driver_hacks(app, sa_url, options)
+
+    @staticmethod
+    def stamp_write(response):
+        if g.get('database_wrote'):
+            session['last_write_at'] = time.time()
+        response.headers['X-Database-Bind'] = g.get('database_bind') or 'primary'
+        return response
+
+
+def recently_wrote():
+    last_write_at = session.get('last_write_at', 0)
+    return time.time() - last_write_at < \
+        current_app.config.get('READ_YOUR_WRITES_SECONDS', 5)
+
+
+def choose_bind():
+    replicas = current_app.config.get('SQLALCHEMY_REPLICA_BINDS', [])
+
+    if not replicas:
+        decisions['primary'] += 1
+        return None
+    if recently_wrote():
+        decisions['primary (read your writes)'] += 1
+        return None
+
+    bind = random.choice(replicas)
+    decisions[bind] += 1
+    return bind
+
+
+def reads_from_replica(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.database_bind = choose_bind()
+        current_app.logger.debug('%s reads from %s', view.__name__,
+                                 g.database_bind or 'primary')
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,141 @@
+from extensions import db
+from models import Venue, Artist, Show, live
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+# Name searches are served by the pg_trgm and full text GIN indexes created
+# in migration 5d2f7a9c1e04_add_search_indexes. The expressions built below
+# must stay in step with the indexed expressions, otherwise the planner can
+# no longer use them.
+
+SEARCH_RESULTS_PER_PAGE = 20
+TEXT_SEARCH_CONFIG = 'simple'
+
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def name_document(column):
+    return db.func.to_tsvector(TEXT_SEARCH_CONFIG,
+                               db.func.coalesce(column, ''))
+
+
+def name_query(term):
+    return db.func.plainto_tsquery(TEXT_SEARCH_CONFIG, term)
+
+
+def name_matches(column, term):
+    contains = column.ilike('%' + escape_like(term) + '%', escape='\\')
+    return db.or_(contains, name_document(column).op('@@')(name_query(term)))
+
+
+def name_rank(column, term):
+    return db.func.greatest(
+        db.func.similarity(column, term),
+        db.func.ts_rank(name_document(column), name_query(term))
+    )
+
+
+def page_bounds(count, page, per_page):
+    pages = max(1, -(-count // per_page))
+    return min(max(1, page), pages), pages
+
+
+def page_query(query, order_by, page, per_page):
+    return query.order_by(*order_by). \
+        offset((page - 1) * per_page). \
+        limit(per_page)
+
+
+def paginate(query, order_by, page, per_page):
+    count = query.count()
+    page, pages = page_bounds(count, page, per_page)
+    rows = page_query(query, order_by, page, per_page).all()
+    return rows, count, page, pages
+
+
+def name_search(model, term):
+    '''
+    name_search(model, term)
+        returns the query matching venue or artist names against term and
+        the ordering of its results
+    '''
+    query = db.session.query(
+        model.id,
+        model.name,
+        model.upcoming_shows_count
+    ). \
+        filter(name_matches(model.name, term), *live(model))
+
+    return query, [name_rank(model.name, term).desc(), model.name, model.id]
+
+
+def name_results(rows, count, page, pages):
+    return {
+        'count': count,
+        'page': page,
+        'pages': pages,
+        'data': [{
+            'id': row.id,
+            'name': row.name,
+            'num_upcoming_shows': row.upcoming_shows_count
+        } for row in rows]
+    }
+
+
+def search_by_name(model, term, page, per_page):
+    return name_results(*paginate(*name_search(model, term), page, per_page))
+
+
+def search_venues(term, page=1, per_page=SEARCH_RESULTS_PER_PAGE):
+    return search_by_name(Venue, term, page, per_page)
+
+
+def search_artists(term, page=1, per_page=SEARCH_RESULTS_PER_PAGE):
+    return search_by_name(Artist, term, page, per_page)
+
+
+def show_search(term):
+    '''
+    show_search(term)
+        returns the query matching shows by artist or venue name against
+        term and the ordering of its results
+    '''
+    query = db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Show.artist_id,
+        Venue.name.label('venue_name'),
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link')
+    ). \
+        join(Venue, Venue.id == Show.venue_id). \
+        join(Artist, Artist.id == Show.artist_id). \
+        filter(
+        name_matches(Artist.name, term) | name_matches(Venue.name, term),
+        *live(Venue), *live(Artist)
+    )
+
+    return query, [
+        db.func.greatest(name_rank(Artist.name, term),
+                         name_rank(Venue.name, term)).desc(),
+        Show.start_time.desc(),
+        Show.id.desc()
+    ]
+
+
+def show_results(rows, count, page, pages):
+    return {
+        'count': count,
+        'page': page,
+        'pages': pages,
+        'data': rows
+    }
+
+
+def search_shows(term, page=1, per_page=SEARCH_RESULTS_PER_PAGE):
+    return show_results(*paginate(*show_search(term), page, per_page))
@@ -2,3 +2,12 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Replace a "load more" button with the next page of shows it links to.
+$(document).on('click', '.load-more a', function (event) {
+  event.preventDefault();
+  var button = $(this).closest('.load-more');
+  $.get(this.href, function (html) {
+    button.replaceWith(html);
+  });
+});
@@ -0,0 +1,228 @@
+import random
+from datetime import datetime, time, timedelta
+from itertools import accumulate
+
+from extensions import db
+from choices import genres_choices
+from models import Venue, Artist, Show, SHOW_DURATION
+import bulk
+import counters
+import partitions
+import venue_areas
+
+#----------------------------------------------------------------------------#
+# Synthetic data.
+#----------------------------------------------------------------------------#
+
+# Production-like venues, artists and shows for load tests and benchmarks.
+# The same seed and centre date always give the same rows. As in production
+# a few cities, genres, venues and artists account for most rows: their
+# weights fall off with rank like Zipf's law. Shows start in the evening, at
+# most one a day per venue so none overlap, over SHOW_DAYS days around the
+# centre date, so about half are upcoming. Rows are generated lazily and
+# COPYed batch by batch with bulk.load_batch, so memory
+# stays flat for millions of shows, into the month partitions of the show
+# table, created first where missing.
+
+AREAS = [
+    ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'),
+    ('Nashville', 'TN'), ('Austin', 'TX'), ('San Francisco', 'CA'),
+    ('New Orleans', 'LA'), ('Seattle', 'WA'), ('Atlanta', 'GA'),
+    ('Boston', 'MA'), ('Denver', 'CO'), ('Philadelphia', 'PA'),
+    ('Portland', 'OR'), ('Detroit', 'MI'), ('Miami', 'FL'),
+    ('Minneapolis', 'MN'), ('Houston', 'TX'), ('Memphis', 'TN'),
+    ('Kansas City', 'MO'), ('Phoenix', 'AZ'), ('Salt Lake City', 'UT'),
+    ('Albuquerque', 'NM'), ('Omaha', 'NE'), ('Boise', 'ID'),
+]
+GENRES = [genre for genre, _ in genres_choices]
+WORDS = ['the', 'blue', 'jazz', 'room', 'hall', 'park', 'sonic', 'cellar',
+         'red', 'dueling', 'pianos', 'bar', 'musical', 'hop', 'wild', 'sax',
+         'band', 'city', 'lights', 'garden', 'club', 'house', 'stage', 'loft',
+         'velvet', 'echo', 'lounge', 'station', 'moon', 'brass', 'union']
+STREETS = ['Main St', 'Market St', 'Broadway', 'Mission St', 'Elm St',
+           'Oak Ave', '2nd Ave', 'Division St', 'Canal St', 'Sunset Blvd']
+SHOW_DAYS = 730
+SHOW_HOURS = [18, 19, 20, 21, 22]
+# Shows per venue and per artist fall off more gently than 1/rank: the
+# busiest rooms are booked most nights, and no one artist plays a sizeable
+# share of all shows.
+VENUE_EXPONENT = 0.8
+ARTIST_EXPONENT = 0.5
+
+
+def zipf_cum_weights(count, exponent):
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, count + 1)))
+
+
+def ranked(rng, ids):
+    # Popularity is independent of id.
+    ids = list(ids)
+    rng.shuffle(ids)
+    return ids
+
+
+def name(rng):
+    return ' '.join(rng.choice(WORDS)
+                    for _ in range(rng.randint(2, 4))).title()
+
+
+def phone(rng):
+    return '{:03}-{:03}-{:04}'.format(
+        rng.randint(200, 999), rng.randint(200, 999), rng.randint(0, 9999))
+
+
+def pick_genres(rng, cum_weights):
+    return sorted(set(rng.choices(GENRES, cum_weights=cum_weights,
+                                  k=rng.randint(1, 3))))
+
+
+def venue_rows(rng, first_id, count):
+    areas = zipf_cum_weights(len(AREAS), 1.0)
+    genres = zipf_cum_weights(len(GENRES), 1.0)
+    for venue_id in range(first_id, first_id + count):
+        city, state = rng.choices(AREAS, cum_weights=areas)[0]
+        seeking_talent = rng.random() < 0.2
+        yield {
+            'id': venue_id,
+            'name': name(rng),
+            'city': city,
+            'state': state,
+            'address': '{} {}'.format(rng.randint(1, 9999),
+                                      rng.choice(STREETS)),
+            'phone': phone(rng),
+            'image_link': None,
+            'facebook_link': 'https://www.facebook.com/venue{}'.format(
+                venue_id),
+            'website': 'https://venue{}.example.com'.format(venue_id),
+            'genres': pick_genres(rng, genres),
+            'seeking_talent': seeking_talent,
+            'seeking_description': 'Booking local acts.'
+            if seeking_talent else None
+        }
+
+
+def artist_rows(rng, first_id, count):
+    areas = zipf_cum_weights(len(AREAS), 1.0)
+    genres = zipf_cum_weights(len(GENRES), 1.0)
+    for artist_id in range(first_id, first_id + count):
+        city, state = rng.choices(AREAS, cum_weights=areas)[0]
+        seeking_venue = rng.random() < 0.3
+        yield {
+            'id': artist_id,
+            'name': name(rng),
+            'city': city,
+            'state': state,
+            'phone': phone(rng),
+            'genres': pick_genres(rng, genres),
+            'image_link': None,
+            'facebook_link': 'https://www.facebook.com/artist{}'.format(
+                artist_id),
+            'website': None,
+            'seeking_venue': seeking_venue,
+            'seeking_description': 'Looking for weekend gigs.'
+            if seeking_venue else None
+        }
+
+
+def shows_per_venue(rng, venues, shows):
+    '''
+    shows_per_venue(rng, venues, shows)
+        splits shows over venues by popularity, no venue getting more than
+        one a day
+    '''
+    weights = [1 / rank ** VENUE_EXPONENT for rank in range(1, venues + 1)]
+    total = sum(weights)
+    counts = [min(SHOW_DAYS, int(shows * weight / total))
+              for weight in weights]
+    # Hand out what rounding and the cap left over at random.
+    for _ in range(shows - sum(counts)):
+        venue = rng.randrange(venues)
+        while counts[venue] == SHOW_DAYS:
+            venue = rng.randrange(venues)
+        counts[venue] += 1
+    return counts
+
+
+def show_rows(rng, venue_ids, artist_ids, shows, centre):
+    first_day = datetime.combine(centre, time()) - \
+        timedelta(days=SHOW_DAYS // 2)
+    artist_weights = zipf_cum_weights(len(artist_ids), ARTIST_EXPONENT)
+    venue_ids = ranked(rng, venue_ids)
+    artist_ids = ranked(rng, artist_ids)
+
+    for venue_id, count in zip(venue_ids,
+                               shows_per_venue(rng, len(venue_ids), shows)):
+        artists = rng.choices(artist_ids, cum_weights=artist_weights, k=count)
+        for day, artist_id in zip(sorted(rng.sample(range(SHOW_DAYS), count)),
+                                  artists):
+            start_time = first_day + timedelta(
+                days=day, hours=rng.choice(SHOW_HOURS),
+                minutes=rng.choice([0, 30]))
+            yield {
+                'artist_id': artist_id,
+                'venue_id': venue_id,
+                'start_time': start_time,
+                'end_time': start_time + SHOW_DURATION
+            }
+
+
+def next_id(model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+def load(model, rows, batch_size, progress):
+    table = model.__table__
+    columns = [column for column in bulk.columns_of(model)
+               if column.name != 'id' or model is not Show]
+    loaded = 0
+    for batch in bulk.batches(rows, batch_size):
+        bulk.load_batch(table, columns, batch)
+        db.session.commit()
+        loaded += len(batch)
+        if progress is not None:
+            progress(table.name, loaded)
+    bulk.reset_id_sequence(table)
+    db.session.commit()
+    return loaded
+
+
+def generate(venues, artists, shows, seed=0, centre=None, batch_size=10000,
+             progress=None):
+    '''
+    generate(venues, artists, shows, seed, centre, batch_size, progress)
+        adds venues, artists and shows between them, the same for the same
+        seed and centre date (today by default), calling
+        progress(table, rows) after every batch, and rebuilds the show
+        counters, venue_area and the planner statistics afterwards
+    '''
+    # Checked before anything is loaded.
+    if shows > venues * SHOW_DAYS:
+        raise ValueError('{} venues hold at most {} shows'.format(
+            venues, venues * SHOW_DAYS))
+    if shows and not artists:
+        raise ValueError('shows need at least one artist')
+    rng = random.Random(seed)
+    centre = centre or datetime.now().date()
+
+    first_venue = next_id(Venue)
+    first_artist = next_id(Artist)
+    load(Venue, venue_rows(rng, first_venue, venues), batch_size, progress)
+    load(Artist, artist_rows(rng, first_artist, artists), batch_size,
+         progress)
+    if shows:
+        # Not left to show_default, where nothing is pruned.
+        first_day = centre - timedelta(days=SHOW_DAYS // 2)
+        partitions.cover(first_day, first_day + timedelta(days=SHOW_DAYS))
+        load(Show, show_rows(rng,
+                             range(first_venue, first_venue + venues),
+                             range(first_artist, first_artist + artists),
+                             shows, centre),
+             batch_size, progress)
+
+    counters.check_counters(repair=True)
+    venue_areas.refresh()
+    # COPY leaves the statistics of empty tables behind, which the planner
+    # would go on using.
+    db.session.execute('ANALYZE')
+    db.session.commit()
@@ -0,0 +1,1109 @@
+import asyncio
+import gzip
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.exc import DataError
+
+from app import create_app
+from extensions import db, page_cache
+from instrumentation import TimedQueuePool
+from views import format_datetime, format_datetimes
+from cache import LRUCache
+import assets
+from models import Venue, Artist, Show
+import counters
+import deletions
+import genres
+import partitions
+import synthetic
+import venue_areas
+
+
+class FyyurTestCase(unittest.TestCase):
+    """This class represents the fyyur test case"""
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.database_name = "fyyur_test"
+        self.database_path = os.environ.get(
+            'TEST_DATABASE_URL',
+            "postgres://{}/{}".format('localhost:5432', self.database_name))
+        self.config = {
+            'SQLALCHEMY_DATABASE_URI': self.database_path,
+            'TESTING': True,
+            'WTF_CSRF_ENABLED': False,
+            'CACHE_TYPE': 'null',
+            'SQLALCHEMY_REPLICA_BINDS': [],
+            'VENUE_AREA_REFRESH_SECONDS': 0,
+            'PURGE_IN_BACKGROUND': False
+        }
+        self.app = create_app(self.config)
+        self.client = self.app.test_client
+
+        with self.app.app_context():
+            db.drop_all()
+            db.session.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            db.session.commit()
+            db.create_all()
+
+        self.statements = []
+        self.parameters = []
+        event.listen(db.get_engine(self.app), 'before_cursor_execute',
+                     self.count_statement)
+
+    def tearDown(self):
+        """Executed after reach test"""
+        event.remove(db.get_engine(self.app), 'before_cursor_execute',
+                     self.count_statement)
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def count_statement(self, conn, cursor, statement, parameters,
+                        context, executemany):
+        self.statements.append(statement)
+        self.parameters.append(parameters)
+
+    def seed(self, num_venues, shows_per_venue=2):
+        """Adds num_venues venues spread over a few areas, each with one
+        artist booked for shows_per_venue upcoming shows and one past show."""
+        with self.app.app_context():
+            artist = Artist(name='The Wild Sax Band', city='San Francisco',
+                            state='CA', genres=['Jazz'])
+            db.session.add(artist)
+
+            for i in range(num_venues):
+                venue = Venue(name='Venue {}'.format(i),
+                              city=['San Francisco', 'New York'][i % 2],
+                              state=['CA', 'NY'][i % 2],
+                              genres=['Jazz'])
+                db.session.add(venue)
+
+                for day in range(shows_per_venue):
+                    db.session.add(Show(
+                        artist=artist, venue=venue,
+                        start_time=datetime.now() + timedelta(days=day + 1)))
+                db.session.add(Show(
+                    artist=artist, venue=venue,
+                    start_time=datetime.now() - timedelta(days=1)))
+
+            db.session.commit()
+            counters.check_counters(repair=True)
+            venue_areas.refresh()
+
+    def get_venues(self):
+        self.statements = []
+        res = self.client().get('/venues')
+        self.assertEqual(res.status_code, 200)
+        return len(self.statements)
+
+    def test_venues_lists_upcoming_show_counts(self):
+        self.seed(3, shows_per_venue=2)
+
+        res = self.client().get('/venues')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'San Francisco, CA', res.data)
+        self.assertIn(b'New York, NY', res.data)
+        self.assertIn(b'Venue 2', res.data)
+
+    def test_venues_query_count_is_constant(self):
+        self.seed(2)
+        few_venues = self.get_venues()
+
+        self.seed(50)
+        many_venues = self.get_venues()
+
+        self.assertEqual(few_venues, many_venues)
+
+    def test_shows_pages_through_every_show_once(self):
+        self.seed(40, shows_per_venue=1)
+        self.statements = []
+
+        res = self.client().get('/shows')
+        first_page_statements = len(self.statements)
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'Next &rarr;', res.data)
+        self.assertNotIn(b'&larr; Previous', res.data)
+
+        seen = 0
+        url = '/shows'
+        while url:
+            res = self.client().get(url)
+            seen += res.data.count(b'tile-show')
+            next_link = re.search(rb'href="([^"]*after=[^"]*)"', res.data)
+            url = next_link and next_link.group(1).decode().replace('&amp;', '&')
+
+        self.assertEqual(seen, 80)
+        self.assertIn(b'&larr; Previous', res.data)
+        self.assertEqual(first_page_statements, 1)
+
+    def test_shows_rejects_malformed_cursor(self):
+        res = self.client().get('/shows?after=not-a-cursor')
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_search_venues_ranks_closest_name_first(self):
+        self.seed(12, shows_per_venue=3)
+        with self.app.app_context():
+            db.session.add(Venue(name='Venue', city='Austin', state='TX'))
+            db.session.commit()
+
+        res = self.client().post('/venues/search',
+                                 data={'search_term': 'venue'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'search results for "venue": 13', res.data)
+        self.assertLess(res.data.index(b'<h5>Venue</h5>'),
+                        res.data.index(b'<h5>Venue 1</h5>'))
+        self.assertIn(b'Upcoming shows: 3', res.data)
+
+    def test_search_pages_results(self):
+        self.seed(45, shows_per_venue=0)
+
+        res = self.client().get('/venues/search?search_term=venue&page=3')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data.count(b'fa-music'), 5)
+        self.assertIn(b'&larr; Previous', res.data)
+        self.assertNotIn(b'Next &rarr;', res.data)
+
+    def test_search_reads_upcoming_shows_from_counters(self):
+        self.seed(30)
+        self.statements = []
+
+        res = self.client().post('/venues/search',
+                                 data={'search_term': 'venue'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'Upcoming shows: 2', res.data)
+        self.assertEqual(len(self.statements), 2)
+
+    def test_search_escapes_like_wildcards(self):
+        self.seed(3)
+
+        res = self.client().post('/venues/search',
+                                 data={'search_term': '%'})
+
+        self.assertIn(b'search results for "%": 0', res.data)
+
+    def counts(self, model, model_id):
+        with self.app.app_context():
+            row = model.query.get(model_id)
+            return row.upcoming_shows_count, row.past_shows_count
+
+    def test_create_show_updates_counters(self):
+        self.seed(1, shows_per_venue=1)
+        start_time = datetime.now() + timedelta(days=7)
+
+        res = self.client().post('/shows/create', data={
+            'artist_id': 1,
+            'venue_id': 1,
+            'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S')
+        })
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.counts(Venue, 1), (2, 1))
+        self.assertEqual(self.counts(Artist, 1), (2, 1))
+
+    def test_create_show_rejects_overlapping_venue_booking(self):
+        self.seed(1, shows_per_venue=1)
+        with self.app.app_context():
+            booked = Show.query.filter_by(venue_id=1).order_by(
+                Show.start_time.desc()).first()
+            self.assertEqual(booked.end_time - booked.start_time,
+                             timedelta(hours=2))
+            start_time = booked.start_time + timedelta(hours=1)
+
+        res = self.client().post('/shows/create', data={
+            'artist_id': 1,
+            'venue_id': 1,
+            'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S')
+        })
+
+        self.assertIn(b'The venue is already booked at that time.', res.data)
+        self.assertEqual(self.counts(Venue, 1), (1, 1))
+
+    def test_create_show_rejects_overlap_across_month_partitions(self):
+        self.seed(1, shows_per_venue=0)
+        month = partitions.add_months(partitions.month_of(datetime.now()), 2)
+        with self.app.app_context():
+            partitions.cover(partitions.add_months(month, -1), month)
+        boundary = datetime.combine(month, time())
+
+        for start_time, end_time in [
+                (boundary - timedelta(hours=1), boundary + timedelta(hours=1)),
+                (boundary + timedelta(minutes=30), None)]:
+            res = self.client().post('/shows/create', data={
+                'artist_id': 1,
+                'venue_id': 1,
+                'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S'),
+                'end_time': end_time and end_time.strftime('%Y-%m-%d %H:%M:%S')
+            })
+
+        self.assertIn(b'The venue is already booked at that time.', res.data)
+        self.assertEqual(self.counts(Venue, 1), (1, 1))
+
+    def test_archive_shows_writes_old_months_to_files(self):
+        self.seed(1, shows_per_venue=1)
+        old = datetime.now() - timedelta(days=400)
+        month = partitions.month_of(old)
+        name = partitions.partition_name(month)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        with self.app.app_context():
+            db.session.add(Show(artist_id=1, venue_id=1, start_time=old))
+            db.session.commit()
+            counters.check_counters(repair=True)
+            # Moves the show over from show_default.
+            partitions.create(month)
+            self.assertEqual(db.session.execute(
+                'SELECT count(*) FROM ' + name).scalar(), 1)
+
+            archived = partitions.archive(partitions.add_months(month, 1),
+                                          directory)
+
+            self.assertEqual(archived, [name])
+            self.assertEqual(Show.query.count(), 2)
+            self.assertEqual(counters.check_counters(), [])
+        self.assertEqual(self.counts(Venue, 1), (1, 1))
+        with gzip.open(os.path.join(directory, name + '.csv.gz'), 'rt') as f:
+            self.assertEqual(f.readline().strip(),
+                             'id,artist_id,venue_id,start_time,end_time')
+            self.assertEqual(len(f.readlines()), 1)
+
+    def test_show_conflicts_reports_artist_double_bookings(self):
+        self.seed(2, shows_per_venue=1)
+        start = (datetime.now() - timedelta(days=2)).isoformat()
+        end = (datetime.now() + timedelta(days=2)).isoformat()
+
+        res = self.client().get('/api/v1/shows/conflicts', query_string={
+            'start': start, 'end': end})
+        conflicts = res.get_json()['conflicts']
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([(conflict['kind'], conflict['show_ids'])
+                          for conflict in conflicts],
+                         [('artist', [2, 4]), ('artist', [1, 3])])
+        self.assertEqual(
+            self.client().get('/api/v1/shows/conflicts', query_string={
+                'start': end, 'end': start}).status_code, 400)
+
+    def test_show_conflicts_leave_out_deleted_venues(self):
+        self.seed(2, shows_per_venue=1)
+        with self.app.app_context():
+            for venue in Venue.query.all():
+                deletions.soft_delete(Venue, venue.id)
+            db.session.commit()
+        start = (datetime.now() - timedelta(days=2)).isoformat()
+        end = (datetime.now() + timedelta(days=2)).isoformat()
+
+        res = self.client().get('/api/v1/shows/conflicts', query_string={
+            'start': start, 'end': end})
+
+        self.assertEqual(res.get_json()['conflicts'], [])
+
+    def test_delete_venue_updates_artist_counters(self):
+        self.seed(2, shows_per_venue=2)
+
+        self.client().post('/venues/1')
+
+        self.assertEqual(self.counts(Artist, 1), (2, 1))
+
+    def test_deleted_venue_is_hidden_before_its_shows_are_purged(self):
+        self.seed(2, shows_per_venue=2)
+        with self.app.app_context():
+            deletions.soft_delete(Venue, 1)
+            db.session.commit()
+            venue_areas.refresh()
+
+        self.assertEqual(self.client().get('/venues/1').status_code, 404)
+        self.assertNotIn(b'Venue 0', self.client().get('/venues').data)
+        self.assertEqual(self.counts(Artist, 1), (2, 1))
+        with self.app.app_context():
+            self.assertEqual(Show.query.filter_by(venue_id=1).count(), 3)
+            self.assertEqual(counters.check_counters(), [])
+
+            purged = []
+            deletions.purge(Venue, 1, 2, purged.append)
+
+            self.assertEqual(purged, [2, 3])
+            self.assertIsNone(Venue.query.get(1))
+            self.assertEqual(Show.query.count(), 3)
+
+    def test_delete_artist_hides_it_and_purges_its_shows(self):
+        self.seed(2, shows_per_venue=2)
+
+        res = self.client().post('/artists/1')
+
+        self.assertEqual(res.status_code, 302)
+        self.assertEqual(self.client().get('/artists/1').status_code, 404)
+        self.assertEqual(self.counts(Venue, 1), (0, 0))
+        with self.app.app_context():
+            self.assertIsNone(Artist.query.get(1))
+            self.assertEqual(Show.query.count(), 0)
+            self.assertEqual(counters.check_counters(), [])
+
+    def test_roll_forward_moves_started_shows_to_past(self):
+        self.seed(1, shows_per_venue=3)
+
+        with self.app.app_context():
+            counters.roll_forward(datetime.now() + timedelta(days=2, hours=1))
+
+        self.assertEqual(self.counts(Venue, 1), (1, 3))
+        self.assertEqual(self.counts(Artist, 1), (1, 3))
+        with self.app.app_context():
+            self.assertEqual(counters.check_counters(), [])
+
+    def test_check_counters_repairs_drift(self):
+        self.seed(2, shows_per_venue=2)
+        with self.app.app_context():
+            Venue.query.filter_by(id=2).update({'upcoming_shows_count': 9})
+            db.session.commit()
+
+            drifted = counters.check_counters(repair=True)
+
+            self.assertEqual(drifted, [('Venue', 2, (9, 1), (2, 1))])
+            self.assertEqual(counters.check_counters(), [])
+
+    def seed_past_shows(self, num_past_shows):
+        with self.app.app_context():
+            artist = Artist.query.get(1)
+            venue = Venue.query.get(1)
+            for day in range(num_past_shows):
+                db.session.add(Show(
+                    artist=artist, venue=venue,
+                    start_time=datetime.now() - timedelta(days=day + 2)))
+            db.session.commit()
+            counters.check_counters(repair=True)
+            venue_areas.refresh()
+
+    def test_show_venue_loads_shows_in_one_query(self):
+        self.seed(1, shows_per_venue=2)
+        self.seed_past_shows(30)
+        self.statements = []
+
+        res = self.client().get('/venues/1')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'2 Upcoming Shows', res.data)
+        self.assertIn(b'31 Past Shows', res.data)
+        self.assertEqual(res.data.count(b'tile-show'),
+                         2 + self.app.config['PAST_SHOWS_PER_PAGE'])
+        self.assertIn(b'Load more past shows', res.data)
+        self.assertEqual(len(self.statements), 2)
+
+    def test_artist_past_shows_pages_through_every_past_show(self):
+        self.seed(1, shows_per_venue=2)
+        self.seed_past_shows(30)
+
+        res = self.client().get('/artists/1')
+        seen = res.data.count(b'tile-show') - 2
+        more = re.search(rb'href="(/artists/1/past_shows[^"]*)"', res.data)
+        while more:
+            res = self.client().get(more.group(1).decode())
+            self.assertEqual(res.status_code, 200)
+            seen += res.data.count(b'tile-show')
+            more = re.search(rb'href="(/artists/1/past_shows[^"]*)"',
+                             res.data)
+
+        self.assertEqual(seen, 31)
+
+    def test_venue_page_answers_conditional_requests(self):
+        self.seed(1, shows_per_venue=2)
+        res = self.client().get('/venues/1')
+        etag = res.headers['ETag']
+        last_modified = res.headers['Last-Modified']
+        self.assertTrue(etag.startswith('W/'))
+        self.statements = []
+
+        res = self.client().get('/venues/1', headers={'If-None-Match': etag})
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.headers['ETag'], etag)
+        self.assertEqual(res.data, b'')
+        self.assertEqual(len(self.statements), 1)
+        res = self.client().get('/venues/1', headers={
+            'If-Modified-Since': last_modified})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.headers['ETag'], etag)
+
+        self.client().post('/artists/1/edit', data={
+            'name': 'The Tame Sax Band', 'city': 'San Francisco',
+            'state': 'CA', 'genres': ['Jazz']})
+        res = self.client().get('/venues/1', headers={'If-None-Match': etag})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'The Tame Sax Band', res.data)
+        self.assertNotEqual(res.headers['ETag'], etag)
+
+    def test_conditional_requests_see_new_shows(self):
+        self.seed(1, shows_per_venue=1)
+        etag = self.client().get('/artists/1').headers['ETag']
+        status, _ = self.asgi_get('/artists/1', {'If-None-Match': etag})
+        self.assertEqual(status, 304)
+
+        self.client().post('/shows/create', data={
+            'artist_id': 1,
+            'venue_id': 1,
+            'start_time': (datetime.now() + timedelta(days=9)).strftime(
+                '%Y-%m-%d %H:%M:%S')
+        })
+        status, body = self.asgi_get('/artists/1', {'If-None-Match': etag})
+
+        self.assertEqual(status, 200)
+        self.assertIn(b'2 Upcoming Shows', body)
+
+    def use_page_cache(self):
+        self.app.config['CACHE_TYPE'] = 'lru'
+        page_cache.init_app(self.app)
+
+    def cache_stats(self, app=None):
+        with (app or self.app).app_context():
+            return page_cache.stats()
+
+    def test_cached_venue_page_is_served_without_queries(self):
+        self.seed(1)
+        self.use_page_cache()
+        self.client().get('/venues/1')
+        self.statements = []
+
+        res = self.client().get('/venues/1')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.statements, [])
+        self.assertEqual(self.cache_stats()['hits'], 1)
+        self.assertEqual(self.cache_stats()['misses'], 1)
+
+    def test_writes_invalidate_the_pages_they_change(self):
+        self.seed(2, shows_per_venue=1)
+        self.use_page_cache()
+        for url in ['/venues', '/venues/1', '/venues/2', '/artists/1']:
+            self.client().get(url)
+
+        self.client().post('/venues/1/edit', data={
+            'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA',
+            'address': '1015 Folsom Street', 'phone': '123-123-1234',
+            'genres': ['Jazz'], 'facebook_link': 'https://facebook.com/hop',
+            'image_link': '', 'website': '', 'seeking_description': ''
+        })
+        stats = self.cache_stats()
+
+        self.assertIn(b'The Musical Hop', self.client().get('/venues').data)
+        self.assertIn(b'The Musical Hop', self.client().get('/venues/1').data)
+        self.assertIn(b'The Musical Hop', self.client().get('/artists/1').data)
+        self.client().get('/venues/2')
+        self.assertEqual(self.cache_stats()['misses'] - stats['misses'], 3)
+        self.assertEqual(self.cache_stats()['hits'] - stats['hits'], 1)
+
+    def test_lru_cache_evicts_least_recently_used(self):
+        cache = LRUCache(threshold=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.eviction_count(), 1)
+
+    def seed_artists(self, num_artists):
+        with self.app.app_context():
+            for i in range(num_artists):
+                db.session.add(Artist(
+                    name='Artist {:03}'.format(i),
+                    city=['San Francisco', 'New York'][i % 2],
+                    state=['CA', 'NY'][i % 2],
+                    seeking_description='x' * 1000))
+            db.session.commit()
+
+    def test_artists_pages_alphabetically(self):
+        self.seed_artists(120)
+
+        names = []
+        url = '/artists'
+        while url:
+            res = self.client().get(url)
+            self.assertEqual(res.status_code, 200)
+            names += re.findall(rb'<h5>(Artist \d+)</h5>', res.data)
+            next_link = re.search(rb'href="([^"]*after=[^"]*)"', res.data)
+            url = next_link and next_link.group(1).decode().replace('&amp;', '&')
+
+        self.assertEqual(len(names), 120)
+        self.assertEqual(names, sorted(names))
+
+    def test_artists_filters_by_city_and_state(self):
+        self.seed_artists(10)
+
+        res = self.client().get('/artists?city=New+York&state=NY')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'Artist 001', res.data)
+        self.assertNotIn(b'Artist 000', res.data)
+
+    def test_artists_loads_only_listed_columns(self):
+        self.seed_artists(3)
+        self.statements = []
+
+        self.client().get('/artists')
+
+        # The other statement counts the genres, uncached with CACHE_TYPE
+        # null.
+        listing = [statement for statement in self.statements
+                   if 'unnest' not in statement]
+        self.assertEqual(len(listing), 1)
+        self.assertNotIn('seeking_description', listing[0])
+
+    def test_read_routes_use_indexes(self):
+        self.seed(20)
+        self.seed_artists(20)
+        urls = [
+            '/venues', '/venues?genre=Jazz', '/venues/1',
+            '/venues/1/past_shows', '/artists',
+            '/artists?city=New+York&state=NY', '/artists?genre=Jazz',
+            '/artists/1',
+            '/artists/1/past_shows', '/shows',
+            '/venues/search?search_term=venue',
+            '/artists/search?search_term=sax',
+            '/shows/search?search_term=sax'
+        ]
+
+        for url in urls:
+            self.statements = []
+            self.parameters = []
+            self.assertEqual(self.client().get(url).status_code, 200)
+
+            # With sequential scans priced out, the planner only falls back
+            # to one when no index can serve the query.
+            connection = db.get_engine(self.app).raw_connection()
+            try:
+                cursor = connection.cursor()
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                for statement, parameters in zip(self.statements,
+                                                 self.parameters):
+                    # The genre counts of a listing without ?genre= cover
+                    # every live row, which no index can serve; they are
+                    # cached with the page.
+                    if 'unnest(' in statement and '@>' not in statement:
+                        continue
+                    cursor.execute('EXPLAIN ' + statement, parameters)
+                    plan = '\n'.join(row[0] for row in cursor.fetchall())
+                    self.assertNotIn('Seq Scan', plan,
+                                     '{}\n{}\n{}'.format(url, statement, plan))
+            finally:
+                connection.rollback()
+                connection.close()
+
+    def test_datetime_filter_accepts_datetimes_and_strings(self):
+        start_time = datetime(2019, 5, 21, 21, 30)
+
+        self.assertEqual(format_datetime(start_time, 'full'),
+                         format_datetime('2019-05-21T21:30:00.000Z', 'full'))
+        self.assertEqual(format_datetimes([start_time, start_time], 'medium'),
+                         [format_datetime(start_time, 'medium')] * 2)
+        self.assertIn('9:30PM', format_datetime(start_time, 'full'))
+
+    def test_import_and_export_round_trip(self):
+        self.seed(3, shows_per_venue=1)
+        runner = self.app.test_cli_runner()
+        directory = tempfile.mkdtemp()
+        venues_path = os.path.join(directory, 'venues.ndjson')
+        shows_path = os.path.join(directory, 'shows.csv')
+        with open(shows_path, 'w') as f:
+            f.write('artist,venue,start_time\n'
+                    'The Wild Sax Band,Venue 1,2035-04-01T20:00:00\n'
+                    'The Wild Sax Band,Nowhere,2035-04-01T20:00:00\n')
+
+        result = runner.invoke(args=['fyyur', 'export', 'venues', venues_path])
+        self.assertEqual(result.exit_code, 0, result.output)
+        result = runner.invoke(args=['fyyur', 'import', 'shows', shows_path])
+        self.assertEqual(result.exit_code, 0, result.output)
+
+        self.assertIn('Imported 1 shows, skipped 1.', result.output)
+        with open(venues_path) as f:
+            self.assertEqual(len(f.readlines()), 3)
+        self.assertEqual(self.counts(Venue, 2), (2, 1))
+
+    def test_import_skips_deleted_rows_and_invalidates_pages(self):
+        self.seed(2, shows_per_venue=1)
+        self.use_page_cache()
+        with self.app.app_context():
+            deletions.soft_delete(Venue, 2)
+            db.session.commit()
+            version = page_cache.tag_version('artists')
+        runner = self.app.test_cli_runner()
+        directory = tempfile.mkdtemp()
+        shows_path = os.path.join(directory, 'shows.csv')
+        artists_path = os.path.join(directory, 'artists.csv')
+        with open(shows_path, 'w') as f:
+            f.write('artist,venue,venue_id,start_time\n'
+                    'The Wild Sax Band,Venue 1,,2035-04-01T20:00:00\n'
+                    'The Wild Sax Band,,2,2035-04-02T20:00:00\n'
+                    'The Wild Sax Band,,1,2035-04-03T20:00:00\n')
+        with open(artists_path, 'w') as f:
+            f.write('name,city,state\nThe Late Quartet,Austin,TX\n')
+
+        result = runner.invoke(args=['fyyur', 'import', 'shows', shows_path])
+        self.assertIn('Imported 1 shows, skipped 2.', result.output)
+        result = runner.invoke(args=['fyyur', 'import', 'artists',
+                                     artists_path])
+        self.assertEqual(result.exit_code, 0, result.output)
+
+        with self.app.app_context():
+            self.assertNotEqual(page_cache.tag_version('artists'), version)
+
+    def test_generate_is_deterministic(self):
+        runner = self.app.test_cli_runner()
+        args = ['fyyur', 'generate', '--venues', '20', '--artists', '4',
+                '--shows', '150', '--seed', '7', '--centre', '2030-01-01']
+
+        for _ in range(2):
+            result = runner.invoke(args=args)
+            self.assertEqual(result.exit_code, 0, result.output)
+
+        with self.app.app_context():
+            shows = db.session.query(
+                Show.venue_id, Show.artist_id, Show.start_time).all()
+            first = sorted(show for show in shows if show.venue_id <= 20)
+            second = sorted((venue_id - 20, artist_id - 4, start_time)
+                            for venue_id, artist_id, start_time in shows
+                            if venue_id > 20)
+            self.assertEqual(len(first), 150)
+            self.assertEqual(first, second)
+            self.assertEqual(
+                len({(venue_id, start_time.date())
+                     for venue_id, _, start_time in first}), 150)
+            self.assertEqual(counters.check_counters(), [])
+        result = runner.invoke(args=['fyyur', 'generate', '--venues', '1',
+                                     '--shows', str(synthetic.SHOW_DAYS + 1)])
+        self.assertNotEqual(result.exit_code, 0)
+
+    def test_built_assets_are_fingerprinted_and_precompressed(self):
+        self.addCleanup(shutil.rmtree, os.path.join(self.app.static_folder,
+                                                    assets.BUILD_DIR))
+        result = self.app.test_cli_runner().invoke(
+            args=['fyyur', 'build-assets'])
+        self.assertEqual(result.exit_code, 0, result.output)
+
+        page = self.client().get('/').data.decode()
+        url = re.search(r'/static/dist/css/main\.[0-9a-f]{12}\.css', page)
+        self.assertIsNotNone(url)
+        res = self.client().get(url.group(0),
+                                headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', res.headers['Cache-Control'])
+        self.assertIn('max-age=31536000', res.headers['Cache-Control'])
+        with open(os.path.join(self.app.static_folder, 'css', 'main.css'),
+                  'rb') as f:
+            self.assertEqual(gzip.decompress(res.data), f.read())
+
+    def test_builds_keep_the_files_earlier_pages_link(self):
+        static_folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_folder)
+        urls = []
+        for build in range(assets.KEEP_BUILDS + 2):
+            with open(os.path.join(static_folder, 'app.js'), 'w') as f:
+                f.write('var build = {};'.format(build))
+            urls.append(assets.build(static_folder)['app.js'])
+
+        exists = [os.path.isfile(os.path.join(static_folder, url))
+                  for url in urls]
+        self.assertEqual(exists, [False] + [True] * (assets.KEEP_BUILDS + 1))
+
+    def test_new_builds_change_etags_and_cached_pages(self):
+        self.seed(1)
+        self.use_page_cache()
+        self.addCleanup(shutil.rmtree, os.path.join(self.app.static_folder,
+                                                    assets.BUILD_DIR))
+        etag = self.client().get('/venues/1').headers['ETag']
+        self.client().get('/venues/1')
+        self.assertEqual(self.cache_stats()['hits'], 1)
+
+        self.app.test_cli_runner().invoke(args=['fyyur', 'build-assets'])
+        res = self.client().get('/venues/1')
+
+        self.assertNotEqual(res.headers['ETag'], etag)
+        self.assertIn(b'/static/dist/', res.data)
+        self.assertEqual(self.cache_stats()['hits'], 1)
+
+    def use_replica(self):
+        for key in ('SQLALCHEMY_BINDS', 'SQLALCHEMY_REPLICA_BINDS'):
+            self.addCleanup(self.app.config.__setitem__, key,
+                            self.app.config.get(key))
+        self.app.config['SQLALCHEMY_BINDS'] = {'replica': os.environ.get(
+            'TEST_REPLICA_DATABASE_URL',
+            "postgres://{}/{}".format('localhost:5432', 'fyyur_test_replica'))}
+        self.app.config['SQLALCHEMY_REPLICA_BINDS'] = ['replica']
+        replica = db.get_engine(self.app, bind='replica')
+        replica.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        db.Model.metadata.drop_all(replica)
+        db.Model.metadata.create_all(replica)
+        replica.execute(Venue.__table__.insert(), name='Replica Hall',
+                        city='Austin', state='TX', seeking_talent=False)
+        replica.execute('REFRESH MATERIALIZED VIEW venue_area')
+        self.addCleanup(db.Model.metadata.drop_all, replica)
+
+    def test_read_pages_are_routed_to_replica(self):
+        self.seed(1)
+        self.use_replica()
+
+        res = self.client().get('/venues')
+
+        self.assertIn(b'Replica Hall', res.data)
+        self.assertNotIn(b'Venue 0', res.data)
+        self.assertEqual(res.headers['X-Database-Bind'], 'replica')
+
+    def test_reads_after_a_write_go_to_primary(self):
+        self.use_replica()
+        client = self.client()
+
+        client.post('/venues/create', data={
+            'name': 'Primary Hall', 'city': 'Austin', 'state': 'TX',
+            'address': '1 Main Street', 'phone': '123-123-1234',
+            'genres': ['Jazz'], 'facebook_link': 'https://facebook.com/hall'
+        })
+        res = client.get('/venues')
+
+        self.assertIn(b'Primary Hall', res.data)
+        self.assertEqual(res.headers['X-Database-Bind'], 'primary')
+        self.assertEqual(self.client().get('/venues').headers['X-Database-Bind'],
+                         'replica')
+
+    def test_cached_pages_keep_read_your_writes(self):
+        self.use_replica()
+        self.use_page_cache()
+        writer = self.client()
+        self.client().get('/venues')
+
+        writer.post('/venues/create', data={
+            'name': 'Primary Hall', 'city': 'Austin', 'state': 'TX',
+            'address': '1 Main Street', 'phone': '123-123-1234',
+            'genres': ['Jazz'], 'facebook_link': 'https://facebook.com/hall'
+        })
+        # The replica never sees the write, as if it lagged behind.
+        res = self.client().get('/venues')
+        self.assertNotIn(b'Primary Hall', res.data)
+        self.assertEqual(res.headers['X-Database-Bind'], 'replica')
+
+        res = writer.get('/venues')
+
+        self.assertIn(b'Primary Hall', res.data)
+        self.assertEqual(res.headers['X-Database-Bind'], 'primary')
+        self.client().get('/venues')
+        self.assertEqual(self.cache_stats()['hits'], 0)
+
+    def test_requests_report_their_queries(self):
+        self.seed(2)
+        self.statements = []
+
+        res = self.client().get('/venues')
+
+        timing = res.headers['Server-Timing']
+        queries = int(re.search(r'db;desc="(\d+) queries"', timing).group(1))
+        self.assertEqual(queries, len(self.statements))
+        self.assertIn('app;dur=', timing)
+
+    def test_failed_queries_leave_no_query_timer_behind(self):
+        with self.app.app_context(), db.engine.connect() as connection:
+            with self.assertRaises(DataError):
+                connection.execute('SELECT 1 / 0')
+
+            self.assertEqual(connection.info['query_started_at'], [])
+
+    def test_slow_queries_are_logged_and_counted(self):
+        self.app.config['SLOW_QUERY_SECONDS'] = 0
+        with self.assertLogs(self.app.logger, 'WARNING') as logs:
+            self.client().get('/venues')
+
+        self.assertIn('GET /venues', logs.output[0])
+
+        res = self.client().get('/metrics')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertRegex(res.data.decode(),
+                         r'fyyur_db_slow_queries_total\{endpoint="venues"\} [1-9]')
+        self.assertIn(b'fyyur_requests_total{endpoint="venues",method="GET",'
+                      b'status="200"}', res.data)
+        self.assertIn(b'fyyur_page_cache_hits_total', res.data)
+
+    def test_metrics_report_the_connection_pool(self):
+        self.client().get('/venues')
+
+        res = self.client().get('/metrics')
+
+        self.assertIn(b'fyyur_db_pool_connections{bind="primary",state="in_use"}',
+                      res.data)
+        self.assertRegex(res.data.decode(),
+                         r'fyyur_db_pool_checkout_wait_seconds_count [1-9]')
+
+    def test_pools_follow_each_bind_url(self):
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+                          'SQLALCHEMY_BINDS': {'replica': self.database_path}})
+
+        with app.app_context():
+            self.assertEqual(db.engine.execute('SELECT 1').scalar(), 1)
+            self.assertNotIsInstance(db.engine.pool, TimedQueuePool)
+            replica = db.get_engine(app, bind='replica')
+            self.assertIsInstance(replica.pool, TimedQueuePool)
+            self.assertEqual(replica.pool.size(), 5)
+
+    def test_apps_keep_their_own_config(self):
+        self.seed(1)
+        cached = create_app(dict(self.config, CACHE_TYPE='lru'))
+        self.addCleanup(db.get_engine(cached).dispose)
+
+        for _ in range(2):
+            self.assertEqual(cached.test_client().get('/venues/1').status_code,
+                             200)
+            self.assertEqual(self.client().get('/venues/1').status_code, 200)
+
+        self.assertEqual(self.cache_stats(cached)['hits'], 1)
+        self.assertEqual(self.cache_stats()['hits'], 0)
+
+    def test_startup_leaves_babel_and_dateutil_unimported(self):
+        output = subprocess.check_output([
+            sys.executable, '-c',
+            'import sys, app; app.create_app(); '
+            'print([name for name in ("babel", "dateutil.parser") '
+            'if name in sys.modules])'
+        ], cwd=os.path.dirname(os.path.abspath(__file__)))
+
+        self.assertEqual(output.strip(), b'[]')
+
+    def test_gunicorn_workers_fit_the_connection_budget(self):
+        env = dict(os.environ, WEB_CONCURRENCY='50', DB_MAX_CONNECTIONS='45',
+                   DB_POOL_SIZE='5', DB_MAX_OVERFLOW='10',
+                   DB_PGBOUNCER='false')
+        env.pop('WEB_THREADS', None)
+        output = subprocess.check_output([
+            sys.executable, '-c',
+            'import gunicorn_config as c; print(c.workers, c.threads)'
+        ], cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+
+        self.assertEqual(output.split(), [b'3', b'5'])
+
+    def asgi_get(self, path, headers=None):
+        """Requests path from the ASGI entry point, returning the status and
+        the body."""
+        import asgi
+        asgi.init_app(self.app)
+        path, _, query_string = path.partition('?')
+
+        async def get():
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                messages.append(message)
+
+            await asgi.connect()
+            try:
+                await asgi.application({
+                    'type': 'http', 'http_version': '1.1', 'method': 'GET',
+                    'scheme': 'http', 'server': ('localhost', 80),
+                    'root_path': '', 'path': path,
+                    'query_string': query_string.encode(),
+                    'headers': [(name.lower().encode(), value.encode())
+                                for name, value in (headers or {}).items()]
+                }, receive, send)
+            finally:
+                await asgi.disconnect()
+            self.asgi_headers = dict(messages[0]['headers'])
+            return messages[0]['status'], b''.join(
+                message.get('body', b'') for message in messages[1:])
+
+        return asyncio.run(get())
+
+    def test_asgi_renders_the_same_read_pages(self):
+        self.seed(2)
+        self.seed_artists(3)
+
+        for path in ['/venues', '/venues/1', '/venues/1/past_shows',
+                     '/artists', '/artists/1', '/shows',
+                     '/venues/search?search_term=venue']:
+            with self.subTest(path=path):
+                status, body = self.asgi_get(path)
+
+                self.assertEqual(status, 200)
+                self.assertEqual(body, self.client().get(path).data)
+
+    def test_asgi_pages_are_routed_and_timed(self):
+        self.use_replica()
+
+        status, body = self.asgi_get('/venues')
+
+        self.assertIn(b'Replica Hall', body)
+        self.assertEqual(self.asgi_headers[b'x-database-bind'], b'replica')
+        self.assertIn(b'db;desc="2 queries"',
+                      self.asgi_headers[b'server-timing'])
+
+    def test_asgi_hands_missing_pages_to_flask(self):
+        status, _ = self.asgi_get('/venues/999')
+
+        self.assertEqual(status, 404)
+
+    def test_api_pages_through_shows(self):
+        self.seed(3)
+
+        res = self.client().get('/api/v1/shows?limit=4')
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([show['id'] for show in data['data']], [1, 2, 3, 4])
+        self.assertIsNone(data['prev'])
+
+        data = self.client().get(data['next']).get_json()
+        data = self.client().get(data['next']).get_json()
+
+        self.assertEqual([show['id'] for show in data['data']], [9])
+        self.assertIsNone(data['next'])
+        self.assertEqual(set(data['data'][0]),
+                         {'id', 'artist_id', 'venue_id', 'start_time',
+                          'end_time'})
+
+    def test_api_returns_json_errors(self):
+        res = self.client().get('/api/v1/venues/1')
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(res.get_json()['message'], 'resource not found')
+        self.assertEqual(
+            self.client().get('/api/v1/venues?after=nonsense').status_code, 400)
+
+    def test_api_export_streams_ndjson(self):
+        self.seed(2)
+
+        res = self.client().get('/api/v1/venues/export')
+        rows = [json.loads(line) for line in res.data.decode().splitlines()]
+
+        self.assertEqual(res.mimetype, 'application/x-ndjson')
+        self.assertEqual([row['name'] for row in rows], ['Venue 0', 'Venue 1'])
+        self.assertEqual(rows[0]['genres'], ['Jazz'])
+
+    def seed_genres(self):
+        with self.app.app_context():
+            for name, names in [('Blue Room', ['Jazz', 'Blues']),
+                                 ('Jazz Cellar', ['Jazz']),
+                                 ('Rock Hall', ['Rock n Roll'])]:
+                db.session.add(Venue(name=name, city='Austin', state='TX',
+                                     genres=names))
+                db.session.add(Artist(name=name + ' Band', city='Austin',
+                                      state='TX', genres=names))
+            db.session.commit()
+            venue_areas.refresh()
+
+    def test_venues_and_artists_filter_by_every_genre(self):
+        self.seed_genres()
+
+        venues = self.client().get('/venues?genre=Jazz&genre=Blues').data
+        artists = self.client().get('/artists?genre=Jazz').data
+
+        self.assertIn(b'Blue Room', venues)
+        self.assertNotIn(b'Jazz Cellar', venues)
+        self.assertIn(b'Jazz Cellar Band', artists)
+        self.assertNotIn(b'Rock Hall Band', artists)
+        self.assertTrue(any('@>' in statement for statement in self.statements))
+
+    def test_genre_counts_follow_the_selection(self):
+        self.seed_genres()
+
+        res = self.client().get('/venues?genre=Jazz')
+
+        self.assertIn(b'Jazz (2)', res.data)
+        self.assertIn(b'Blues (1)', res.data)
+        self.assertNotIn(b'Rock n Roll (', res.data)
+
+    def test_genre_counts_are_cached_until_a_venue_changes(self):
+        self.seed_genres()
+        self.use_page_cache()
+        with self.app.app_context():
+            genres.genre_counts(Venue, [])
+            self.statements = []
+
+            self.assertIn(('Blues', 1), genres.genre_counts(Venue, []))
+            self.assertEqual(self.statements, [])
+
+        self.client().post('/venues/create', data={
+            'name': 'Blues Barn', 'city': 'Austin', 'state': 'TX',
+            'address': '1 Main Street', 'phone': '123-123-1234',
+            'genres': ['Blues'], 'facebook_link': 'https://facebook.com/barn'
+        })
+
+        with self.app.app_context():
+            self.assertIn(('Blues', 2), genres.genre_counts(Venue, []))
+
+    def test_venues_reads_the_venue_area_view(self):
+        self.seed(2)
+        self.statements = []
+
+        res = self.client().get('/venues')
+
+        self.assertIn(b'Venue 1', res.data)
+        listing = [statement for statement in self.statements
+                   if 'unnest' not in statement]
+        self.assertIn('FROM venue_area', listing[0])
+
+    def test_venue_area_refreshes_are_debounced(self):
+        self.app.config['VENUE_AREA_REFRESH_SECONDS'] = 60
+        self.addCleanup(venue_areas.cancel_scheduled_refresh, self.app)
+        for name in ['Debounced Hall', 'Debounced Barn']:
+            self.client().post('/venues/create', data={
+                'name': name, 'city': 'Austin', 'state': 'TX',
+                'address': '1 Main Street', 'phone': '123-123-1234',
+                'genres': ['Jazz'], 'facebook_link': 'https://facebook.com/hall'
+            })
+
+        self.assertNotIn(b'Debounced Hall', self.client().get('/venues').data)
+        self.assertFalse(any('REFRESH' in statement
+                             for statement in self.statements))
+        self.assertTrue(venue_areas.cancel_scheduled_refresh(self.app))
+
+        with self.app.app_context():
+            venue_areas.refresh()
+        res = self.client().get('/venues')
+
+        self.assertIn(b'Debounced Hall', res.data)
+        self.assertIn(b'Debounced Barn', res.data)
+
+    def test_venues_pages_wait_for_each_apps_refresh(self):
+        self.app.config['VENUE_AREA_REFRESH_SECONDS'] = 60
+        cached = create_app(dict(self.config, CACHE_TYPE='lru',
+                                 VENUE_AREA_REFRESH_SECONDS=60))
+        self.addCleanup(db.get_engine(cached).dispose)
+        for app in [self.app, cached]:
+            self.addCleanup(venue_areas.cancel_scheduled_refresh, app)
+        with cached.app_context():
+            version = page_cache.tag_version('venues')
+
+        for app, name in [(self.app, 'First Hall'), (cached, 'Second Hall')]:
+            app.test_client().post('/venues/create', data={
+                'name': name, 'city': 'Austin', 'state': 'TX',
+                'address': '1 Main Street', 'phone': '123-123-1234',
+                'genres': ['Jazz'], 'facebook_link': 'https://facebook.com/hall'
+            })
+
+        with cached.app_context():
+            self.assertEqual(page_cache.tag_version('venues'), version)
+        self.assertTrue(venue_areas.cancel_scheduled_refresh(self.app))
+        self.assertTrue(venue_areas.cancel_scheduled_refresh(cached))
+
+        with cached.app_context():
+            venue_areas.refresh()
+            self.assertNotEqual(page_cache.tag_version('venues'), version)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import threading
+
+from flask import current_app
+
+from extensions import db, page_cache
+
+#----------------------------------------------------------------------------#
+# Venues by area.
+#----------------------------------------------------------------------------#
+
+# /venues reads the venue_area materialized view, which holds only the
+# columns of the live venues the listing needs. Writes that change it
+# schedule a REFRESH MATERIALIZED VIEW CONCURRENTLY, debounced so that a
+# burst of writes within VENUE_AREA_REFRESH_SECONDS costs a single refresh;
+# readers keep seeing the previous contents meanwhile. `flask fyyur
+# refresh-venue-areas` refreshes it on a schedule as well. Those writes leave the 'venues' page-cache tag alone; only refresh()
+# invalidates it, once the view holds them, so that no /venues page rendered
+# before then is cached under the new tag version. Each app keeps its own
+# pending refresh in app.extensions['venue_areas'].
+
+
+class RefreshState(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timer = None
+
+
+def refresh_state(app):
+    return app.extensions.setdefault('venue_areas', RefreshState())
+
+
+def refresh():
+    '''
+    refresh()
+        brings venue_area up to date with the venue table, without locking
+        out readers, and invalidates the cached /venues pages
+    '''
+    db.session.execute('REFRESH MATERIALIZED VIEW CONCURRENTLY venue_area')
+    db.session.commit()
+    page_cache.invalidate('venues')
+
+
+def try_refresh():
+    # A failed refresh leaves the previous contents in place, which the
+    # next one will catch up on, so it must not fail the write.
+    try:
+        refresh()
+    except:
+        db.session.rollback()
+        current_app.logger.exception('Refreshing venue_area failed')
+
+
+def refresh_later(app):
+    state = refresh_state(app)
+    with state.lock:
+        state.timer = None
+    with app.app_context():
+        try_refresh()
+        db.session.remove()
+
+
+def schedule_refresh():
+    '''
+    schedule_refresh()
+        refreshes venue_area VENUE_AREA_REFRESH_SECONDS from now, unless a
+        refresh is already scheduled; right away when that is 0
+    '''
+    delay = current_app.config.get('VENUE_AREA_REFRESH_SECONDS', 5)
+    if delay <= 0:
+        try_refresh()
+        return
+
+    app = current_app._get_current_object()
+    state = refresh_state(app)
+    with state.lock:
+        if state.timer is None:
+            state.timer = threading.Timer(delay, refresh_later, [app])
+            state.timer.daemon = True
+            state.timer.start()
+
+
+def cancel_scheduled_refresh(app):
+    '''
+    cancel_scheduled_refresh(app)
+        drops the refresh scheduled for app, returning whether there was one
+    '''
+    state = refresh_state(app)
+    with state.lock:
+        timer, state.timer = state.timer, None
+    if timer is not None:
+        timer.cancel()
+    return timer is not None
@@ -0,0 +1,1094 @@
+import base64
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from functools import lru_cache, wraps
+from itertools import groupby
+
+from flask import current_app, render_template, request, Response, flash, \
+    redirect, url_for, abort, jsonify, make_response, session
+from sqlalchemy.exc import IntegrityError
+from werkzeug.http import http_date, quote_etag
+
+from extensions import db, page_cache
+from choices import state_choices
+from models import Venue, Artist, Show, venue_area, live
+from routing import reads_from_replica
+import assets
+import bookings
+import counters
+import deletions
+import genres
+import instrumentation
+import routing
+import search
+import venue_areas
+
+#----------------------------------------------------------------------------#
+# Routes.
+#----------------------------------------------------------------------------#
+
+# The views below are added to every app create_app() builds by init_app(),
+# each under its own name as endpoint, e.g. url_for('venues'), along with
+# the datetime filter and the error pages.
+
+ROUTES = []
+
+
+def route(rule, **options):
+    def decorator(view):
+        ROUTES.append((rule, view, options))
+        return view
+    return decorator
+
+
+def init_app(app):
+    app.add_template_filter(format_datetime, 'datetime')
+    for rule, view, options in ROUTES:
+        app.add_url_rule(rule, view_func=view, **options)
+    app.register_error_handler(404, not_found_error)
+    app.register_error_handler(500, server_error)
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma"
+}
+
+
+# babel and dateutil are imported on first use rather than with the views,
+# they take longer to import than the rest of the app together. So are the
+# forms, as flask_wtf imports babel.
+
+
+@lru_cache(maxsize=64)
+def datetime_pattern(format, locale):
+    import babel.dates
+
+    # Parsing the pattern and loading the locale data are the expensive
+    # parts of babel.dates.format_datetime, so do them once per format.
+    return (babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)),
+            babel.Locale.parse(locale or babel.dates.LC_TIME))
+
+
+def to_datetime(value):
+    if not isinstance(value, datetime):
+        import dateutil.parser
+        value = dateutil.parser.parse(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def format_datetime(value, format='medium', locale=None):
+    pattern, locale = datetime_pattern(format, locale)
+    return pattern.apply(to_datetime(value), locale)
+
+
+def format_datetimes(values, format='medium', locale=None):
+    pattern, locale = datetime_pattern(format, locale)
+    return [pattern.apply(to_datetime(value), locale) for value in values]
+
+#----------------------------------------------------------------------------#
+# Pagination.
+#----------------------------------------------------------------------------#
+
+SHOWS_PER_PAGE = 30
+ARTISTS_PER_PAGE = 50
+
+
+def encode_cursor(values):
+    values = [{'datetime': value.isoformat()} if isinstance(value, datetime)
+              else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return [datetime.fromisoformat(value['datetime'])
+                if isinstance(value, dict) else value for value in values]
+    except (ValueError, TypeError, KeyError):
+        abort(400)
+
+
+def keyset_query(query, columns, per_page, after=None, before=None,
+                 descending=False):
+    '''
+    Narrows query down to the page after or before a cursor, ordered by
+    columns, plus one row telling whether there is a further page.
+    '''
+    keys = db.tuple_(*columns)
+    backwards = before is not None
+
+    if after is not None or before is not None:
+        values = decode_cursor(before if backwards else after)
+        cursor = db.tuple_(*[db.literal(value) for value in values])
+        # Walking towards the start of a descending listing, or towards the
+        # end of an ascending one, means the keys have to grow. The bound on
+        # the leading column alone is implied, but unlike the row
+        # comparison it lets Postgres prune the show partitions.
+        if backwards == descending:
+            query = query.filter(keys > cursor, columns[0] >= values[0])
+        else:
+            query = query.filter(keys < cursor, columns[0] <= values[0])
+
+    ascending = backwards == descending
+    query = query.order_by(*[column if ascending else column.desc()
+                             for column in columns])
+    return query.limit(per_page + 1)
+
+
+def keyset_page(rows, columns, per_page, after=None, before=None):
+    '''
+    Turns the rows loaded by keyset_query into one page, together with the
+    cursors of the previous and next pages (None when there is no such
+    page). Each row must expose the ordering columns under their own key so
+    the cursors can be read back from the first and last rows.
+    '''
+    backwards = before is not None
+    rows = list(rows)
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def cursor_of(row):
+        return encode_cursor([getattr(row, column.key) for column in columns])
+
+    prev_cursor = next_cursor = None
+    if rows:
+        if (has_more if backwards else after is not None):
+            prev_cursor = cursor_of(rows[0])
+        if (before is not None if backwards else has_more):
+            next_cursor = cursor_of(rows[-1])
+
+    return rows, prev_cursor, next_cursor
+
+
+def partition_query(owner_column, owner_id, other, other_column, now,
+                    past_after=None, include_upcoming=True):
+    '''
+    Builds the single query loading the shows of one venue or artist,
+    joined to the artist or venue playing them: the upcoming shows against
+    the one timestamp now, and a page of PAST_SHOWS_PER_PAGE past shows
+    (plus one) starting after the past_after cursor.
+    '''
+    per_page = current_app.config['PAST_SHOWS_PER_PAGE']
+    shows = db.session.query(
+        Show.id,
+        Show.start_time,
+        other.id.label('other_id'),
+        other.name.label('other_name'),
+        other.image_link.label('other_image_link')
+    ). \
+        join(other, other.id == other_column). \
+        filter(owner_column == owner_id, *live(other))
+
+    past_shows = shows.filter(Show.start_time <= now)
+    if past_after is not None:
+        values = decode_cursor(past_after)
+        # The start_time bound prunes the show partitions, see keyset_query.
+        past_shows = past_shows.filter(
+            db.tuple_(Show.start_time, Show.id) <
+            db.tuple_(*[db.literal(value) for value in values]),
+            Show.start_time <= values[0])
+    past_shows = past_shows. \
+        order_by(Show.start_time.desc(), Show.id.desc()). \
+        limit(per_page + 1)
+
+    if include_upcoming:
+        return shows.filter(Show.start_time > now).union_all(past_shows)
+    return past_shows
+
+
+def split_shows(rows, now):
+    '''
+    Splits the rows loaded by partition_query into upcoming and past shows;
+    the cursor of the next page of past shows is returned with them.
+    '''
+    per_page = current_app.config['PAST_SHOWS_PER_PAGE']
+    rows = sorted(rows, key=lambda show: (show.start_time, show.id),
+                  reverse=True)
+
+    upcoming_shows = [show for show in rows if show.start_time > now]
+    past_shows = [show for show in rows if show.start_time <= now]
+
+    next_cursor = None
+    if len(past_shows) > per_page:
+        past_shows = past_shows[:per_page]
+        next_cursor = encode_cursor([past_shows[-1].start_time,
+                                     past_shows[-1].id])
+
+    return upcoming_shows, past_shows, next_cursor
+
+
+def format_shows(shows, other):
+    return [{
+        other + '_id': show.other_id,
+        other + '_name': show.other_name,
+        other + '_image_link': show.other_image_link,
+        'start_time': show.start_time
+    } for show in shows]
+
+
+def show_partner_tags(owner_column, owner_id, partner_column, partner):
+    '''
+    Returns the page cache tags of the artists playing at a venue, or of the
+    venues an artist plays at, whose pages show the venue or artist.
+    '''
+    return ['{}:{}'.format(partner, partner_id) for partner_id, in
+            db.session.query(partner_column).
+            filter(owner_column == owner_id).
+            distinct()]
+
+
+def genre_facets(endpoint, counts, selected, **args):
+    '''
+    Returns the genre links shown next to a listing, each adding its genre
+    to the ?genre= filter, or taking it out when selected, while keeping
+    the other arguments.
+    '''
+    counts = dict(counts)
+    for genre in selected:
+        counts.setdefault(genre, 0)
+
+    return [{
+        'name': genre,
+        'count': count,
+        'selected': genre in selected,
+        'url': url_for(endpoint, genre=[other for other in selected if other != genre]
+                       if genre in selected else selected + [genre], **args)
+    } for genre, count in sorted(counts.items())]
+
+
+def search_page_urls(endpoint, search_term, results):
+    page = results['page']
+    return {
+        'prev_url': page > 1 and url_for(
+            endpoint, search_term=search_term, page=page - 1),
+        'next_url': page < results['pages'] and url_for(
+            endpoint, search_term=search_term, page=page + 1)
+    }
+
+#----------------------------------------------------------------------------#
+# Conditional requests.
+#----------------------------------------------------------------------------#
+
+# The venue and artist pages carry a weak ETag and a Last-Modified derived
+# from the updated_at of the venue or artist, of its shows and of the
+# artists or venues playing them, the number of shows, and the start of the
+# latest show that has begun, which moves a show from upcoming to past. The
+# detail query loads them along with the row, so a request whose
+# If-None-Match or If-Modified-Since still matches gets a 304 before the
+# shows are loaded or the template rendered.
+
+
+def validator_columns(partner, now):
+    # Aggregates over the shows outer joined to the detail row.
+    return [
+        db.func.count(Show.id).label('booked_shows'),
+        db.func.max(Show.updated_at).label('shows_updated_at'),
+        db.func.max(partner.updated_at).label('partners_updated_at'),
+        db.func.max(db.case([(Show.start_time <= now, Show.start_time)])).
+        label('last_started_at')
+    ]
+
+
+@lru_cache(maxsize=None)
+def templates_version(folder):
+    # A deploy changing any template changes every ETag.
+    digest = hashlib.sha1()
+    for root, directories, names in os.walk(folder):
+        directories.sort()
+        for name in sorted(names):
+            with open(os.path.join(root, name), 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def templates_folder():
+    return os.path.join(current_app.root_path, current_app.template_folder)
+
+
+def validator_headers(row):
+    '''
+    validator_headers(row)
+        returns the ETag and Last-Modified headers of the page showing a
+        row loaded with validator_columns, none for a page carrying flashed
+        messages, which are personal
+    '''
+    if '_flashes' in session:
+        return {}
+
+    changes = [row.updated_at, row.shows_updated_at, row.partners_updated_at,
+               row.last_started_at]
+    last_modified = max(to_datetime(change) for change in changes
+                        if change is not None)
+    etag = hashlib.sha1(repr([templates_version(templates_folder()),
+                              assets.version(), row.id, row.booked_shows] +
+                             [change and change.isoformat()
+                              for change in changes]).encode()).hexdigest()
+
+    return {'ETag': quote_etag(etag, weak=True),
+            'Last-Modified': http_date(last_modified)}
+
+
+def not_modified(headers):
+    '''
+    not_modified(headers)
+        returns a 304 carrying headers when they match the If-None-Match or
+        If-Modified-Since of the request, else None
+    '''
+    response = Response(headers=headers).make_conditional(request)
+    return response if response.status_code == 304 else None
+
+
+def conditional(view):
+    '''
+    conditional(view)
+        turns the page a view returns into a 304 when the client already
+        has it, which also covers pages served from the page cache
+    '''
+    @wraps(view)
+    def wrapper(**kwargs):
+        return make_response(view(**kwargs)).make_conditional(request)
+    return wrapper
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+
+@route('/')
+def index():
+    return render_template('pages/home.html')
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+#  The read-only pages are split into the queries they run and the rendering
+#  of the rows loaded, so that asgi.py can run the same queries without
+#  blocking and render the same pages.
+
+def venues_query():
+    areas = venue_area.c
+    query = db.session.query(
+        areas.id,
+        areas.name,
+        areas.city,
+        areas.state,
+        areas.upcoming_shows_count
+    ). \
+        order_by(areas.state, areas.city, areas.name)
+
+    return genres.with_genres(query, areas, request.args.getlist('genre'))
+
+
+def render_venues(venues, genre_counts):
+    data = []
+
+    for (city, state), area_venues in groupby(venues, key=lambda venue: (venue.city, venue.state)):
+        data.append({
+            'city': city,
+            'state': state,
+            'venues': [{
+                'id': venue.id,
+                'name': venue.name,
+                'num_upcoming_shows': venue.upcoming_shows_count
+            } for venue in area_venues]
+        })
+
+    return render_template(
+        'pages/venues.html',
+        areas=data,
+        genre_facets=genre_facets(
+            'venues', genre_counts, request.args.getlist('genre'))
+    )
+
+
+@route('/venues')
+@page_cache.cached('venues')
+@reads_from_replica
+def venues():
+    return render_venues(
+        venues_query().all(),
+        genres.genre_counts(Venue, request.args.getlist('genre')))
+
+
+def render_search_venues(response):
+    search_term = request.values.get('search_term', '')
+    return render_template('pages/search_venues.html', results=response, search_term=search_term,
+                           **search_page_urls('search_venues', search_term, response))
+
+
+@route('/venues/search', methods=['GET', 'POST'])
+@reads_from_replica
+def search_venues():
+    search_term = request.values.get('search_term', '')
+    page = request.values.get('page', 1, type=int)
+
+    return render_search_venues(search.search_venues(search_term, page))
+
+
+def venue_query(venue_id, now):
+    return db.session.query(*Venue.__table__.columns,
+                            *validator_columns(Artist, now)). \
+        outerjoin(Show, Show.venue_id == Venue.id). \
+        outerjoin(Artist, Artist.id == Show.artist_id). \
+        filter(Venue.id == venue_id, *live(Venue)). \
+        group_by(Venue.id)
+
+
+def venue_shows_query(venue_id, now, past_after=None, include_upcoming=True):
+    return partition_query(Show.venue_id, venue_id, Artist, Show.artist_id,
+                           now, past_after, include_upcoming)
+
+
+def render_venue(venue, shows, now):
+    upcoming_shows, past_shows, next_cursor = split_shows(shows, now)
+
+    data = {
+        'id': venue.id,
+        'name': venue.name,
+        'genres': venue.genres,
+        'address': venue.address,
+        'city': venue.city,
+        'state': venue.state,
+        'phone': venue.phone,
+        'website': venue.website,
+        'facebook_link': venue.facebook_link,
+        'seeking_talent': venue.seeking_talent,
+        'seeking_description': venue.seeking_description,
+        'image_link': venue.image_link,
+        'past_shows': format_shows(past_shows, 'artist'),
+        # Only the first page of past shows is loaded, but the show total
+        # is kept on the venue.
+        'past_shows_count': max(0, venue.upcoming_shows_count +
+                                venue.past_shows_count - len(upcoming_shows)),
+        'more_past_shows_url': next_cursor and url_for(
+            'venue_past_shows', venue_id=venue.id, after=next_cursor),
+        'upcoming_shows': format_shows(upcoming_shows, 'artist'),
+        'upcoming_shows_count': len(upcoming_shows)
+    }
+
+    return render_template('pages/show_venue.html', venue=data)
+
+
+@route('/venues/<int:venue_id>')
+@conditional
+@page_cache.cached('venue:{venue_id}')
+@reads_from_replica
+def show_venue(venue_id):
+    now = datetime.now()
+    venue = venue_query(venue_id, now).first_or_404()
+    headers = validator_headers(venue)
+
+    return not_modified(headers) or (
+        render_venue(venue, venue_shows_query(venue_id, now).all(), now),
+        headers)
+
+
+def render_venue_past_shows(venue_id, shows, now):
+    _, past_shows, next_cursor = split_shows(shows, now)
+
+    return render_template(
+        'pages/venue_past_shows.html',
+        past_shows=format_shows(past_shows, 'artist'),
+        more_past_shows_url=next_cursor and url_for(
+            'venue_past_shows', venue_id=venue_id, after=next_cursor)
+    )
+
+
+@route('/venues/<int:venue_id>/past_shows')
+@reads_from_replica
+def venue_past_shows(venue_id):
+    now = datetime.now()
+    shows = venue_shows_query(venue_id, now,
+                              past_after=request.args.get('after'),
+                              include_upcoming=False).all()
+
+    return render_venue_past_shows(venue_id, shows, now)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+
+@route('/venues/create', methods=['GET'])
+def create_venue_form():
+    from forms import VenueForm
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    from forms import VenueForm
+    form = VenueForm(request.form)
+
+    try:
+        name = form.name.data
+        city = form.city.data
+        state = form.state.data
+        address = form.address.data
+        phone = form.phone.data
+        genres = form.genres.data
+        facebook_link = form.facebook_link.data
+        image_link = form.image_link.data
+        website = form.website.data
+        seeking_talent = form.seeking_talent.data
+        seeking_description = form.seeking_description.data
+
+        venue = Venue(
+            name=name,
+            city=city,
+            state=state,
+            address=address,
+            phone=phone,
+            genres=genres,
+            facebook_link=facebook_link,
+            website=website,
+            image_link=image_link,
+            seeking_talent=seeking_talent,
+            seeking_description=seeking_description
+        )
+
+        db.session.add(venue)
+        db.session.commit()
+        venue_areas.schedule_refresh()
+        flash('Venue ' + venue.name + ' was successfully listed!')
+    except:
+        db.session.rollback()
+        current_app.logger.exception('%s failed', request.endpoint)
+        flash('An error occurred. Venue ' +
+              request.form['name'] + ' could not be listed.')
+    finally:
+        db.session.close()
+
+    return render_template('pages/home.html')
+
+
+@route('/venues/<venue_id>', methods=['POST'])
+def delete_venue(venue_id):
+    try:
+        # Hidden right away, its shows are purged in the background.
+        venue = deletions.soft_delete(Venue, venue_id)
+        venue_id, name = venue.id, venue.name
+        tags = show_partner_tags(
+            Show.venue_id, venue_id, Show.artist_id, 'artist')
+        db.session.commit()
+        page_cache.invalidate('venue:{}'.format(venue_id), *tags)
+        venue_areas.schedule_refresh()
+        flash('Venue ' + name + ' was successfully deleted!')
+        deletions.purge_later(Venue, venue_id)
+    except:
+        db.session.rollback()
+        current_app.logger.exception('%s failed', request.endpoint)
+        flash('An error occurred. This venue could not be deleted.')
+    finally:
+        db.session.close()
+
+    return redirect(url_for('venues'))
+
+#  Artists
+#  ----------------------------------------------------------------
+
+
+def artists_query():
+    city = request.args.get('city') or None
+    state = request.args.get('state') or None
+
+    query = db.session.query(Artist.id, Artist.name).filter(*live(Artist))
+    if city:
+        query = query.filter(Artist.city == city)
+    if state:
+        query = query.filter(Artist.state == state)
+    query = genres.with_genres(query, Artist, request.args.getlist('genre'))
+
+    return keyset_query(
+        query,
+        [Artist.name, Artist.id],
+        ARTISTS_PER_PAGE,
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
+
+
+def render_artists(artists, genre_counts):
+    city = request.args.get('city') or None
+    state = request.args.get('state') or None
+    selected = request.args.getlist('genre')
+
+    data, prev_cursor, next_cursor = keyset_page(
+        artists,
+        [Artist.name, Artist.id],
+        ARTISTS_PER_PAGE,
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
+
+    return render_template(
+        'pages/artists.html',
+        artists=data,
+        city=city,
+        state=state,
+        states=[choice for choice, _ in state_choices],
+        genres=selected,
+        genre_facets=genre_facets(
+            'artists', genre_counts, selected, city=city, state=state),
+        prev_url=prev_cursor and url_for(
+            'artists', before=prev_cursor, city=city, state=state,
+            genre=selected),
+        next_url=next_cursor and url_for(
+            'artists', after=next_cursor, city=city, state=state,
+            genre=selected)
+    )
+
+
+@route('/artists')
+@page_cache.cached('artists')
+@reads_from_replica
+def artists():
+    return render_artists(
+        artists_query().all(),
+        genres.genre_counts(Artist, request.args.getlist('genre')))
+
+
+def render_search_artists(response):
+    search_term = request.values.get('search_term', '')
+    return render_template('pages/search_artists.html', results=response, search_term=search_term,
+                           **search_page_urls('search_artists', search_term, response))
+
+
+@route('/artists/search', methods=['GET', 'POST'])
+@reads_from_replica
+def search_artists():
+    search_term = request.values.get('search_term', '')
+    page = request.values.get('page', 1, type=int)
+
+    return render_search_artists(search.search_artists(search_term, page))
+
+
+def artist_query(artist_id, now):
+    return db.session.query(*Artist.__table__.columns,
+                            *validator_columns(Venue, now)). \
+        outerjoin(Show, Show.artist_id == Artist.id). \
+        outerjoin(Venue, Venue.id == Show.venue_id). \
+        filter(Artist.id == artist_id, *live(Artist)). \
+        group_by(Artist.id)
+
+
+def artist_shows_query(artist_id, now, past_after=None, include_upcoming=True):
+    return partition_query(Show.artist_id, artist_id, Venue, Show.venue_id,
+                           now, past_after, include_upcoming)
+
+
+def render_artist(artist, shows, now):
+    upcoming_shows, past_shows, next_cursor = split_shows(shows, now)
+
+    data = {
+        'id': artist.id,
+        'name': artist.name,
+        'genres': artist.genres,
+        'city': artist.city,
+        'state': artist.state,
+        'phone': artist.phone,
+        'website': artist.website,
+        'facebook_link': artist.facebook_link,
+        'seeking_venue': artist.seeking_venue,
+        'seeking_description': artist.seeking_description,
+        'image_link': artist.image_link,
+        'past_shows': format_shows(past_shows, 'venue'),
+        'past_shows_count': max(0, artist.upcoming_shows_count +
+                                artist.past_shows_count - len(upcoming_shows)),
+        'more_past_shows_url': next_cursor and url_for(
+            'artist_past_shows', artist_id=artist.id, after=next_cursor),
+        'upcoming_shows': format_shows(upcoming_shows, 'venue'),
+        'upcoming_shows_count': len(upcoming_shows)
+    }
+
+    return render_template('pages/show_artist.html', artist=data)
+
+
+@route('/artists/<int:artist_id>')
+@conditional
+@page_cache.cached('artist:{artist_id}')
+@reads_from_replica
+def show_artist(artist_id):
+    now = datetime.now()
+    artist = artist_query(artist_id, now).first_or_404()
+    headers = validator_headers(artist)
+
+    return not_modified(headers) or (
+        render_artist(artist, artist_shows_query(artist_id, now).all(), now),
+        headers)
+
+
+def render_artist_past_shows(artist_id, shows, now):
+    _, past_shows, next_cursor = split_shows(shows, now)
+
+    return render_template(
+        'pages/artist_past_shows.html',
+        past_shows=format_shows(past_shows, 'venue'),
+        more_past_shows_url=next_cursor and url_for(
+            'artist_past_shows', artist_id=artist_id, after=next_cursor)
+    )
+
+
+@route('/artists/<int:artist_id>/past_shows')
+@reads_from_replica
+def artist_past_shows(artist_id):
+    now = datetime.now()
+    shows = artist_shows_query(artist_id, now,
+                               past_after=request.args.get('after'),
+                               include_upcoming=False).all()
+
+    return render_artist_past_shows(artist_id, shows, now)
+
+#  Update
+#  ----------------------------------------------------------------
+
+
+@route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    artist = Artist.query.filter(Artist.id == artist_id, *live(Artist)).first_or_404()
+    from forms import ArtistForm
+    form = ArtistForm(obj=artist)
+
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+
+@route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    artist = Artist.query.filter(Artist.id == artist_id, *live(Artist)).first_or_404()
+    from forms import ArtistForm
+    form = ArtistForm(request.form)
+
+    try:
+        artist.name = form.name.data
+        artist.city = form.city.data
+        artist.state = form.state.data
+        artist.phone = form.phone.data
+        artist.genres = form.genres.data
+        artist.facebook_link = form.facebook_link.data
+        artist.image_link = form.image_link.data
+        artist.website = form.website.data
+        artist.seeking_venue = form.seeking_venue.data
+        artist.seeking_description = form.seeking_description.data
+
+        tags = show_partner_tags(
+            Show.artist_id, artist_id, Show.venue_id, 'venue')
+        db.session.commit()
+        page_cache.invalidate('artists', 'artist:{}'.format(artist_id), *tags)
+        flash('Artist ' + artist.name + ' was successfully updated!')
+    except:
+        db.session.rollback()
+        current_app.logger.exception('%s failed', request.endpoint)
+        flash('An error occurred. Artist ' +
+              request.form['name'] + ' could not be updated.')
+    finally:
+        db.session.close()
+
+    return redirect(url_for('show_artist', artist_id=artist_id))
+
+
+@route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    venue = Venue.query.filter(Venue.id == venue_id, *live(Venue)).first_or_404()
+    from forms import VenueForm
+    form = VenueForm(obj=venue)
+
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    venue = Venue.query.filter(Venue.id == venue_id, *live(Venue)).first_or_404()
+    from forms import VenueForm
+    form = VenueForm(request.form)
+
+    try:
+        venue.name = form.name.data
+        venue.city = form.city.data
+        venue.state = form.state.data
+        venue.address = form.address.data
+        venue.phone = form.phone.data
+        venue.genres = form.genres.data
+        venue.facebook_link = form.facebook_link.data
+        venue.image_link = form.image_link.data
+        venue.website = form.website.data
+        venue.seeking_talent = form.seeking_talent.data
+        venue.seeking_description = form.seeking_description.data
+
+        tags = show_partner_tags(
+            Show.venue_id, venue_id, Show.artist_id, 'artist')
+        db.session.commit()
+        page_cache.invalidate('venue:{}'.format(venue_id), *tags)
+        venue_areas.schedule_refresh()
+        flash('Venue ' + venue.name + ' was successfully updated!')
+    except:
+        db.session.rollback()
+        current_app.logger.exception('%s failed', request.endpoint)
+        flash('An error occurred. Venue ' +
+              request.form['name'] + ' could not be updated.')
+    finally:
+        db.session.close()
+
+    return redirect(url_for('show_venue', venue_id=venue_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+
+@route('/artists/create', methods=['GET'])
+def create_artist_form():
+    from forms import ArtistForm
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    from forms import ArtistForm
+    form = ArtistForm(request.form)
+
+    try:
+        name = form.name.data
+        city = form.city.data
+        state = form.state.data
+        phone = form.phone.data
+        genres = form.genres.data
+        facebook_link = form.facebook_link.data
+        image_link = form.image_link.data
+        website = form.website.data
+        seeking_venue = form.seeking_venue.data
+        seeking_description = form.seeking_description.data
+
+        artist = Artist(
+            name=name,
+            city=city,
+            state=state,
+            phone=phone,
+            genres=genres,
+            facebook_link=facebook_link,
+            website=website,
+            image_link=image_link,
+            seeking_venue=seeking_venue,
+            seeking_description=seeking_description
+        )
+
+        db.session.add(artist)
+        db.session.commit()
+        page_cache.invalidate('artists')
+        flash('Artist ' + artist.name + ' was successfully listed!')
+    except:
+        db.session.rollback()
+        current_app.logger.exception('%s failed', request.endpoint)
+        flash('An error occurred. Artist ' +
+              request.form['name'] + ' could not be listed.')
+    finally:
+        db.session.close()
+
+    return render_template('pages/home.html')
+
+
+@route('/artists/<artist_id>', methods=['POST'])
+def delete_artist(artist_id):
+    try:
+        # Hidden right away, its shows are purged in the background.
+        artist = deletions.soft_delete(Artist, artist_id)
+        artist_id, name = artist.id, artist.name
+        tags = show_partner_tags(
+            Show.artist_id, artist_id, Show.venue_id, 'venue')
+        db.session.commit()
+        page_cache.invalidate('artists', 'artist:{}'.format(artist_id), *tags)
+        venue_areas.schedule_refresh()
+        flash('Artist ' + name + ' was successfully deleted!')
+        deletions.purge_later(Artist, artist_id)
+    except:
+        db.session.rollback()
+        current_app.logger.exception('%s failed', request.endpoint)
+        flash('An error occurred. This artist could not be deleted.')
+    finally:
+        db.session.close()
+
+    return redirect(url_for('artists'))
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+def shows_query():
+    query = db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Show.artist_id,
+        Venue.name.label('venue_name'),
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link')
+    ). \
+        join(Venue, Venue.id == Show.venue_id). \
+        join(Artist, Artist.id == Show.artist_id). \
+        filter(*live(Venue), *live(Artist))
+
+    return keyset_query(
+        query,
+        [Show.start_time, Show.id],
+        SHOWS_PER_PAGE,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        descending=True
+    )
+
+
+def format_show_listing(shows):
+    start_times = format_datetimes([show.start_time for show in shows], 'full')
+    return [{
+        "venue_id": show.venue_id,
+        "artist_id": show.artist_id,
+        "start_time": start_time,
+        "venue_name": show.venue_name,
+        "artist_name": show.artist_name,
+        "artist_image_link": show.artist_image_link,
+    } for show, start_time in zip(shows, start_times)]
+
+
+def render_shows(shows):
+    shows, prev_cursor, next_cursor = keyset_page(
+        shows,
+        [Show.start_time, Show.id],
+        SHOWS_PER_PAGE,
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
+
+    return render_template(
+        'pages/shows.html',
+        shows=format_show_listing(shows),
+        prev_url=prev_cursor and url_for('shows', before=prev_cursor),
+        next_url=next_cursor and url_for('shows', after=next_cursor)
+    )
+
+
+@route('/shows')
+@reads_from_replica
+def shows():
+    return render_shows(shows_query().all())
+
+
+@route('/shows/create')
+def create_shows():
+    # renders form. do not touch.
+    from forms import ShowForm
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+@route('/shows/create', methods=['POST'])
+def create_show_submission():
+    from forms import ShowForm
+    form = ShowForm(request.form)
+
+    try:
+        artist_id = form.artist_id.data
+        venue_id = form.venue_id.data
+        start_time = form.start_time.data
+        end_time = form.end_time.data
+
+        show = Show(
+            artist_id=artist_id,
+            venue_id=venue_id,
+            start_time=start_time,
+            end_time=end_time
+        )
+
+        db.session.add(show)
+        counters.record_show(show)
+        db.session.commit()
+        page_cache.invalidate('venue:{}'.format(venue_id),
+                              'artist:{}'.format(artist_id))
+        venue_areas.schedule_refresh()
+        flash('Show was successfully listed!')
+    except IntegrityError as error:
+        db.session.rollback()
+        message = bookings.CONSTRAINT_MESSAGES.get(
+            bookings.violated_constraint(error))
+        if message is None:
+            current_app.logger.exception('%s failed', request.endpoint)
+            message = 'An error occurred.'
+        flash(message + ' Show could not be listed.')
+    except:
+        db.session.rollback()
+        current_app.logger.exception('%s failed', request.endpoint)
+        flash('An error occurred. Show could not be listed.')
+    finally:
+        db.session.close()
+
+    return render_template('pages/home.html')
+
+
+def render_search_shows(response):
+    search_term = request.values.get('search_term', '')
+    return render_template('pages/shows.html', shows=format_show_listing(response['data']),
+                           search_term=search_term,
+                           **search_page_urls('search_shows', search_term, response))
+
+
+@route('/shows/search', methods=['GET', 'POST'])
+@reads_from_replica
+def search_shows():
+    search_term = request.values.get('search_term', '')
+    page = request.values.get('page', 1, type=int)
+
+    return render_search_shows(search.search_shows(search_term, page))
+
+
+@route('/cache/stats')
+def cache_stats():
+    return jsonify(page_cache.stats())
+
+
+@route('/db/routing')
+def database_routing():
+    return jsonify(routing.decisions)
+
+
+@route('/metrics')
+def metrics():
+    cache_stats = page_cache.stats()
+    body = instrumentation.metrics.render(extra=[
+        ('fyyur_page_cache_{}_total'.format(name), 'counter',
+         'Page cache {}.'.format(name), {(): cache_stats[name]})
+        for name in ('hits', 'misses', 'evictions')
+    ] + [
+        ('fyyur_db_routing_decisions_total', 'counter',
+         'Databases chosen for read-only pages.', {
+             (('bind', bind),): count
+             for bind, count in routing.decisions.items()})
+    ] + [
+        ('fyyur_purge_shows_deleted', 'gauge',
+         'Shows deleted so far by the purges in progress.',
+         deletions.progress_samples())
+    ] + instrumentation.pool_families({
+        bind or 'primary': db.get_engine(bind=bind)
+        for bind in [None] + list(current_app.config['SQLALCHEMY_BINDS'] or [])
+    }))
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+#  Errors
+#  ----------------------------------------------------------------
+
+
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+
+def server_error(error):
+    return render_template('errors/500.html'), 500
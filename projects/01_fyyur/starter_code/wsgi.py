@@ -0,0 +1,9 @@
+'''
+WSGI entry point for Fyyur, the app built from config.py and the
+environment. Serve it with:
+
+    gunicorn --config gunicorn_config.py wsgi:app
+'''
+from app import create_app
+
+app = create_app()
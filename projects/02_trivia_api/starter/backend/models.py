@@ -1,5 +1,6 @@
 import os
 from sqlalchemy import Column, String, Integer, create_engine
+from sqlalchemy.pool import NullPool
 from flask_sqlalchemy import SQLAlchemy
 import json
 
@@ -8,6 +9,34 @@ database_path = "postgres://{}/{}".format('localhost:5432', database_name)
 
 db = SQLAlchemy()
 
+'''
+engine_options(database_path)
+    connection pool settings for database_path, read from the environment:
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING and DB_STATEMENT_TIMEOUT_MS. With DB_PGBOUNCER=true no
+    connection is kept open here and the statement timeout has to be set on
+    the role, since PgBouncer refuses startup options.
+'''
+def engine_options(database_path):
+    if database_path.startswith('sqlite'):
+        return {}
+    options = {
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', '1800')),
+    }
+    if os.environ.get('DB_PGBOUNCER', 'false').lower() == 'true':
+        options['poolclass'] = NullPool
+        return options
+    options.update(
+        pool_size=int(os.environ.get('DB_POOL_SIZE', '5')),
+        max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', '10')),
+        pool_timeout=int(os.environ.get('DB_POOL_TIMEOUT', '30')))
+    if os.environ.get('DB_STATEMENT_TIMEOUT_MS'):
+        options['connect_args'] = {
+            'options': '-c statement_timeout={}'.format(
+                int(os.environ['DB_STATEMENT_TIMEOUT_MS']))}
+    return options
+
 '''
 setup_db(app)
     binds a flask application and a SQLAlchemy service
@@ -15,6 +44,7 @@ setup_db(app)
 def setup_db(app, database_path=database_path):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_path)
     db.app = app
     db.init_app(app)
     db.create_all()